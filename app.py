@@ -1,13 +1,44 @@
 import os
-from flask import Flask, request, jsonify, render_template, session, redirect, url_for, flash, send_from_directory, abort
+import click
+from flask import Flask, request, jsonify, render_template, session, redirect, url_for, flash, send_from_directory, abort, g, has_request_context
 from sendgrid import SendGridAPIClient
 from sendgrid.helpers.mail import Mail
 from dotenv import load_dotenv
+from markupsafe import escape
+from jinja2 import nodes
+from jinja2.ext import Extension
+import atexit
+import base64
+import bisect
+import concurrent.futures
+import csv
 import datetime
+import hashlib
+import heapq
+import io
 import json
+import random
+import re
+import sys
+import tempfile
+import urllib.error
+import urllib.parse
+import urllib.request
+import uuid
+from collections.abc import Mapping
+from types import MappingProxyType
+try:
+    from PIL import Image  # Optional: posters are resized/recompressed when Pillow is installed
+except ImportError:
+    Image = None
 from functools import wraps
 import psycopg2 # For PostgreSQL connection
 import psycopg2.extras # For DictCursor
+import psycopg2.pool
+import psycopg2.sql
+import select
+import threading
+import time
 
 load_dotenv()
 
@@ -87,31 +118,157 @@ def csc_logo():
             return send_from_directory(app.root_path, filename, max_age=60 * 60 * 24 * 7)
     abort(404)
 
-def _video_site_assignments_enabled(cur) -> bool:
+DB_POOL_MIN_SIZE = int(os.getenv('DB_POOL_MIN_SIZE', '1'))
+DB_POOL_MAX_SIZE = int(os.getenv('DB_POOL_MAX_SIZE', '10'))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '10'))  # Seconds to wait for a free connection
+DB_POOL_HEALTHCHECK_AFTER = float(os.getenv('DB_POOL_HEALTHCHECK_AFTER', '30'))  # Ping connections idle longer than this
+
+class DatabasePool:
     """
-    Returns True if the database has the video_site_assignments table.
-    Lets the app run safely before/without the migration.
+    Per-process pool of PostgreSQL connections shared by every helper and route.
+
+    - Thread-safe (gunicorn gthread workers) via psycopg2's ThreadedConnectionPool.
+    - Fork-safe: the pool is created lazily and rebuilt if the PID changes, so a
+      pool opened in the gunicorn master is never shared with forked workers.
+    - Checkout blocks for up to `timeout` seconds instead of failing instantly when
+      every connection is busy.
+    - Connections that are closed, or idle for a while and fail a `SELECT 1`, are
+      discarded and replaced on checkout.
     """
-    try:
-        cur.execute(
-            """
-            SELECT 1
-            FROM information_schema.tables
-            WHERE table_schema = 'public'
-              AND table_name = 'video_site_assignments'
-            LIMIT 1
-            """
-        )
-        return cur.fetchone() is not None
-    except Exception:
-        return False
+
+    def __init__(self, dsn, min_size, max_size, timeout, healthcheck_after):
+        self.dsn = dsn
+        self.min_size = max(0, min_size)
+        self.max_size = max(1, max_size, self.min_size)
+        self.timeout = timeout
+        self.healthcheck_after = healthcheck_after
+        self._lock = threading.Lock()
+        self._pool = None
+        self._slots = None
+        self._pid = None
+        self._last_used = {}
+        # Pools inherited across a fork are kept referenced (never closed) so the
+        # child does not terminate sockets that still belong to the parent.
+        self._orphaned_pools = []
+        self._stats = {
+            'checkouts': 0,
+            'timeouts': 0,
+            'discarded': 0,
+            'healthchecks': 0,
+            'wait_seconds_total': 0.0,
+            'wait_seconds_max': 0.0,
+            'in_use': 0,
+        }
+
+    def _ensure_pool(self):
+        pid = os.getpid()
+        if self._pool is not None and self._pid == pid:
+            return self._pool
+        with self._lock:
+            if self._pool is None or self._pid != pid:
+                if self._pool is not None:
+                    self._orphaned_pools.append(self._pool)
+                self._pool = psycopg2.pool.ThreadedConnectionPool(self.min_size, self.max_size, self.dsn)
+                self._slots = threading.BoundedSemaphore(self.max_size)
+                self._pid = pid
+                self._last_used = {}
+                self._stats['in_use'] = 0
+            return self._pool
+
+    def _is_healthy(self, conn):
+        if conn.closed:
+            return False
+        last_used = self._last_used.get(id(conn))
+        if last_used is not None and (time.monotonic() - last_used) < self.healthcheck_after:
+            return True
+        self._stats['healthchecks'] += 1
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def getconn(self):
+        pool = self._ensure_pool()
+        slots = self._slots
+        wait_started = time.monotonic()
+        if not slots.acquire(timeout=self.timeout):
+            with self._lock:
+                self._stats['timeouts'] += 1
+            raise psycopg2.pool.PoolError(
+                f"Timed out after {self.timeout}s waiting for a database connection "
+                f"(pool max size {self.max_size})."
+            )
+        waited = time.monotonic() - wait_started
+        try:
+            conn = pool.getconn()
+            if not self._is_healthy(conn):
+                with self._lock:
+                    self._stats['discarded'] += 1
+                self._last_used.pop(id(conn), None)
+                pool.putconn(conn, close=True)
+                conn = pool.getconn()
+        except Exception:
+            slots.release()
+            raise
+        with self._lock:
+            self._stats['checkouts'] += 1
+            self._stats['in_use'] += 1
+            self._stats['wait_seconds_total'] += waited
+            self._stats['wait_seconds_max'] = max(self._stats['wait_seconds_max'], waited)
+        return conn
+
+    def putconn(self, conn):
+        if conn is None:
+            return
+        pool = self._pool
+        if pool is None or self._pid != os.getpid():
+            # Connection belongs to a pool from another process; leave it alone.
+            return
+        discard = bool(conn.closed)
+        if not discard:
+            try:
+                # Never hand an open transaction (or an aborted one) to the next borrower.
+                if conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except psycopg2.Error:
+                discard = True
+        try:
+            if discard:
+                self._last_used.pop(id(conn), None)
+                with self._lock:
+                    self._stats['discarded'] += 1
+            else:
+                self._last_used[id(conn)] = time.monotonic()
+            pool.putconn(conn, close=discard)
+        finally:
+            with self._lock:
+                self._stats['in_use'] = max(0, self._stats['in_use'] - 1)
+            self._slots.release()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats.update({
+            'min_size': self.min_size,
+            'max_size': self.max_size,
+            'timeout': self.timeout,
+            'pid': self._pid,
+            'initialized': self._pool is not None and self._pid == os.getpid(),
+        })
+        return stats
+
+db_pool = DatabasePool(DATABASE_URL, DB_POOL_MIN_SIZE, DB_POOL_MAX_SIZE, DB_POOL_TIMEOUT, DB_POOL_HEALTHCHECK_AFTER)
 
 def get_db_connection():
-    """Establishes a connection to the PostgreSQL database."""
+    """Checks out a connection from the per-process pool. Pair with release_db_connection()."""
     try:
-        conn = psycopg2.connect(DATABASE_URL)
-        print("Database connection established successfully.") # Add a success print
-        return conn
+        return db_pool.getconn()
+    except psycopg2.pool.PoolError as e_pool:
+        print(f"Database pool error: {e_pool}")
+        raise
     except psycopg2.Error as e_db:
         print(f"psycopg2 Database Error connecting to database:")
         print(f"  Error Code: {e_db.pgcode}")
@@ -125,345 +282,2892 @@ def get_db_connection():
         # For now, let's re-raise to make it obvious during development if connection fails.
         raise
 
+def release_db_connection(conn):
+    """Returns a connection obtained from get_db_connection() to the pool."""
+    if conn is not None:
+        db_pool.putconn(conn)
+
+SCHEMA_RETRY_MIN = 1.0  # Seconds before retrying a failed schema detection; doubles per failure
+SCHEMA_RETRY_MAX = 60.0
+
+class SchemaCapabilities:
+    """
+    Registry of optional schema features (tables, columns, indexes), detected once per
+    worker process with a single catalog query and then answered from memory.
+
+    Lets the app run safely before/without migrations (e.g. video_site_assignments)
+    without probing information_schema on every request. Call refresh() - or POST
+    /admin/schema/refresh, which fans out to every worker - after running a migration.
+
+    If detection fails the last good result keeps answering, and retries back off
+    (SCHEMA_RETRY_MIN doubling up to SCHEMA_RETRY_MAX) instead of hitting the database
+    on every flag check.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._failures = 0
+        self._retry_at = 0.0
+        self.tables = frozenset()
+        self.columns = frozenset()
+        self.indexes = frozenset()
+        self.detected_at = None
+
+    def detect(self, cur):
+        """Loads the registry using an existing cursor (any cursor type)."""
+        cur.execute(
+            """
+            SELECT 'table' AS kind, table_name AS name FROM information_schema.tables
+            WHERE table_schema = current_schema()
+            UNION ALL
+            SELECT 'column', table_name || '.' || column_name FROM information_schema.columns
+            WHERE table_schema = current_schema()
+            UNION ALL
+            SELECT 'index', indexname FROM pg_indexes
+            WHERE schemaname = current_schema()
+            """
+        )
+        found = {'table': set(), 'column': set(), 'index': set()}
+        for row in cur.fetchall():
+            found[row[0]].add(row[1])
+        with self._lock:
+            self.tables = frozenset(found['table'])
+            self.columns = frozenset(found['column'])
+            self.indexes = frozenset(found['index'])
+            self.detected_at = datetime.datetime.now(datetime.timezone.utc)
+            self._loaded = True
+            self._failures = 0
+            self._retry_at = 0.0
+
+    def ensure_loaded(self):
+        if self._loaded or time.monotonic() < self._retry_at:
+            return
+        conn = None
+        cur = None
+        try:
+            conn = get_db_connection()
+            cur = conn.cursor()
+            self.detect(cur)
+        except (psycopg2.Error, Exception) as e:
+            # Leave unloaded so a later call retries; the last good detection (if any) keeps answering.
+            with self._lock:
+                self._failures += 1
+                delay = min(SCHEMA_RETRY_MAX, SCHEMA_RETRY_MIN * 2 ** (self._failures - 1))
+                self._retry_at = time.monotonic() + delay
+            print(f"Error detecting schema capabilities (retrying in {delay:.0f}s): {e}")
+        finally:
+            if cur:
+                cur.close()
+            if conn:
+                release_db_connection(conn)
+
+    def refresh(self):
+        with self._lock:
+            self._loaded = False
+            self._retry_at = 0.0
+        self.ensure_loaded()
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded = False
+
+    def has_table(self, table):
+        self.ensure_loaded()
+        return table in self.tables
+
+    def has_column(self, table, column):
+        self.ensure_loaded()
+        return f"{table}.{column}" in self.columns
+
+    def has_index(self, index_name):
+        self.ensure_loaded()
+        return index_name in self.indexes
+
+    def video_column(self, alias, column, fallback_sql):
+        """SQL expression for an optional videos column, or a typed fallback literal."""
+        return f"{alias}.{column}" if self.has_column('videos', column) else fallback_sql
+
+    @property
+    def detected(self):
+        """True once a detection has succeeded in this process."""
+        return self.detected_at is not None
+
+    @property
+    def site_assignments(self):
+        """
+        True if the database has the video_site_assignments table. Fails closed: until a
+        detection has succeeded this reads True, so queries filter by site (and error out if
+        the table really is missing) rather than showing one site's videos on another.
+        """
+        return self.has_table('video_site_assignments') or not self.detected
+
+    def summary(self):
+        self.ensure_loaded()
+        return {
+            'loaded': self._loaded,
+            'detection_failures': self._failures,
+            'detected_at': self.detected_at.isoformat() if self.detected_at else None,
+            'site_assignments': self.site_assignments,
+            'videos_keywords': 'videos.keywords' in self.columns,
+            'videos_created_at': 'videos.created_at' in self.columns,
+            'videos_likes': 'videos.likes' in self.columns,
+            'tables': len(self.tables),
+            'indexes': sorted(self.indexes),
+        }
+
+schema_capabilities = SchemaCapabilities()
+
+class RequestDataContext:
+    """
+    One pooled connection and one read-only snapshot transaction shared by every
+    loader that runs while rendering a single request.
+
+    The connection is checked out lazily on the first cursor() call and released in
+    the request teardown, so pages that never touch the DB never borrow one.
+    REPEATABLE READ gives every section of the page the same view of the catalog.
+    """
+
+    def __init__(self):
+        self.conn = None
+
+    def cursor(self):
+        if self.conn is None:
+            self.conn = get_db_connection()
+            self._begin_snapshot()
+        return self.conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
+
+    def _begin_snapshot(self):
+        cur = self.conn.cursor()
+        try:
+            cur.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY")
+        finally:
+            cur.close()
+
+    def recover(self):
+        """
+        Called by a loader after a failed query: the snapshot transaction is aborted,
+        so roll it back and start a fresh one for any loaders that run afterwards.
+        """
+        if self.conn is None:
+            return
+        try:
+            self.conn.rollback()
+            self._begin_snapshot()
+        except psycopg2.Error:
+            self.close()
+
+    def close(self):
+        if self.conn is not None:
+            conn, self.conn = self.conn, None
+            release_db_connection(conn)
+
+def acquire_data_context():
+    """
+    Returns (context, owned). Inside a request the context is bound to `g` and closed
+    at teardown; outside one (CLI, background threads) the caller owns and closes it.
+    """
+    if has_request_context():
+        ctx = g.get('data_ctx')
+        if ctx is None:
+            ctx = g.data_ctx = RequestDataContext()
+        return ctx, False
+    return RequestDataContext(), True
+
+@app.teardown_request
+def close_request_data_context(exc):
+    ctx = g.pop('data_ctx', None)
+    if ctx is not None:
+        ctx.close()
+
+CATEGORY_ICONS = {
+    'vision': 'bi-lightbulb',
+    'effort': 'bi-graph-up',
+    'systems': 'bi-gear-wide-connected',
+    'practice': 'bi-pencil-square',
+    'attitude': 'bi-emoji-smile',
+    # Add more icons here as new categories are created or discovered
+}
+
+TRENDING_WINDOW_HOURS = int(os.getenv('TRENDING_WINDOW_HOURS', '168'))
+TRENDING_HALF_LIFE_HOURS = float(os.getenv('TRENDING_HALF_LIFE_HOURS', '48'))
+TRENDING_LIKE_WEIGHT = 3  # A like counts as this many views
+TRENDING_LIMIT = 12
+
+def build_catalog_query(site_key, capabilities):
+    """
+    Returns (sql, params) for the single-round-trip catalog query used by load_data().
+
+    Postgres does the joins and JSON aggregation: one row comes back with a
+    `categories` array and a `videos` array, each video already carrying its
+    category keys, problems and site keys. When site_key is given only that
+    site's videos (and their assignment rows) are touched. With the engagement
+    rollups installed each video also carries a trending score read from them.
+    """
+    params = {
+        'site_key': site_key,
+        'trending_window': TRENDING_WINDOW_HOURS,
+        'trending_half_life': TRENDING_HALF_LIFE_HOURS,
+        'trending_like_weight': TRENDING_LIKE_WEIGHT,
+    }
+    site_assignments_enabled = capabilities.site_assignments
+    if site_key and site_assignments_enabled:
+        site_filter = """
+            WHERE EXISTS (
+                SELECT 1 FROM video_site_assignments f
+                WHERE f.video_db_id = v.id AND f.site_key = %(site_key)s
+            )"""
+    elif site_key and site_key != "vespa":
+        # Sister sites must not show the full library before the migration is applied.
+        site_filter = "WHERE FALSE"
+    else:
+        site_filter = ""
+
+    if site_assignments_enabled:
+        site_keys_join = """
+            LEFT JOIN LATERAL (
+                SELECT json_agg(vsa.site_key ORDER BY vsa.site_key) AS keys
+                FROM video_site_assignments vsa
+                WHERE vsa.video_db_id = sv.id
+            ) sa ON TRUE"""
+        site_keys_expr = "COALESCE(sa.keys, '[]'::json)"
+    else:
+        # Back-compat default: treat existing content as VESPA-visible
+        site_keys_join = ""
+        site_keys_expr = """'["vespa"]'::json"""
+
+    if capabilities.has_table('video_metadata'):
+        metadata_join = "LEFT JOIN video_metadata vm ON vm.video_db_id = sv.id"
+        aspect_expr = "CASE WHEN vm.width > 0 AND vm.height > 0 THEN vm.height::float8 / vm.width END"
+        duration_expr = "vm.duration_seconds"
+    else:
+        metadata_join = ""
+        aspect_expr = "NULL::float8"
+        duration_expr = "NULL::integer"
+
+    if capabilities.has_table('engagement_hourly'):
+        # Recent hours weigh more: each hour's engagement decays with the configured half-life.
+        trending_join = """
+                LEFT JOIN LATERAL (
+                    SELECT SUM(
+                        (eh.likes * %(trending_like_weight)s + eh.views)
+                        * power(0.5, EXTRACT(EPOCH FROM (NOW() - eh.hour)) / 3600.0 / %(trending_half_life)s)
+                    ) AS score
+                    FROM engagement_hourly eh
+                    WHERE eh.video_db_id = sv.id
+                      AND eh.hour >= NOW() - make_interval(hours => %(trending_window)s)
+                ) ts ON TRUE"""
+        trending_expr = "COALESCE(ts.score, 0)"
+    else:
+        trending_join = ""
+        trending_expr = "0"
+
+    sql = f"""
+        WITH site_videos AS (
+            SELECT v.id, v.platform, v.video_id_on_platform, v.title, v.view_count,
+                   {capabilities.video_column('v', 'likes', '0')} AS likes,
+                   {capabilities.video_column('v', 'created_at', 'NULL::timestamptz')} AS created_at,
+                   {capabilities.video_column('v', 'keywords', 'NULL::text')} AS keywords
+            FROM videos v
+            {site_filter}
+        )
+        SELECT
+            (
+                SELECT COALESCE(json_agg(json_build_object(
+                    'category_key', c.category_key,
+                    'name', c.name,
+                    'color', c.color,
+                    'description', c.description
+                ) ORDER BY c.id), '[]'::json)
+                FROM categories c
+            ) AS categories,
+            (
+                SELECT COALESCE(json_agg(json_build_object(
+                    'id', sv.id,
+                    'platform', sv.platform,
+                    'video_id_on_platform', sv.video_id_on_platform,
+                    'title', sv.title,
+                    'view_count', sv.view_count,
+                    'likes', sv.likes,
+                    'created_at', sv.created_at,
+                    'keywords', sv.keywords,
+                    'category_keys', COALESCE(ca.keys, '[]'::json),
+                    'problems', COALESCE(pa.problems, '[]'::json),
+                    'site_keys', {site_keys_expr},
+                    'trending_score', {trending_expr},
+                    'aspect_ratio', {aspect_expr},
+                    'duration_seconds', {duration_expr}
+                ) ORDER BY sv.id), '[]'::json)
+                FROM site_videos sv
+                LEFT JOIN LATERAL (
+                    SELECT json_agg(vca.category_db_key ORDER BY vca.id) AS keys
+                    FROM video_category_assignments vca
+                    WHERE vca.video_db_id = sv.id
+                ) ca ON TRUE
+                LEFT JOIN LATERAL (
+                    SELECT json_agg(json_build_object('text', p.problem_text, 'theme', p.theme) ORDER BY vp.id) AS problems
+                    FROM video_problems vp
+                    JOIN problems p ON vp.problem_id = p.problem_id
+                    WHERE vp.video_db_id = sv.id
+                ) pa ON TRUE
+                {site_keys_join}
+                {trending_join}
+                {metadata_join}
+            ) AS videos
+    """
+    return sql, params
+
+def _parse_json_timestamp(value):
+    """json_build_object renders TIMESTAMPTZ as ISO 8601 text; turn it back into an aware datetime."""
+    if not value:
+        return None
+    parsed = datetime.datetime.fromisoformat(value)
+    if not parsed.tzinfo:
+        parsed = parsed.replace(tzinfo=datetime.timezone.utc)
+    return parsed
+
+class VideoRecord:
+    """
+    Compact, read-only video row. One instance per video is shared by every catalog
+    structure (category lists, series, search and suggest indexes, rendered pages), so
+    the fields live in __slots__ rather than a per-video dict. Mapping-style access
+    (`video['db_id']`, `video.get('likes')`) and Jinja's `video.title` both work.
+    """
+    FIELDS = (
+        'db_id', 'platform', 'video_id_on_platform', 'title', 'view_count', 'likes', 'created_at',
+        'keywords', 'category_keys', 'problems', 'site_keys', 'trending_score', 'aspect_ratio',
+        'duration_seconds',
+    )
+    __slots__ = FIELDS
+    KEYS = FIELDS[:3] + ('video_id',) + FIELDS[3:]  # video_id is an alias kept for the templates
+    _KEY_SET = frozenset(KEYS)
+
+    def __init__(self, db_id, platform, video_id_on_platform, title, view_count=0, likes=0,
+                 created_at=None, keywords='', category_keys=(), problems=(), site_keys=(),
+                 trending_score=0.0, aspect_ratio=None, duration_seconds=None):
+        values = (db_id, platform, video_id_on_platform, title, view_count, likes, created_at,
+                  keywords, category_keys, problems, site_keys, trending_score, aspect_ratio,
+                  duration_seconds)
+        for name, value in zip(self.FIELDS, values):
+            object.__setattr__(self, name, value)
+
+    @classmethod
+    def from_mapping(cls, video, interner=None):
+        """Builds a record from a video dict (or a DB row with `id`), interning shared values."""
+        interner = interner or RecordInterner()
+        db_id = video['db_id'] if 'db_id' in video else video['id']
+        platform_id = video.get('video_id_on_platform') or video.get('video_id')
+        trending_score = video.get('trending_score')
+        return cls(
+            db_id,
+            interner.key(video.get('platform')),
+            platform_id,
+            video.get('title'),
+            video.get('view_count') or 0,
+            video.get('likes') or 0,
+            video.get('created_at'),
+            video.get('keywords') or '',
+            interner.keys(video.get('category_keys')),
+            interner.problems(video.get('problems')),
+            interner.keys(video.get('site_keys')),
+            float(trending_score) if trending_score else 0.0,
+            video.get('aspect_ratio'),
+            video.get('duration_seconds'),
+        )
+
+    @property
+    def video_id(self):
+        return self.video_id_on_platform
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"VideoRecord is read-only (cannot set {name!r})")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"VideoRecord is read-only (cannot delete {name!r})")
+
+    def __reduce__(self):
+        return (VideoRecord, tuple(getattr(self, name) for name in self.FIELDS))
+
+    def replace(self, **changes):
+        """A copy with some fields changed (records themselves never change)."""
+        values = {name: getattr(self, name) for name in self.FIELDS}
+        values.update(changes)
+        return VideoRecord(**values)
+
+    def __getitem__(self, key):
+        if key in self._KEY_SET:
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        if key in self._KEY_SET:
+            return getattr(self, key)
+        return default
+
+    def __contains__(self, key):
+        return key in self._KEY_SET
+
+    def __iter__(self):
+        return iter(self.KEYS)
+
+    def __len__(self):
+        return len(self.KEYS)
+
+    def keys(self):
+        return self.KEYS
+
+    def items(self):
+        return [(key, getattr(self, key)) for key in self.KEYS]
+
+    def __repr__(self):
+        return f"VideoRecord(db_id={self.db_id!r}, platform={self.platform!r}, title={self.title!r})"
+
+Mapping.register(VideoRecord)
+
+class RecordInterner:
+    """
+    Per-build pools for the values many videos repeat: platform and category/site keys are
+    sys.intern'ed, equal key tuples and problem tags are stored once per catalog.
+    """
+
+    def __init__(self):
+        self._tuples = {}
+        self._problem_tags = {}
+        self._problem_tuples = {}
+
+    def key(self, value):
+        return sys.intern(value) if isinstance(value, str) else value
+
+    def keys(self, values):
+        keys = tuple(self.key(value) for value in values or ())
+        return self._tuples.setdefault(keys, keys)
+
+    def problems(self, problems):
+        pairs = tuple((problem.get('text'), problem.get('theme')) for problem in problems or ())
+        shared = self._problem_tuples.get(pairs)
+        if shared is None:
+            tags = []
+            for text, theme in pairs:
+                tag = self._problem_tags.get((text, theme))
+                if tag is None:
+                    tag = MappingProxyType({'text': text, 'theme': self.key(theme)})
+                    self._problem_tags[(text, theme)] = tag
+                tags.append(tag)
+            shared = self._problem_tuples[pairs] = tuple(tags)
+        return shared
+
+FRESH_NEW_VIDS_KEY = 'fresh_new_vids'
+FRESH_DAYS = 14  # How long a new video stays in "Fresh New Vids"
+MOST_VIEWED_KEY = 'most_viewed'
+TRENDING_KEY = 'trending'
+
+def category_order_key(category_key, video):
+    """
+    Total order of the videos inside a category: likes desc, title asc for regular categories,
+    newest first for Fresh New Vids, views desc for Most Viewed, score desc for Trending, with db_id as the final tie-break. The catalog API's
+    keyset cursors are built from this key, so it must match how assemble_catalog sorts.
+    """
+    if category_key == FRESH_NEW_VIDS_KEY:
+        return (-video['created_at'].timestamp(), video['db_id'])
+    if category_key == MOST_VIEWED_KEY:
+        return (-(video.get('view_count') or 0), video.get('title') or '', video['db_id'])
+    if category_key == TRENDING_KEY:
+        return (-(video.get('trending_score') or 0.0), video.get('title') or '', video['db_id'])
+    return (-(video.get('likes') or 0), video.get('title') or '', video['db_id'])
+
+def assemble_catalog(catalog_row):
+    """
+    Turns the row returned by build_catalog_query() into the (categories_map, all_videos_list)
+    structure the templates use: category dicts holding VideoRecords sorted by likes, plus
+    the dynamic "Fresh New Vids", "Most Viewed" and "Trending" categories.
+    """
+    categories_map = {}
+    all_videos_list = []
+
+    for cat_row in catalog_row['categories']:
+        categories_map[cat_row['category_key']] = {
+            'name': cat_row['name'],
+            'color': cat_row['color'],
+            'description': cat_row['description'],
+            'videos': [], # Filled below, sorted by likes
+            'icon': CATEGORY_ICONS.get(cat_row['category_key'].lower(), 'bi-collection-play') # Use .lower() for lookup & Default icon
+        }
+
+    interner = RecordInterner()
+    for vid_row in catalog_row['videos']:
+        trending_score = vid_row.get('trending_score')
+        video_dict = VideoRecord(
+            vid_row['id'],
+            interner.key(vid_row['platform']),
+            vid_row['video_id_on_platform'],
+            vid_row['title'],
+            vid_row['view_count'],
+            vid_row['likes'],
+            _parse_json_timestamp(vid_row['created_at']),
+            vid_row['keywords'] if vid_row['keywords'] is not None else '', # Ensure keywords is a string
+            interner.keys(key for key in vid_row['category_keys'] if key in categories_map),
+            interner.problems(vid_row['problems']),
+            interner.keys(vid_row['site_keys']),
+            float(trending_score) if trending_score else 0.0,
+            vid_row.get('aspect_ratio'),  # height / width of the native player, when harvested
+            vid_row.get('duration_seconds'),
+        )
+        all_videos_list.append(video_dict)
+        for category_key in video_dict.category_keys:
+            categories_map[category_key]['videos'].append(video_dict)
+
+    # Sort videos within each category by likes (descending) and then title (ascending)
+    for category_key, cat_data in categories_map.items():
+        cat_data['videos'].sort(key=lambda v: category_order_key(category_key, v))
+
+    # Dynamically create and populate "Fresh New Vids" category
+    fresh_vids_category_key = FRESH_NEW_VIDS_KEY
+
+    # Calculate the cutoff date for "fresh" videos (last 14 days)
+    fourteen_days_ago = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(days=FRESH_DAYS)
+    fresh_vids_list = [
+        video for video in all_videos_list
+        if video.get('created_at') and video['created_at'] >= fourteen_days_ago
+    ]
+    # Sort these fresh videos by created_at descending (most recent first)
+    fresh_vids_list.sort(key=lambda v: category_order_key(fresh_vids_category_key, v))
+
+    # Only add the "Fresh New Vids" category if there are any fresh videos
+    if fresh_vids_list:
+        categories_map[fresh_vids_category_key] = {
+            'name': 'Fresh New Vids',
+            'color': '#00e5db',  # Theme color as requested
+            'description': 'Videos added in the last 14 days!',
+            'videos': fresh_vids_list,
+            'icon': 'bi-stars' # Icon for Fresh New Vids
+        }
+
+    # "Most Viewed": every video that has been played at least once, by view_count
+    most_viewed_list = sorted(
+        (video for video in all_videos_list if video.get('view_count')),
+        key=lambda v: category_order_key(MOST_VIEWED_KEY, v)
+    )
+    if most_viewed_list:
+        categories_map[MOST_VIEWED_KEY] = {
+            'name': 'Most Viewed',
+            'color': '#0d6efd',
+            'description': 'The videos played most often.',
+            'videos': most_viewed_list,
+            'icon': 'bi-eye'
+        }
+
+    # "Trending": highest recent engagement, scored by the catalog query from the hourly rollups
+    trending_list = heapq.nsmallest(
+        TRENDING_LIMIT,
+        (video for video in all_videos_list if video['trending_score'] > 0),
+        key=lambda v: category_order_key(TRENDING_KEY, v)
+    )
+    if trending_list:
+        categories_map[TRENDING_KEY] = {
+            'name': 'Trending',
+            'color': '#fd7e14',
+            'description': 'What students and staff are watching and liking this week.',
+            'videos': trending_list,
+            'icon': 'bi-graph-up-arrow'
+        }
+
+    return categories_map, all_videos_list
+
 def load_data(site_key=None):
     """Loads categories, videos (including keywords and problems) from the Supabase PostgreSQL database.
 
     If site_key is provided, videos are filtered to those assigned to that site (when the DB supports it).
+    Everything is fetched in a single aggregated query (see build_catalog_query).
     """
-    conn = None
-    categories_map = {}
-    all_videos_list = []
-    videos_by_db_id = {} # Helper to quickly find videos by their database ID
-
-    # Define icons for categories
-    category_icons = {
-        'vision': 'bi-lightbulb',
-        'effort': 'bi-graph-up',
-        'systems': 'bi-gear-wide-connected',
-        'practice': 'bi-pencil-square',
-        'attitude': 'bi-emoji-smile',
-        # Add more icons here as new categories are created or discovered
-    }
+    try:
+        return fetch_catalog(site_key)
+    except (psycopg2.Error, Exception) as e:
+        flash(f"Database error loading data: {e}", "danger")
+        print(f"Database error in load_data: {e}")
+        # Return empty structures on error to prevent app crash, but log/flash the error
+        return {}, [] 
+
+def fetch_catalog(site_key=None):
+    """The query behind load_data(); raises on database errors instead of returning empty structures."""
+    ctx, owns_ctx = acquire_data_context()
+    cur = None
 
     try:
-        conn = get_db_connection()
-        cur = conn.cursor(cursor_factory=psycopg2.extras.DictCursor) # Use DictCursor for easy column access by name
-
-        # 1. Fetch Categories
-        cur.execute("SELECT category_key, name, color, description FROM categories ORDER BY id") # Added ORDER BY for consistency
-        db_categories = cur.fetchall()
-        for cat_row in db_categories:
-            categories_map[cat_row['category_key']] = {
-                'name': cat_row['name'],
-                'color': cat_row['color'],
-                'description': cat_row['description'],
-                'videos': [], # Initialize with an empty list for videos
-                'icon': category_icons.get(cat_row['category_key'].lower(), 'bi-collection-play') # Use .lower() for lookup & Default icon
-            }
+        cur = ctx.cursor()
+        sql, params = build_catalog_query(site_key, schema_capabilities)
+        cur.execute(sql, params)
+        return assemble_catalog(cur.fetchone())
+    except (psycopg2.Error, Exception):
+        ctx.recover()
+        raise
+    finally:
+        if cur:
+            cur.close()
+        if owns_ctx:
+            ctx.close()
 
-        # 2. Fetch All Videos (including keywords, likes, created_at)
-        #    Optionally filter by site assignment if enabled.
-        site_assignments_enabled = _video_site_assignments_enabled(cur)
-        if site_key and site_assignments_enabled:
-            cur.execute(
-                """
-                SELECT v.id, v.platform, v.video_id_on_platform, v.title, v.view_count, v.likes, v.created_at, v.keywords
-                FROM videos v
-                JOIN video_site_assignments vsa ON v.id = vsa.video_db_id
-                WHERE vsa.site_key = %s
-                ORDER BY v.id
-                """,
-                (site_key,)
+CATALOG_CACHE_TTL = float(os.getenv('CATALOG_CACHE_TTL', '300'))  # Seconds; safety net on top of version bumps
+
+class CatalogSnapshot:
+    """
+    Immutable view of the catalog for one site at one catalog version.
+    `categories` is a read-only mapping, videos are VideoRecords and video lists are tuples,
+    so a snapshot can be shared by every request (and thread) in the worker.
+    """
+    __slots__ = ('site_key', 'version', 'categories', 'videos', 'by_id', 'ranking', 'built_at', 'built_monotonic', 'build_seconds')
+
+    def __init__(self, site_key, version, categories, videos, build_seconds):
+        self.site_key = site_key
+        self.version = version
+        self.categories = categories
+        self.videos = videos
+        self.by_id = MappingProxyType({video.db_id: video for video in videos})
+        self.ranking = RankingIndex(categories, videos)  # The one mutable part: live like counts
+        self.built_at = datetime.datetime.now(datetime.timezone.utc)
+        self.built_monotonic = time.monotonic()
+        self.build_seconds = build_seconds
+
+def _freeze_catalog(categories_map, all_videos_list):
+    """Converts load_data() output into shared read-only structures (one VideoRecord per video)."""
+    interner = RecordInterner()
+    records_by_id = {}
+
+    def frozen(video):
+        if isinstance(video, VideoRecord):
+            return video
+        record = records_by_id.get(id(video))
+        if record is None:
+            record = records_by_id[id(video)] = VideoRecord.from_mapping(video, interner)
+        return record
+
+    videos = tuple(frozen(v) for v in all_videos_list)
+    frozen_categories = MappingProxyType({
+        cat_key: MappingProxyType({**cat_data, 'videos': tuple(frozen(v) for v in cat_data.get('videos', []))})
+        for cat_key, cat_data in categories_map.items()
+    })
+    return frozen_categories, videos
+
+RANKED_LIST_BLOCK = 128  # Target entries per RankedList block; blocks split at twice this
+
+class RankedList:
+    """
+    Videos kept in ascending `rank_key` order, stored as a list of sorted blocks (each with
+    its keys alongside) plus the last key of every block. An update bisects the block
+    maxima and then the one block, so finding a video is O(log n) and moving it shifts at
+    most 2 * RANKED_LIST_BLOCK entries instead of the whole list. A block that grows past
+    twice the target is split in two; an emptied one is dropped. `revision` counts changes
+    to this list alone, for keying the fragments that render it.
+    """
+
+    def __init__(self, rank_key, videos=(), keys=None, block_size=RANKED_LIST_BLOCK):
+        self.rank_key = rank_key
+        self.block_size = block_size
+        if keys is None:
+            keys = [rank_key(video) for video in videos]
+        videos = list(videos)
+        order = sorted(range(len(keys)), key=keys.__getitem__)  # Linear when already in order
+        self._key_blocks = [
+            [keys[i] for i in order[start:start + block_size]] for start in range(0, len(order), block_size)
+        ]
+        self._video_blocks = [
+            [videos[i] for i in order[start:start + block_size]] for start in range(0, len(order), block_size)
+        ]
+        self._maxes = [block[-1] for block in self._key_blocks]
+        self._len = len(order)
+        self._frozen = None
+        self.revision = 0
+
+    def __len__(self):
+        return self._len
+
+    def _locate(self, key):
+        """(block, position) where `key` is or would go; block is len(blocks) past the end."""
+        block = bisect.bisect_left(self._maxes, key)
+        if block == len(self._maxes):
+            return block, 0
+        return block, bisect.bisect_left(self._key_blocks[block], key)
+
+    def remove(self, video):
+        key = self.rank_key(video)
+        block, index = self._locate(key)
+        if block == len(self._maxes):
+            return
+        keys = self._key_blocks[block]
+        if index < len(keys) and keys[index] == key:
+            del keys[index]
+            del self._video_blocks[block][index]
+            if keys:
+                self._maxes[block] = keys[-1]
+            else:
+                del self._key_blocks[block], self._video_blocks[block], self._maxes[block]
+            self._len -= 1
+            self._frozen = None
+            self.revision += 1
+
+    def insert(self, video):
+        key = self.rank_key(video)
+        block, index = self._locate(key)
+        if not self._maxes:
+            self._key_blocks.append([])
+            self._video_blocks.append([])
+            self._maxes.append(key)
+            block, index = 0, 0
+        elif block == len(self._maxes):
+            block = len(self._maxes) - 1  # Past every key: append to the last block
+            index = len(self._key_blocks[block])
+        keys = self._key_blocks[block]
+        videos = self._video_blocks[block]
+        keys.insert(index, key)
+        videos.insert(index, video)
+        self._maxes[block] = keys[-1]
+        if len(keys) > 2 * self.block_size:
+            half = len(keys) // 2
+            self._key_blocks[block:block + 1] = [keys[:half], keys[half:]]
+            self._video_blocks[block:block + 1] = [videos[:half], videos[half:]]
+            self._maxes[block:block + 1] = [keys[half - 1], keys[-1]]
+        self._len += 1
+        self._frozen = None
+        self.revision += 1
+
+    def head(self, count):
+        head = []
+        for videos in self._video_blocks:
+            if len(head) >= count:
+                break
+            head.extend(videos[:count - len(head)])
+        return tuple(head)
+
+    def tail_from(self, key):
+        """Videos ranked at or after `key`, last first."""
+        block, index = self._locate(key)
+        if block == len(self._maxes):
+            return ()
+        tail = self._video_blocks[block][index:]
+        for videos in self._video_blocks[block + 1:]:
+            tail.extend(videos)
+        return tuple(reversed(tail))
+
+    def videos(self):
+        if self._frozen is None:
+            self._frozen = tuple(video for videos in self._video_blocks for video in videos)
+        return self._frozen
+
+def _likes_rank(video):
+    return category_order_key(None, video)  # The likes-desc order shared by every regular category
+
+def _created_rank(video):
+    # Oldest first, so newest-first (created desc, db_id asc) is the reversed tail.
+    return (video.created_at, -video.db_id)
+
+MOST_LIKED_LIST = 'most_liked'  # RankingIndex.list_revision() name of the whole-catalog likes order
+
+class RankingIndex:
+    """
+    Live orderings for one snapshot: every likes-ordered category, the whole catalog by
+    likes (for "most liked") and the catalog by created_at (for "Fresh New Vids").
+
+    Snapshot records are immutable, so a like replaces the video's record here with a
+    copy carrying the new count and moves it within each list it belongs to (bisect,
+    O(log n) to locate) instead of rebuilding the catalog. `revision` counts those
+    updates; list_revision() gives the count for a single list, so a cached fragment is
+    only re-rendered when the list it shows changed.
+    """
+
+    DERIVED_KEYS = (FRESH_NEW_VIDS_KEY, MOST_VIEWED_KEY, TRENDING_KEY)
+
+    def __init__(self, categories, videos):
+        self._lock = threading.Lock()
+        self.revision = 0
+        self.updated_at = None  # UTC time of the last update(), for Last-Modified headers
+        self._videos = {video.db_id: video for video in videos}
+        likes_keys = {video.db_id: _likes_rank(video) for video in videos}
+        self._by_likes = RankedList(_likes_rank, videos, [likes_keys[video.db_id] for video in videos])
+        self._by_created = RankedList(_created_rank, [video for video in videos if video.created_at])
+        self._categories = {}
+        for cat_key, cat_data in categories.items():
+            if cat_key in self.DERIVED_KEYS:
+                continue
+            cat_videos = cat_data.get('videos', ())
+            self._categories[cat_key] = RankedList(
+                _likes_rank, cat_videos, [likes_keys.get(video.db_id) or _likes_rank(video) for video in cat_videos]
             )
-            db_videos = cur.fetchall()
-        elif site_key and not site_assignments_enabled and site_key != "vespa":
-            # For non-default sister sites, if the migration hasn't been applied yet,
-            # return no videos rather than accidentally showing the full library.
-            db_videos = []
-        else:
-            cur.execute("SELECT id, platform, video_id_on_platform, title, view_count, likes, created_at, keywords FROM videos ORDER BY id")
-            db_videos = cur.fetchall()
-
-        for vid_row in db_videos:
-            video_dict = {
-                'db_id': vid_row['id'], 
-                'platform': vid_row['platform'],
-                'video_id': vid_row['video_id_on_platform'], 
-                'video_id_on_platform': vid_row['video_id_on_platform'], 
-                'title': vid_row['title'],
-                'view_count': vid_row['view_count'],
-                'likes': vid_row['likes'],
-                'created_at': vid_row['created_at'],
-                'keywords': vid_row['keywords'] if vid_row['keywords'] is not None else '', # Ensure keywords is a string
-                'category_keys': [], 
-                'problems': [],
-                'site_keys': []  # populated if video_site_assignments exists
+
+    def _lists_for(self, video):
+        lists = [self._by_likes]
+        if video.created_at:
+            lists.append(self._by_created)
+        lists.extend(self._categories[key] for key in video.category_keys if key in self._categories)
+        return lists
+
+    def update(self, video):
+        """Moves a changed video to its new position in every ordering. False if it isn't in this snapshot."""
+        with self._lock:
+            old = self._videos.get(video.db_id)
+            if old is None:
+                return False
+            for ranked in self._lists_for(old):
+                ranked.remove(old)
+            for ranked in self._lists_for(video):
+                ranked.insert(video)
+            self._videos[video.db_id] = video
+            self.revision += 1
+            self.updated_at = datetime.datetime.now(datetime.timezone.utc)
+            return True
+
+    def update_likes(self, video_id, likes):
+        old = self._videos.get(video_id)
+        if old is None or old.likes == likes:
+            return False
+        return self.update(old.replace(likes=likes))
+
+    def get(self, video_id):
+        return self._videos.get(video_id)
+
+    def video_ids(self):
+        """Ids of every video in this snapshot (sorted)."""
+        with self._lock:
+            return sorted(self._videos)
+
+    def top_liked(self, count):
+        with self._lock:
+            return self._by_likes.head(count)
+
+    def created_since(self, cutoff):
+        """Videos created at or after `cutoff`, newest first."""
+        with self._lock:
+            return self._by_created.tail_from((cutoff, float('-inf')))
+
+    def category(self, category_key):
+        """The live order of a likes-ordered category, or None for derived/unknown ones."""
+        with self._lock:
+            ranked = self._categories.get(category_key)
+            return ranked.videos() if ranked is not None else None
+
+    def list_revision(self, category_key):
+        """Change count of the list behind a homepage section: a category, Fresh New Vids or MOST_LIKED_LIST."""
+        with self._lock:
+            if category_key == MOST_LIKED_LIST:
+                return self._by_likes.revision
+            if category_key == FRESH_NEW_VIDS_KEY:
+                return self._by_created.revision
+            ranked = self._categories.get(category_key)
+            return ranked.revision if ranked is not None else 0  # Derived lists never change in place
+
+    def summary(self):
+        with self._lock:
+            return {
+                'revision': self.revision,
+                'videos': len(self._videos),
+                'categories': len(self._categories),
             }
-            all_videos_list.append(video_dict)
-            videos_by_db_id[vid_row['id']] = video_dict
-
-        # 2b. Attach site assignments to videos (useful for admin display/edit)
-        if site_assignments_enabled and videos_by_db_id:
-            cur.execute("SELECT video_db_id, site_key FROM video_site_assignments")
-            for row in cur.fetchall():
-                video_db_id = row['video_db_id']
-                if video_db_id in videos_by_db_id:
-                    videos_by_db_id[video_db_id]['site_keys'].append(row['site_key'])
-        else:
-            # Back-compat default: treat existing content as VESPA-visible
-            for v in all_videos_list:
-                v['site_keys'] = ['vespa']
-
-        # 3. Fetch Video-Category Assignments and Link them
-        cur.execute("SELECT video_db_id, category_db_key FROM video_category_assignments")
-        assignments = cur.fetchall()
-        for assignment in assignments:
-            video_db_id = assignment['video_db_id']
-            category_key = assignment['category_db_key']
-
-            if category_key in categories_map and video_db_id in videos_by_db_id:
-                videos_by_db_id[video_db_id]['category_keys'].append(category_key)
-                categories_map[category_key]['videos'].append(videos_by_db_id[video_db_id])
-
-        # 4. Fetch Video-Problem Assignments and Link them
-        cur.execute("""
-            SELECT vp.video_db_id, p.problem_text, p.theme
-            FROM video_problems vp
-            JOIN problems p ON vp.problem_id = p.problem_id
-        """)
-        problem_assignments = cur.fetchall()
-        for prob_assign in problem_assignments:
-            video_db_id = prob_assign['video_db_id']
-            if video_db_id in videos_by_db_id:
-                videos_by_db_id[video_db_id]['problems'].append({
-                    'text': prob_assign['problem_text'],
-                    'theme': prob_assign['theme']
-                })
 
-        # Sort videos within each category by likes (descending) and then title (ascending)
-        for cat_data in categories_map.values():
-            # Ensure 'likes' exists and default to 0 if not; ensure 'title' exists and default to empty string
-            cat_data['videos'].sort(key=lambda v: (v.get('likes', 0), v.get('title', '')), reverse=False) # Initial sort for title ascending
-            cat_data['videos'].sort(key=lambda v: v.get('likes', 0), reverse=True) # Stable sort for likes descending
+def ranked_category_videos(snapshot, category_key, category):
+    """
+    A category's videos in their current order: likes-ordered categories and Fresh New Vids
+    come from the snapshot's RankingIndex, the other derived categories as built.
+    """
+    if category_key == FRESH_NEW_VIDS_KEY:
+        cutoff = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(days=FRESH_DAYS)
+        return snapshot.ranking.created_since(cutoff)
+    ranked = snapshot.ranking.category(category_key)
+    return ranked if ranked is not None else category.get('videos', ())
 
-        # Dynamically create and populate "Fresh New Vids" category
-        fresh_vids_category_key = 'fresh_new_vids'
-        fresh_vids_list = []
-        
-        # Calculate the cutoff date for "fresh" videos (last 14 days)
-        # Ensure datetime and timedelta are available (datetime is imported, timedelta needs to be)
-        # datetime.timedelta is part of the datetime module.
-        fourteen_days_ago = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(days=14)
-
-        temp_fresh_vids = []
-        for video in all_videos_list: # all_videos_list now contains video dicts with 'created_at'
-            if video.get('created_at'): # Check if created_at is not None
-                video_created_at = video['created_at']
-                # Ensure video_created_at is offset-aware if it's not already
-                # (psycopg2 usually makes TIMESTAMPTZ aware, but good to be safe)
-                if not video_created_at.tzinfo:
-                    video_created_at = video_created_at.replace(tzinfo=datetime.timezone.utc)
-                
-                if video_created_at >= fourteen_days_ago:
-                    temp_fresh_vids.append(video)
-        
-        # Sort these fresh videos by created_at descending (most recent first)
-        temp_fresh_vids.sort(key=lambda v: v.get('created_at'), reverse=True)
-        fresh_vids_list = temp_fresh_vids
-
-        print(f"DEBUG: Found {len(fresh_vids_list)} fresh videos.") # Temporary debug line
-
-        # Only add the "Fresh New Vids" category if there are any fresh videos
-        if fresh_vids_list:
-            categories_map[fresh_vids_category_key] = {
-                'name': 'Fresh New Vids',
-                'color': '#00e5db',  # Theme color as requested
-                'description': 'Videos added in the last 14 days!',
-                'videos': fresh_vids_list,
-                'icon': 'bi-stars' # Icon for Fresh New Vids
+class CatalogCache:
+    """
+    Per-process cache of CatalogSnapshot objects keyed by site_key.
+
+    Admin write paths call bump_version(); a snapshot built for an older version (or
+    older than the TTL) is rebuilt on the next read. Rebuilds are single-flight per
+    site so a burst of requests after an edit triggers one fetch_catalog() call. A
+    builder that raises yields an empty snapshot for that request only; an empty
+    catalog that loaded fine is cached like any other.
+    """
+
+    def __init__(self, builder, ttl):
+        self._builder = builder
+        self._ttl = ttl
+        self._lock = threading.Lock()
+        self._build_locks = {}
+        self._snapshots = {}
+        self._version = 0
+        self._stats = {
+            'hits': 0,
+            'misses': 0,
+            'rebuilds': 0,
+            'rebuild_errors': 0,
+            'invalidations': 0,
+            'last_rebuild_seconds': None,
+            'total_rebuild_seconds': 0.0,
+        }
+
+    @property
+    def version(self):
+        return self._version
+
+    def bump_version(self):
+        with self._lock:
+            self._version += 1
+            self._stats['invalidations'] += 1
+            return self._version
+
+    def _is_fresh(self, snapshot):
+        return (
+            snapshot is not None
+            and snapshot.version == self._version
+            and (time.monotonic() - snapshot.built_monotonic) < self._ttl
+        )
+
+    def get(self, site_key):
+        snapshot = self._snapshots.get(site_key)
+        if self._is_fresh(snapshot):
+            with self._lock:
+                self._stats['hits'] += 1
+            return snapshot
+
+        with self._lock:
+            build_lock = self._build_locks.setdefault(site_key, threading.Lock())
+        with build_lock:
+            snapshot = self._snapshots.get(site_key)
+            if self._is_fresh(snapshot):
+                with self._lock:
+                    self._stats['hits'] += 1
+                return snapshot
+
+            # Capture the version before loading: a bump that lands mid-build leaves
+            # this snapshot stale, so the following read rebuilds again.
+            version = self._version
+            started = time.monotonic()
+            try:
+                categories_map, all_videos_list = self._builder(site_key)
+                failed = False
+            except (psycopg2.Error, Exception) as e:
+                print(f"Database error rebuilding catalog for site {site_key!r}: {e}")
+                if has_request_context():
+                    flash(f"Database error loading data: {e}", "danger")
+                categories_map, all_videos_list = {}, []
+                failed = True
+            elapsed = time.monotonic() - started
+            categories, videos = _freeze_catalog(categories_map, all_videos_list)
+            snapshot = CatalogSnapshot(site_key, version, categories, videos, elapsed)
+
+            with self._lock:
+                self._stats['misses'] += 1
+                if failed:
+                    # Don't pin an error: the next read tries the database again.
+                    self._stats['rebuild_errors'] += 1
+                else:
+                    self._stats['rebuilds'] += 1
+                    self._stats['last_rebuild_seconds'] = elapsed
+                    self._stats['total_rebuild_seconds'] += elapsed
+                    self._snapshots[site_key] = snapshot
+            return snapshot
+
+    def peek(self, site_key):
+        """The cached snapshot if it is still fresh, else None. Never builds."""
+        snapshot = self._snapshots.get(site_key)
+        return snapshot if self._is_fresh(snapshot) else None
+
+    def apply_likes(self, video_id, likes):
+        """Moves a liked video within every cached snapshot's rankings (no rebuild)."""
+        with self._lock:
+            snapshots = list(self._snapshots.values())
+        for snapshot in snapshots:
+            snapshot.ranking.update_likes(video_id, likes)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['version'] = self._version
+            stats['ttl'] = self._ttl
+            stats['sites'] = {
+                str(site_key): {
+                    'version': snap.version,
+                    'videos': len(snap.videos),
+                    'built_at': snap.built_at.isoformat(),
+                    'build_seconds': snap.build_seconds,
+                    'ranking': snap.ranking.summary(),
+                }
+                for site_key, snap in self._snapshots.items()
             }
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_ratio'] = (stats['hits'] / lookups) if lookups else None
+        return stats
+
+catalog_cache = CatalogCache(fetch_catalog, CATALOG_CACHE_TTL)
+
+def get_catalog_snapshot(site_key=None):
+    """Returns the cached CatalogSnapshot for a public site (None = the whole library)."""
+    return catalog_cache.get(site_key)
+
+def load_catalog(site_key=None):
+    """Cached, read-only equivalent of load_data() for public pages."""
+    snapshot = get_catalog_snapshot(site_key)
+    return snapshot.categories, snapshot.videos
 
+CATEGORY_PAGE_SIZE = int(os.getenv('CATEGORY_PAGE_SIZE', '12'))  # Videos per category shipped with the homepage
+CATEGORY_PAGE_MAX = 50
+
+def encode_category_cursor(category_key, video):
+    """Opaque keyset cursor pointing just after `video` in its category's order."""
+    raw = json.dumps(list(category_order_key(category_key, video)), separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_category_cursor(category_key, cursor):
+    """Inverse of encode_category_cursor; raises ValueError for anything it did not produce."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = json.loads(raw.decode('utf-8'))
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"Malformed cursor: {e}")
+    if category_key == FRESH_NEW_VIDS_KEY:
+        expected_types = ((int, float), int)
+    elif category_key == TRENDING_KEY:
+        expected_types = ((int, float), str, int)
+    else:
+        expected_types = (int, str, int)
+    if (not isinstance(values, list) or len(values) != len(expected_types)
+            or not all(isinstance(v, t) and not isinstance(v, bool) for v, t in zip(values, expected_types))):
+        raise ValueError("Cursor does not match this category's ordering.")
+    return tuple(values)
+
+def page_category_videos(category_videos, category_key, cursor=None, limit=CATEGORY_PAGE_SIZE):
+    """
+    Returns (page, next_cursor) from a category's sorted video list.
+
+    Keyset rather than offset pagination: the cursor holds the sort key of the last video
+    served and the next page starts at the first video ordering after it (found by bisect).
+    A like or a newly added video between requests therefore cannot shift the window and
+    repeat or skip entries the way an OFFSET would.
+    """
+    start = 0
+    if cursor:
+        after = decode_category_cursor(category_key, cursor)
+        start = bisect.bisect_right(category_videos, after, key=lambda v: category_order_key(category_key, v))
+    page = category_videos[start:start + limit]
+    next_cursor = None
+    if page and start + limit < len(category_videos):
+        next_cursor = encode_category_cursor(category_key, page[-1])
+    return page, next_cursor
+
+def compact_video(video):
+    """The fields the homepage needs to render a video card, for the JSON catalog API."""
+    return {
+        'db_id': video['db_id'],
+        'platform': video.get('platform'),
+        'video_id': video.get('video_id_on_platform'),
+        'title': video.get('title'),
+        'likes': video.get('likes') or 0,
+        'aspect_ratio': video.get('aspect_ratio'),
+    }
+
+CATALOG_CHANNEL = 'vespa_catalog_changed'
+CATALOG_SYNC_MODE = os.getenv('CATALOG_SYNC_MODE', 'listen').lower()  # 'listen', 'poll' or 'off'
+CATALOG_SYNC_INTERVAL = float(os.getenv('CATALOG_SYNC_INTERVAL', '1'))  # Seconds between wakeups/polls
+CATALOG_SYNC_RECHECK = float(os.getenv('CATALOG_SYNC_RECHECK', '30'))  # Version-row check while listening
+
+# Identifies this worker process as the origin of a notification. Not the PID: each dyno is
+# its own container, so PIDs repeat across dynos. Regenerated in every forked child.
+PROCESS_TOKEN = uuid.uuid4().hex
+
+def _new_process_token():
+    global PROCESS_TOKEN
+    PROCESS_TOKEN = uuid.uuid4().hex
+
+os.register_at_fork(after_in_child=_new_process_token)
+
+def publish_catalog_change(scope='catalog'):
+    """
+    Tells every other worker (on every dyno) that the catalog changed: bumps the
+    shared catalog_version row and sends a NOTIFY carrying the new version.
+    Failures are logged, never raised - the TTL still bounds staleness.
+    """
+    if not DATABASE_URL:
+        return None
+    conn = None
+    cur = None
+    version = None
+    try:
+        conn = get_db_connection()
+        cur = conn.cursor()
+        try:
+            cur.execute(
+                "UPDATE catalog_version SET version = version + 1, updated_at = NOW() WHERE id = 1 RETURNING version"
+            )
+            row = cur.fetchone()
+            version = row[0] if row else None
+        except psycopg2.errors.UndefinedTable:
+            # Migration not applied yet: NOTIFY still works, polling fallback won't.
+            conn.rollback()
+        payload = json.dumps({'version': version, 'scope': scope, 'origin': PROCESS_TOKEN})
+        cur.execute("SELECT pg_notify(%s, %s)", (CATALOG_CHANNEL, payload))
+        conn.commit()
     except (psycopg2.Error, Exception) as e:
-        flash(f"Database error loading data: {e}", "danger")
-        print(f"Database error in load_data: {e}")
-        # Return empty structures on error to prevent app crash, but log/flash the error
-        return {}, [] 
+        if conn:
+            conn.rollback()
+        print(f"Error publishing catalog change: {e}")
     finally:
         if cur:
             cur.close()
         if conn:
-            conn.close()
-    
-    return categories_map, all_videos_list
+            release_db_connection(conn)
+    return version
 
-def get_all_problems():
-    """Fetches all unique problems from the database for search filters."""
+def publish_series_change(series_id):
+    """
+    Tells every other worker that one series' video order changed (scope 'series'). Unlike
+    publish_catalog_change it leaves catalog_version alone, so listeners drop only that
+    series' cached lists; workers in 'poll' mode pick it up at their next catalog rebuild.
+    """
+    if not DATABASE_URL:
+        return
     conn = None
-    problems_list = []
+    cur = None
     try:
         conn = get_db_connection()
-        cur = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
-        cur.execute("SELECT problem_id, problem_text, theme FROM problems ORDER BY theme, problem_text")
-        problems_list = cur.fetchall()
+        cur = conn.cursor()
+        payload = json.dumps({'scope': 'series', 'series_id': series_id, 'origin': PROCESS_TOKEN})
+        cur.execute("SELECT pg_notify(%s, %s)", (CATALOG_CHANNEL, payload))
+        conn.commit()
     except (psycopg2.Error, Exception) as e:
-        flash(f"Database error loading problems: {e}", "danger")
-        print(f"Database error in get_all_problems: {e}")
+        if conn:
+            conn.rollback()
+        print(f"Error publishing series change: {e}")
     finally:
+        if cur:
+            cur.close()
         if conn:
+            release_db_connection(conn)
+
+class CatalogChangeListener:
+    """
+    Background thread (one per worker process) that keeps catalog_cache in step with
+    writes made by other workers.
+
+    In 'listen' mode it holds a dedicated autocommit connection with LISTEN on
+    CATALOG_CHANNEL and wakes every CATALOG_SYNC_INTERVAL seconds; it also re-reads
+    the catalog_version row every CATALOG_SYNC_RECHECK seconds in case notifications
+    are being swallowed (e.g. by a transaction-mode pooler). If LISTEN itself fails
+    it drops to 'poll' mode and reads the version row every interval instead.
+    """
+
+    def __init__(self, cache, mode, interval, recheck):
+        self.cache = cache
+        self.mode = mode
+        self.interval = interval
+        self.recheck = recheck
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._remote_version = None
+        self._version_row_missing = False
+        self._stats = {
+            'notifications': 0,
+            'polls': 0,
+            'invalidations': 0,
+            'series_invalidations': 0,
+            'reconnects': 0,
+            'connected': False,
+            'last_error': None,
+        }
+
+    def ensure_started(self):
+        if self.mode == 'off' or not DATABASE_URL:
+            return
+        if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._remote_version = None
+            self._thread = threading.Thread(target=self._run, name='catalog-listener', daemon=True)
+            self._thread.start()
+
+    def _apply_remote_version(self, version, origin=None, notified=False):
+        if version is None:
+            # Version row missing: every notification counts as a change, but polls and
+            # rechecks have nothing to compare and must not invalidate.
+            if notified:
+                if origin != PROCESS_TOKEN:
+                    self._invalidate()
+            elif not self._version_row_missing:
+                self._version_row_missing = True
+                print("catalog_version row not found; only NOTIFY will invalidate other workers' caches. Run the migration in database_schema.sql.")
+            return
+        self._version_row_missing = False
+        if self._remote_version is None:
+            self._remote_version = version
+            return
+        if version != self._remote_version:
+            self._remote_version = version
+            if origin != PROCESS_TOKEN:
+                self._invalidate()
+
+    def _invalidate(self):
+        self.cache.bump_version()
+        self._stats['invalidations'] += 1
+
+    def _read_version(self, conn):
+        with conn.cursor() as cur:
+            try:
+                cur.execute("SELECT version FROM catalog_version WHERE id = 1")
+            except psycopg2.errors.UndefinedTable:
+                return None
+            row = cur.fetchone()
+        self._stats['polls'] += 1
+        return row[0] if row else None
+
+    def _run(self):
+        backoff = self.interval
+        while True:
+            conn = None
+            try:
+                conn = psycopg2.connect(DATABASE_URL)
+                conn.autocommit = True
+                if self.mode == 'listen':
+                    try:
+                        with conn.cursor() as cur:
+                            cur.execute(f"LISTEN {CATALOG_CHANNEL}")
+                    except psycopg2.Error as e_listen:
+                        print(f"LISTEN unavailable ({e_listen}); falling back to polling catalog_version.")
+                        self.mode = 'poll'
+                self._stats['connected'] = True
+                backoff = self.interval
+                self._apply_remote_version(self._read_version(conn))
+                if self.mode == 'listen':
+                    self._listen_loop(conn)
+                else:
+                    self._poll_loop(conn)
+            except Exception as e:
+                self._stats['last_error'] = str(e)
+                print(f"Catalog listener error: {e}")
+            finally:
+                self._stats['connected'] = False
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except psycopg2.Error:
+                        pass
+            self._stats['reconnects'] += 1
+            time.sleep(backoff)
+            backoff = min(backoff * 2, 60)
+
+    def _listen_loop(self, conn):
+        last_check = time.monotonic()
+        while True:
+            if select.select([conn], [], [], self.interval) != ([], [], []):
+                conn.poll()
+                while conn.notifies:
+                    notify = conn.notifies.pop(0)
+                    self._stats['notifications'] += 1
+                    try:
+                        payload = json.loads(notify.payload or '{}')
+                    except ValueError:
+                        payload = {}
+                    from_self = payload.get('origin') == PROCESS_TOKEN
+                    if payload.get('scope') == 'series':
+                        if not from_self:
+                            invalidate_series_lists(payload.get('series_id'), publish=False)
+                            self._stats['series_invalidations'] += 1
+                        continue
+                    if payload.get('scope') == 'schema' and not from_self:
+                        schema_capabilities.invalidate()
+                    self._apply_remote_version(payload.get('version'), payload.get('origin'), notified=True)
+            if time.monotonic() - last_check >= self.recheck:
+                last_check = time.monotonic()
+                self._apply_remote_version(self._read_version(conn))
+
+    def _poll_loop(self, conn):
+        while True:
+            self._apply_remote_version(self._read_version(conn))
+            time.sleep(self.interval)
+
+    def stats(self):
+        stats = dict(self._stats)
+        stats.update({
+            'mode': self.mode,
+            'remote_version': self._remote_version,
+            'version_row_missing': self._version_row_missing,
+            'running': self._thread is not None and self._thread.is_alive() and self._pid == os.getpid(),
+        })
+        return stats
+
+catalog_listener = CatalogChangeListener(catalog_cache, CATALOG_SYNC_MODE, CATALOG_SYNC_INTERVAL, CATALOG_SYNC_RECHECK)
+
+@app.before_request
+def ensure_catalog_listener():
+    # Started lazily so each forked gunicorn worker runs its own listener thread.
+    catalog_listener.ensure_started()
+
+def invalidate_catalog(scope='catalog'):
+    """
+    Marks every cached catalog snapshot stale, locally and in every other worker.
+    Call after committing an admin write.
+    """
+    version = catalog_cache.bump_version()
+    page_cache.clear()
+    fragment_cache.clear()
+    series_cache.clear()
+    publish_catalog_change(scope)
+    return version
+
+# {% cache %} fragments whose second key part is the id of the series they list.
+SERIES_FRAGMENTS = frozenset({'featured_series_modal', 'csc_students', 'csc_staff'})
+
+def invalidate_series_lists(series_id, publish=True):
+    """
+    Drops one series' cached lists - its load_series_batch() results, its fragments and the
+    pages that showed it - locally and (with publish) in every other worker. The catalog
+    snapshot stays valid; use this instead of invalidate_catalog() when only the series'
+    video order changed.
+    """
+    dropped = (
+        series_cache.discard_series(series_id)
+        + fragment_cache.discard(lambda key: key[1] in SERIES_FRAGMENTS and key[2] == series_id)
+        + page_cache.discard_series(series_id)
+    )
+    if publish:
+        publish_series_change(series_id)
+    return dropped
+
+PAGE_CACHE_MAX_ENTRIES = int(os.getenv('PAGE_CACHE_MAX_ENTRIES', '32'))
+
+class PageCache:
+    """
+    Rendered HTML of public pages, per worker. A key is (site_key, endpoint, day, catalog
+    snapshot); the snapshot part is its version plus build time, so an admin write (version
+    bump, local or from another worker) or a TTL rebuild retires every page built from the
+    old catalog. The day covers the daily featured-video rotation. Pages also remember which
+    series they rendered, so a series reorder drops just those (discard_series).
+    """
+
+    def __init__(self, max_entries=PAGE_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = {}  # key -> (body bytes, etag, last_modified)
+        self._series = {}  # key -> frozenset of series ids shown on the page
+        self._stats = {'hits': 0, 'misses': 0, 'not_modified': 0, 'bypassed': 0, 'stored': 0, 'series_discards': 0}
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            self._stats['hits' if entry else 'misses'] += 1
+            return entry
+
+    def put(self, key, body, last_modified, series_ids=()):
+        etag = hashlib.sha1(body).hexdigest()
+        with self._lock:
+            # Older entries for the same site and page (earlier snapshot or day) can never be
+            # hit again; drop them. Other sites have their own snapshots, so leave theirs alone.
+            page_id = key[:2]
+            for stale_key in [k for k in self._entries if k[:2] == page_id and k != key]:
+                self._drop(stale_key)
+            if len(self._entries) >= self.max_entries:
+                self._drop(next(iter(self._entries)))
+            self._entries[key] = (body, etag, last_modified)
+            if series_ids:
+                self._series[key] = frozenset(series_ids)
+            self._stats['stored'] += 1
+        return body, etag, last_modified
+
+    def _drop(self, key):
+        del self._entries[key]
+        self._series.pop(key, None)
+
+    def discard_series(self, series_id):
+        """Drops the pages that rendered the given series; returns how many."""
+        with self._lock:
+            keys = [key for key, series_ids in self._series.items() if series_id in series_ids]
+            for key in keys:
+                self._drop(key)
+            self._stats['series_discards'] += len(keys)
+            return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._series.clear()
+
+    def count(self, stat):
+        with self._lock:
+            self._stats[stat] += 1
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, entries=len(self._entries))
+
+page_cache = PageCache()
+
+def snapshot_token(snapshot):
+    """
+    Identifies one build of a catalog snapshot; changes on every invalidation and TTL rebuild.
+    Likes applied to the ranking since are left out: fragments add RankingIndex.list_revision()
+    for the list they show, whole pages page_token()'s ranking revision.
+    """
+    return (snapshot.version, snapshot.built_monotonic)
+
+def page_token(snapshot):
+    """
+    snapshot_token() plus the ranking's revision, so a cached page (and its ETag) is retired by
+    the next like as well as by rebuilds. Returns (token, last modified).
+    """
+    ranking = snapshot.ranking
+    updated_at = ranking.updated_at
+    last_modified = max(snapshot.built_at, updated_at) if updated_at else snapshot.built_at
+    return snapshot_token(snapshot) + (ranking.revision,), last_modified
+
+FRAGMENT_CACHE_MAX_ENTRIES = int(os.getenv('FRAGMENT_CACHE_MAX_ENTRIES', '512'))
+
+class FragmentCache:
+    """Rendered template fragments for FragmentCacheExtension, per worker (FIFO-bounded)."""
+
+    def __init__(self, max_entries=FRAGMENT_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._stats = {'hits': 0, 'misses': 0}
+
+    def get_or_render(self, key, render):
+        with self._lock:
+            fragment = self._entries.get(key)
+            self._stats['hits' if fragment is not None else 'misses'] += 1
+        if fragment is None:
+            fragment = render()
+            with self._lock:
+                while len(self._entries) >= self.max_entries:
+                    self._entries.pop(next(iter(self._entries)))
+                self._entries[key] = fragment
+        return fragment
+
+    def discard(self, predicate):
+        """Drops the fragments whose key matches `predicate`; returns how many."""
+        with self._lock:
+            keys = [key for key in self._entries if predicate(key)]
+            for key in keys:
+                del self._entries[key]
+            return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, entries=len(self._entries))
+
+fragment_cache = FragmentCache()
+
+class FragmentCacheExtension(Extension):
+    """
+    Adds {% cache key, ... %}...{% endcache %} to templates. The body is rendered once per
+    distinct key (plus the template name) and served from fragment_cache afterwards, so the
+    key must include everything the body depends on - normally what it shows (a category or
+    series) and `catalog_version`.
+    """
+    tags = {'cache'}
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        key_parts = [nodes.Const(parser.name), parser.parse_expression()]
+        while parser.stream.skip_if('comma'):
+            key_parts.append(parser.parse_expression())
+        body = parser.parse_statements(('name:endcache',), drop_needle=True)
+        return nodes.CallBlock(self.call_method('_render_cached', [nodes.Tuple(key_parts, 'load')]), [], [], body).set_lineno(lineno)
+
+    def _render_cached(self, key, caller):
+        return fragment_cache.get_or_render(key, caller)
+
+app.jinja_env.add_extension(FragmentCacheExtension)
+
+def cached_page(view):
+    """
+    Serves a public page from page_cache with a strong ETag and Last-Modified (the catalog
+    build or last like, see page_token()), answering If-None-Match / If-Modified-Since with 304. Requests with query
+    args (message/error banners), pending flash messages or an admin session are rendered
+    fresh and not stored.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if request.args or session.get('_flashes') or session.get('logged_in'):
+            page_cache.count('bypassed')
+            return view(*args, **kwargs)
+
+        site_key = get_site_context_from_request().get("site_key")
+        snapshot = get_catalog_snapshot(site_key)
+        token, last_modified = page_token(snapshot)
+        key = (site_key, request.endpoint, datetime.date.today().isoformat(), token)
+        entry = page_cache.get(key)
+        if entry is None:
+            response = app.make_response(view(*args, **kwargs))
+            # Don't keep error renders (empty catalog) or anything that touched the session.
+            if response.status_code != 200 or session.modified or not snapshot.videos:
+                return response
+            entry = page_cache.put(key, response.get_data(), last_modified, g.get('series_shown', ()))
+
+        body, etag, last_modified = entry
+        response = app.response_class(body, mimetype='text/html')
+        response.set_etag(etag)
+        response.last_modified = last_modified
+        response.cache_control.no_cache = True  # Browsers may keep it but must revalidate (cheap 304s)
+        response = response.make_conditional(request)
+        if response.status_code == 304:
+            page_cache.count('not_modified')
+        return response
+    return wrapper
+
+COUNTER_FLUSH_INTERVAL = float(os.getenv('COUNTER_FLUSH_INTERVAL', '3'))  # Seconds between background flushes
+COUNTER_FLUSH_EVENTS = int(os.getenv('COUNTER_FLUSH_EVENTS', '200'))  # Pending events that trigger an early flush
+
+class WriteBehindCounter:
+    """
+    Coalesces increments of an integer column on `videos` in memory and writes them back
+    in batches, so a burst of clicks on one video becomes a single UPDATE.
+
+    increment() never writes: it returns an optimistic total (last value read from the
+    database + deltas not yet flushed) straight away. A background thread per worker
+    flushes every `interval` seconds, or sooner once `threshold` events are pending,
+    with one multi-row UPDATE ... FROM (VALUES ...) for every video touched. Deltas from
+    a failed flush are put back and retried, and pending deltas are flushed at exit.
+    """
+
+    COLUMNS = ('likes', 'view_count')
+
+    def __init__(self, column, interval=COUNTER_FLUSH_INTERVAL, threshold=COUNTER_FLUSH_EVENTS):
+        if column not in self.COLUMNS:
+            raise ValueError(f"Unsupported counter column '{column}'")
+        self.column = column
+        self.interval = interval
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._pid = None
+        self._pending = {}    # video id -> delta not yet sent
+        self._inflight = {}   # video id -> delta in the UPDATE currently running
+        self._known = {}      # video id -> last value read back from the database
+        self._pending_events = 0
+        self._listeners = []  # called with (video id, optimistic total) whenever a total changes
+        self._stats = {
+            'increments': 0,
+            'flushes': 0,
+            'flushed_events': 0,
+            'flushed_rows': 0,
+            'failures': 0,
+            'last_flush_seconds': None,
+            'max_flush_seconds': 0.0,
+            'last_error': None,
+        }
+        atexit.register(self.flush)
+
+    def ensure_started(self):
+        if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+                return
+            if self._pid != os.getpid():
+                # Forked: deltas buffered by the parent belong to the parent.
+                self._pending, self._inflight, self._pending_events = {}, {}, 0
+                self._flush_lock = threading.Lock()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name=f'{self.column}-counter', daemon=True)
+            self._thread.start()
+
+    def add_listener(self, listener):
+        self._listeners.append(listener)
+
+    def _notify(self, totals):
+        for listener in self._listeners:
+            for video_id, total in totals:
+                try:
+                    listener(video_id, total)
+                except Exception as e:
+                    print(f"Error in {self.column} counter listener: {e}")
+
+    def _load_known(self, video_id):
+        """Reads the stored value for a video this worker has not seen yet; None if it doesn't exist."""
+        conn = None
+        cur = None
+        try:
+            conn = get_db_connection()
+            cur = conn.cursor()
+            cur.execute(
+                psycopg2.sql.SQL("SELECT {} FROM videos WHERE id = %s").format(psycopg2.sql.Identifier(self.column)),
+                (video_id,)
+            )
+            row = cur.fetchone()
+            conn.rollback()
+            return None if row is None else (row[0] or 0)
+        finally:
             if cur:
                 cur.close()
-            conn.close()
-    return problems_list
+            if conn:
+                release_db_connection(conn)
+
+    def increment(self, video_id, delta=1):
+        """
+        Buffers `delta` for a video and returns its optimistic total, or None if the video
+        does not exist. Only the first increment of a video per worker touches the database
+        (one SELECT to learn its current value); later ones are memory-only.
+        """
+        self.ensure_started()
+        if video_id not in self._known:
+            known = self._load_known(video_id)
+            if known is None:
+                return None
+            with self._lock:
+                self._known.setdefault(video_id, known)
+        with self._lock:
+            # A flush may have forgotten the video (deleted) since the check above.
+            known = self._known.get(video_id)
+            if known is None:
+                return None
+            self._pending[video_id] = self._pending.get(video_id, 0) + delta
+            self._pending_events += 1
+            self._stats['increments'] += 1
+            total = known + self._inflight.get(video_id, 0) + self._pending[video_id]
+            trigger_flush = self._pending_events >= self.threshold
+        if trigger_flush:
+            self._wakeup.set()
+        self._notify([(video_id, total)])
+        return total
+
+    def flush(self):
+        """Writes every pending delta in one statement. Returns the number of videos updated."""
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending:
+                    return 0
+                batch, events = self._pending, self._pending_events
+                self._pending, self._pending_events = {}, 0
+                self._inflight = batch
+
+            started = time.monotonic()
+            conn = None
+            cur = None
+            try:
+                conn = get_db_connection()
+                cur = conn.cursor()
+                column = psycopg2.sql.Identifier(self.column)
+                query = psycopg2.sql.SQL("""
+                    UPDATE videos AS v SET {column} = COALESCE(v.{column}, 0) + d.delta
+                    FROM (VALUES %s) AS d(id, delta)
+                    WHERE v.id = d.id
+                    RETURNING v.id, v.{column}
+                """).format(column=column)
+                rows = psycopg2.extras.execute_values(
+                    cur, query.as_string(conn), sorted(batch.items()), template="(%s::int, %s::int)", fetch=True
+                )
+                conn.commit()
+            except (psycopg2.Error, Exception) as e:
+                if conn:
+                    conn.rollback()
+                print(f"Database error flushing {self.column} counter: {e}")
+                with self._lock:
+                    for video_id, delta in batch.items():
+                        self._pending[video_id] = self._pending.get(video_id, 0) + delta
+                    self._pending_events += events
+                    self._inflight = {}
+                    self._stats['failures'] += 1
+                    self._stats['last_error'] = str(e)
+                return 0
+            finally:
+                if cur:
+                    cur.close()
+                if conn:
+                    release_db_connection(conn)
+
+            elapsed = time.monotonic() - started
+            with self._lock:
+                for video_id, value in rows:
+                    self._known[video_id] = value
+                for video_id in set(batch) - {row[0] for row in rows}:
+                    self._known.pop(video_id, None)  # Deleted since it was first seen
+                self._inflight = {}
+                # Read-back values include other workers' increments.
+                totals = [(video_id, value + self._pending.get(video_id, 0)) for video_id, value in rows]
+                self._stats['flushes'] += 1
+                self._stats['flushed_events'] += events
+                self._stats['flushed_rows'] += len(rows)
+                self._stats['last_flush_seconds'] = elapsed
+                self._stats['max_flush_seconds'] = max(self._stats['max_flush_seconds'], elapsed)
+            self._notify(totals)
+            return len(rows)
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Unexpected error in {self.column} counter flusher: {e}")
+
+    def stats(self):
+        with self._lock:
+            return dict(
+                self._stats,
+                column=self.column,
+                pending_videos=len(self._pending),
+                pending_events=self._pending_events,
+                inflight_videos=len(self._inflight),
+                flusher_alive=self._thread is not None and self._thread.is_alive() and self._pid == os.getpid(),
+            )
 
-def load_featured_series_data():
-    """Loads the featured series and its top 3 liked videos."""
-    conn = None
-    featured_series_info = None
-    featured_series_top_videos = []
-    featured_series_all_videos = [] # Add list for all videos in the series
+like_counter = WriteBehindCounter('likes')
+view_counter = WriteBehindCounter('view_count')
+like_counter.add_listener(catalog_cache.apply_likes)
 
-    try:
-        conn = get_db_connection()
-        cur = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
+VIEW_DEDUPE_WINDOW = int(os.getenv('VIEW_DEDUPE_WINDOW', '1800'))  # Seconds a session's replays don't count again
+VIEW_DEDUPE_MAX = 100  # Recent views remembered per session (kept small; it lives in the cookie)
 
-        # 1. Find the featured series
-        cur.execute("SELECT id, series_key, name, description FROM series WHERE is_featured = TRUE LIMIT 1")
-        series_row = cur.fetchone()
+ENGAGEMENT_FLUSH_INTERVAL = float(os.getenv('ENGAGEMENT_FLUSH_INTERVAL', '5'))
+ENGAGEMENT_FLUSH_EVENTS = int(os.getenv('ENGAGEMENT_FLUSH_EVENTS', '500'))
+ENGAGEMENT_ROLLUP_INTERVAL = float(os.getenv('ENGAGEMENT_ROLLUP_INTERVAL', '60'))  # Seconds between rollup attempts per worker
+ENGAGEMENT_LOCK_KEY = 73100501  # pg advisory lock: shared by ingest, exclusive for rollups
 
-        if series_row:
-            featured_series_info = dict(series_row)
-            
-            # 2. Fetch videos assigned to this series, including their like counts, ordered by likes
-            # We need a JOIN to get video details and likes from the 'videos' table
-            # and order by likes to easily pick the top 3.
-            cur.execute("""
-                SELECT v.id, v.platform, v.video_id_on_platform, v.title, v.view_count, v.likes, v.id as db_id
-                FROM videos v
-                JOIN video_series_assignments vsa ON v.id = vsa.video_db_id
-                WHERE vsa.series_db_id = %s
-                ORDER BY v.likes DESC, vsa.display_order ASC, v.id ASC
-                LIMIT 3
-            """, (featured_series_info['id'],))
-            
-            video_rows_top = cur.fetchall()
-            for vid_row in video_rows_top:
-                video_data = {
-                    'db_id': vid_row['id'],
-                    'platform': vid_row['platform'],
-                    'video_id': vid_row['video_id_on_platform'],
-                    'video_id_on_platform': vid_row['video_id_on_platform'],
-                    'title': vid_row['title'],
-                    'view_count': vid_row['view_count'],
-                    'likes': vid_row['likes']
-                }
-                featured_series_top_videos.append(video_data)
+class EngagementLog:
+    """
+    Buffers like/view events in memory and appends them to engagement_events with one
+    COPY per batch, then folds new events into the hourly/daily rollup tables.
 
-            # 3. Fetch ALL videos assigned to this series for the modal, ordered by display_order then title
-            cur.execute("""
-                SELECT v.id, v.platform, v.video_id_on_platform, v.title, v.view_count, v.likes, v.id as db_id
-                FROM videos v
-                JOIN video_series_assignments vsa ON v.id = vsa.video_db_id
-                WHERE vsa.series_db_id = %s
-                ORDER BY vsa.display_order ASC, v.title ASC, v.id ASC
-            """, (featured_series_info['id'],))
-
-            video_rows_all = cur.fetchall()
-            for vid_row in video_rows_all:
-                video_data_all = {
-                    'db_id': vid_row['id'],
-                    'platform': vid_row['platform'],
-                    'video_id': vid_row['video_id_on_platform'],
-                    'video_id_on_platform': vid_row['video_id_on_platform'],
-                    'title': vid_row['title'],
-                    'view_count': vid_row['view_count'],
-                    'likes': vid_row['likes']
-                }
-                featured_series_all_videos.append(video_data_all)
+    Events are flushed by a background thread per worker (every `interval` seconds or once
+    `threshold` are buffered, and at exit). The same thread runs rollup_engagement() every
+    ENGAGEMENT_ROLLUP_INTERVAL seconds; whichever worker gets the advisory lock does the work.
+    """
+
+    def __init__(self, interval=ENGAGEMENT_FLUSH_INTERVAL, threshold=ENGAGEMENT_FLUSH_EVENTS):
+        self.interval = interval
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._pid = None
+        self._buffer = []
+        self._last_rollup = 0.0
+        self._stats = {
+            'recorded': 0,
+            'copied': 0,
+            'flushes': 0,
+            'failures': 0,
+            'dropped': 0,
+            'last_flush_seconds': None,
+            'rollups': 0,
+            'rolled_up_events': 0,
+            'last_rollup_seconds': None,
+            'last_error': None,
+        }
+        atexit.register(self.flush)
+
+    def ensure_started(self):
+        if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+                return
+            if self._pid != os.getpid():
+                self._buffer = []
+                self._flush_lock = threading.Lock()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='engagement-log', daemon=True)
+            self._thread.start()
+
+    def record(self, video_id, event_type):
+        """Buffers one 'like' or 'view' event. Never touches the database."""
+        if not schema_capabilities.has_table('engagement_events'):
+            return
+        self.ensure_started()
+        event = (video_id, event_type, datetime.datetime.now(datetime.timezone.utc))
+        with self._lock:
+            self._buffer.append(event)
+            self._stats['recorded'] += 1
+            trigger_flush = len(self._buffer) >= self.threshold
+        if trigger_flush:
+            self._wakeup.set()
+
+    def flush(self):
+        """COPYs every buffered event in one transaction. Returns the number of events written."""
+        with self._flush_lock:
+            with self._lock:
+                if not self._buffer:
+                    return 0
+                batch, self._buffer = self._buffer, []
+
+            payload = io.StringIO()
+            for video_id, event_type, occurred_at in batch:
+                payload.write(f"{video_id}\t{event_type}\t{occurred_at.isoformat()}\n")
+            payload.seek(0)
+
+            started = time.monotonic()
+            conn = None
+            cur = None
+            try:
+                conn = get_db_connection()
+                cur = conn.cursor()
+                # Shared lock: concurrent ingests don't block each other, but a rollup (which
+                # takes it exclusively) only ever runs with no COPY in flight, so every id
+                # below its high-water mark is already committed.
+                cur.execute("SELECT pg_advisory_xact_lock_shared(%s)", (ENGAGEMENT_LOCK_KEY,))
+                cur.copy_expert(
+                    "COPY engagement_events (video_db_id, event_type, occurred_at) FROM STDIN",
+                    payload
+                )
+                conn.commit()
+            except (psycopg2.Error, Exception) as e:
+                if conn:
+                    conn.rollback()
+                print(f"Database error copying engagement events: {e}")
+                with self._lock:
+                    # Retry on the next flush, but never let a dead database grow the buffer unbounded.
+                    retained = batch + self._buffer
+                    limit = self.threshold * 20
+                    self._stats['dropped'] += max(0, len(retained) - limit)
+                    self._buffer = retained[-limit:]
+                    self._stats['failures'] += 1
+                    self._stats['last_error'] = str(e)
+                return 0
+            finally:
+                if cur:
+                    cur.close()
+                if conn:
+                    release_db_connection(conn)
+
+            with self._lock:
+                self._stats['copied'] += len(batch)
+                self._stats['flushes'] += 1
+                self._stats['last_flush_seconds'] = time.monotonic() - started
+            return len(batch)
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+                if time.monotonic() - self._last_rollup >= ENGAGEMENT_ROLLUP_INTERVAL:
+                    self._last_rollup = time.monotonic()
+                    rollup_engagement(wait=False)
+            except Exception as e:
+                print(f"Unexpected error in engagement log thread: {e}")
+
+    def note_rollup(self, events, seconds):
+        """Records a rollup_engagement() run (called from any thread)."""
+        with self._lock:
+            self._stats['rollups'] += 1
+            self._stats['rolled_up_events'] += events
+            self._stats['last_rollup_seconds'] = seconds
+
+    def note_error(self, error):
+        with self._lock:
+            self._stats['last_error'] = str(error)
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, buffered=len(self._buffer))
+
+engagement_log = EngagementLog()
+
+def rollup_engagement(wait=True):
+    """
+    Folds engagement_events added since the last run into engagement_hourly and
+    engagement_daily with set-based upserts. Returns the number of events rolled up,
+    or None if the lock was not available and wait is False.
+    """
+    started = time.monotonic()
+    conn = None
+    cur = None
+    try:
+        conn = get_db_connection()
+        cur = conn.cursor()
+        if wait:
+            cur.execute("SELECT pg_advisory_xact_lock(%s)", (ENGAGEMENT_LOCK_KEY,))
+        else:
+            cur.execute("SELECT pg_try_advisory_xact_lock(%s)", (ENGAGEMENT_LOCK_KEY,))
+            if not cur.fetchone()[0]:
+                conn.rollback()
+                return None
 
-        # else: No featured series found, variables will remain None/empty list
+        cur.execute("SELECT last_event_id FROM engagement_rollup_state WHERE id FOR UPDATE")
+        row = cur.fetchone()
+        last_event_id = row[0] if row else 0
+        cur.execute("SELECT COALESCE(MAX(id), 0) FROM engagement_events")
+        high_water = cur.fetchone()[0]
+        if high_water <= last_event_id:
+            conn.rollback()
+            return 0
 
+        window = {'low': last_event_id, 'high': high_water}
+        cur.execute("""
+            INSERT INTO engagement_hourly (video_db_id, hour, likes, views)
+            SELECT e.video_db_id, date_trunc('hour', e.occurred_at),
+                   COUNT(*) FILTER (WHERE e.event_type = 'like'),
+                   COUNT(*) FILTER (WHERE e.event_type = 'view')
+            FROM engagement_events e
+            JOIN videos v ON v.id = e.video_db_id
+            WHERE e.id > %(low)s AND e.id <= %(high)s
+            GROUP BY 1, 2
+            ON CONFLICT (video_db_id, hour) DO UPDATE
+            SET likes = engagement_hourly.likes + EXCLUDED.likes,
+                views = engagement_hourly.views + EXCLUDED.views
+        """, window)
+        cur.execute("""
+            INSERT INTO engagement_daily (video_db_id, day, likes, views)
+            SELECT e.video_db_id, (e.occurred_at AT TIME ZONE 'UTC')::date,
+                   COUNT(*) FILTER (WHERE e.event_type = 'like'),
+                   COUNT(*) FILTER (WHERE e.event_type = 'view')
+            FROM engagement_events e
+            JOIN videos v ON v.id = e.video_db_id
+            WHERE e.id > %(low)s AND e.id <= %(high)s
+            GROUP BY 1, 2
+            ON CONFLICT (video_db_id, day) DO UPDATE
+            SET likes = engagement_daily.likes + EXCLUDED.likes,
+                views = engagement_daily.views + EXCLUDED.views
+        """, window)
+        cur.execute(
+            "UPDATE engagement_rollup_state SET last_event_id = %s, rolled_up_at = NOW() WHERE id",
+            (high_water,)
+        )
+        conn.commit()
+        rolled_up = high_water - last_event_id
+        engagement_log.note_rollup(rolled_up, time.monotonic() - started)
+        return rolled_up
     except (psycopg2.Error, Exception) as e:
-        print(f"Database error in load_featured_series_data: {e}")
-        return None, [], [] # Return three values now
+        if conn:
+            conn.rollback()
+        print(f"Database error in rollup_engagement: {e}")
+        engagement_log.note_error(e)
+        raise
     finally:
+        if cur:
+            cur.close()
         if conn:
-            if cur: 
-                cur.close()
-            conn.close()
-    
-    return featured_series_info, featured_series_top_videos, featured_series_all_videos # Return all three
-
-def load_series_videos_for_site(series_key, site_key=None):
+            release_db_connection(conn)
+
+EMAIL_ADDRESS_RE = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
+EMAIL_POLL_INTERVAL = float(os.getenv('EMAIL_POLL_INTERVAL', '10'))  # Seconds between queue checks when idle
+EMAIL_RETRY_BASE = float(os.getenv('EMAIL_RETRY_BASE', '30'))  # First retry delay; doubles per attempt
+EMAIL_RETRY_MAX = float(os.getenv('EMAIL_RETRY_MAX', '3600'))
+EMAIL_STALE_AFTER = 600  # A job left 'sending' this long (worker died mid-send) is claimed again
+
+def sendgrid_client():
+    """Default EMAIL_CLIENT_FACTORY. Raises (so the job is retried) while SENDGRID_API_KEY is unset."""
+    if not SENDGRID_API_KEY:
+        raise RuntimeError("SENDGRID_API_KEY is not set")
+    return SendGridAPIClient(SENDGRID_API_KEY)
+
+# Factory for the object whose .send(Mail) delivers email. Swap it in app.config (e.g. for a fake in
+# tests or local development): app.config['EMAIL_CLIENT_FACTORY'] = lambda: FakeClient()
+app.config.setdefault('EMAIL_CLIENT_FACTORY', sendgrid_client)
+
+def send_email_payload(payload):
+    """Sends one email job payload through the configured client; raises on failure."""
+    client = app.config['EMAIL_CLIENT_FACTORY']()
+    response = client.send(Mail(
+        from_email=payload['from_email'],
+        to_emails=payload['to_emails'],
+        subject=payload['subject'],
+        html_content=payload['html_content'],
+    ))
+    status_code = getattr(response, 'status_code', 202)
+    if status_code >= 300:
+        raise RuntimeError(f"Email provider returned HTTP {status_code}")
+
+def enqueue_email(subject, html_content, to_emails=None, from_email=None):
     """
-    Load a specific series (by series_key) and its videos.
-    If site_key is provided and video_site_assignments exists, videos are filtered to that site.
+    Inserts a pending email_jobs row and nudges this worker's sender. Returns the job id.
+    Before the email_jobs migration is applied the email is sent right away instead
+    (returns None); errors are raised either way.
     """
+    payload = {
+        'from_email': from_email or SENDER_EMAIL,
+        'to_emails': to_emails or [RECIPIENT_EMAIL],
+        'subject': subject,
+        'html_content': html_content,
+    }
+    if not DATABASE_URL or not schema_capabilities.has_table('email_jobs'):
+        reason = "DATABASE_URL is not set" if not DATABASE_URL else "email_jobs table not found in DB"
+        print(f"Warning: {reason}; sending '{subject}' synchronously. Run the migration to queue emails.")
+        send_email_payload(payload)
+        return None
     conn = None
     cur = None
-    series_info = None
-    series_videos = []
-
     try:
         conn = get_db_connection()
-        cur = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
+        cur = conn.cursor()
+        cur.execute("INSERT INTO email_jobs (payload) VALUES (%s) RETURNING id", (psycopg2.extras.Json(payload),))
+        job_id = cur.fetchone()[0]
+        conn.commit()
+    except (psycopg2.Error, Exception):
+        if conn:
+            conn.rollback()
+        raise
+    finally:
+        if cur:
+            cur.close()
+        if conn:
+            release_db_connection(conn)
+    email_worker.wake()
+    return job_id
+
+class EmailJobWorker:
+    """
+    Background sender for email_jobs (one thread per worker process).
+
+    Claims one due job at a time with FOR UPDATE SKIP LOCKED, so any number of workers can
+    drain the queue without double-sending, and sends it outside the claiming transaction.
+    Failures are rescheduled with exponential backoff plus jitter; after max_attempts the
+    job is marked 'dead' and left for inspection.
+    """
+
+    def __init__(self, poll_interval=EMAIL_POLL_INTERVAL):
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._pid = None
+        self._stats = {'sent': 0, 'retried': 0, 'dead': 0, 'last_error': None}
+
+    def ensure_started(self):
+        if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='email-worker', daemon=True)
+            self._thread.start()
+
+    def wake(self):
+        self.ensure_started()
+        self._wakeup.set()
+
+    def _claim(self):
+        conn = None
+        cur = None
+        try:
+            conn = get_db_connection()
+            cur = conn.cursor()
+            cur.execute("""
+                UPDATE email_jobs SET status = 'sending', attempts = attempts + 1, locked_at = NOW()
+                WHERE id = (
+                    SELECT id FROM email_jobs
+                    WHERE (status = 'pending' AND run_at <= NOW())
+                       OR (status = 'sending' AND locked_at < NOW() - make_interval(secs => %s))
+                    ORDER BY run_at, id
+                    FOR UPDATE SKIP LOCKED
+                    LIMIT 1
+                )
+                RETURNING id, payload, attempts, max_attempts
+            """, (EMAIL_STALE_AFTER,))
+            job = cur.fetchone()
+            conn.commit()
+            return job
+        except (psycopg2.Error, Exception):
+            if conn:
+                conn.rollback()
+            raise
+        finally:
+            if cur:
+                cur.close()
+            if conn:
+                release_db_connection(conn)
+
+    def _finish(self, job_id, error=None, attempts=0, max_attempts=0):
+        conn = None
+        cur = None
+        try:
+            conn = get_db_connection()
+            cur = conn.cursor()
+            if error is None:
+                cur.execute(
+                    "UPDATE email_jobs SET status = 'sent', sent_at = NOW(), locked_at = NULL, last_error = NULL WHERE id = %s",
+                    (job_id,)
+                )
+            elif attempts >= max_attempts:
+                cur.execute(
+                    "UPDATE email_jobs SET status = 'dead', locked_at = NULL, last_error = %s WHERE id = %s",
+                    (error, job_id)
+                )
+            else:
+                delay = min(EMAIL_RETRY_BASE * (2 ** (attempts - 1)), EMAIL_RETRY_MAX) * random.uniform(0.8, 1.2)
+                cur.execute("""
+                    UPDATE email_jobs
+                    SET status = 'pending', locked_at = NULL, last_error = %s,
+                        run_at = NOW() + make_interval(secs => %s)
+                    WHERE id = %s
+                """, (error, delay, job_id))
+            conn.commit()
+        except (psycopg2.Error, Exception):
+            if conn:
+                conn.rollback()
+            raise
+        finally:
+            if cur:
+                cur.close()
+            if conn:
+                release_db_connection(conn)
+
+    def process_one(self):
+        """Sends one due job. Returns False when the queue has nothing due."""
+        job = self._claim()
+        if job is None:
+            return False
+        job_id, payload, attempts, max_attempts = job
+        try:
+            send_email_payload(payload)
+        except Exception as e:
+            print(f"Error sending email job {job_id} (attempt {attempts}/{max_attempts}): {e}")
+            self._finish(job_id, str(e), attempts, max_attempts)
+            self._stats['dead' if attempts >= max_attempts else 'retried'] += 1
+            self._stats['last_error'] = str(e)
+            return True
+        self._finish(job_id)
+        self._stats['sent'] += 1
+        return True
+
+    def _run(self):
+        while True:
+            try:
+                while self.process_one():
+                    pass
+            except Exception as e:
+                print(f"Database error in email worker: {e}")
+                self._stats['last_error'] = str(e)
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+
+    def queue_stats(self):
+        """Job counts by status (the 'dead' count is the dead-letter backlog)."""
+        conn = None
+        cur = None
+        try:
+            conn = get_db_connection()
+            cur = conn.cursor()
+            cur.execute("SELECT status, COUNT(*) FROM email_jobs GROUP BY status")
+            counts = dict(cur.fetchall())
+            conn.rollback()
+            return counts
+        except (psycopg2.Error, Exception) as e:
+            if conn:
+                conn.rollback()
+            return {'error': str(e)}
+        finally:
+            if cur:
+                cur.close()
+            if conn:
+                release_db_connection(conn)
+
+    def stats(self):
+        return dict(
+            self._stats,
+            worker_alive=self._thread is not None and self._thread.is_alive() and self._pid == os.getpid(),
+            queue=self.queue_stats() if schema_capabilities.has_table('email_jobs') else None,
+        )
+
+email_worker = EmailJobWorker()
+
+@app.before_request
+def ensure_email_worker():
+    # Started lazily per worker process so queued jobs from before a restart still get sent.
+    if DATABASE_URL and schema_capabilities.has_table('email_jobs'):
+        email_worker.ensure_started()
+
+@app.cli.command('rollup-engagement')
+def rollup_engagement_command():
+    """Folds new engagement events into the hourly/daily rollups (safe to run from cron)."""
+    rolled_up = rollup_engagement(wait=True)
+    print(f"Rolled up {rolled_up} engagement events.")
+
+SEARCH_FIELD_WEIGHTS = {
+    'title': 3.0,
+    'keywords': 2.0,
+    'problem_text': 1.5,
+    'problem_theme': 1.0,
+    'category_name': 1.0,
+}
+_SEARCH_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+def tokenize_search_text(text):
+    return _SEARCH_TOKEN_RE.findall((text or '').lower())
+
+class SearchIndex:
+    """
+    Tokenised inverted index over one site's catalog snapshot.
+
+    Each token maps to a posting dict {video db_id: weight}, where the weight is the sum
+    of SEARCH_FIELD_WEIGHTS for every field the token appears in. A query matches videos
+    containing every query token as a word prefix ("motiv" finds "motivation"); results
+    are ranked by summed weight, then likes, then title.
 
+    sync() is incremental: only videos whose searchable text changed between catalog
+    versions are re-indexed.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._postings = {}
+        self._doc_tokens = {}
+        self._doc_signatures = {}
+        self._videos = {}
+        self._tiebreak = {}
+        self._vocabulary = []
+        self._vocabulary_dirty = False
+        self.version = None
+        self.stats = {'syncs': 0, 'documents_reindexed': 0, 'last_sync_seconds': None, 'queries': 0}
+
+    @staticmethod
+    def _document_fields(video, categories):
+        yield 'title', video.get('title')
+        yield 'keywords', video.get('keywords')
+        for problem in video.get('problems') or ():
+            yield 'problem_text', problem.get('text')
+            yield 'problem_theme', problem.get('theme')
+        for cat_key in video.get('category_keys') or ():
+            category = categories.get(cat_key)
+            if category:
+                yield 'category_name', category.get('name')
+
+    def _remove_document(self, video_id):
+        for token in self._doc_tokens.pop(video_id, {}):
+            posting = self._postings.get(token)
+            if posting is not None:
+                posting.pop(video_id, None)
+                if not posting:
+                    del self._postings[token]
+                    self._vocabulary_dirty = True
+        self._doc_signatures.pop(video_id, None)
+
+    def _add_document(self, video_id, fields, signature):
+        weights = {}
+        for field, text in fields:
+            for token in set(tokenize_search_text(text)):
+                weights[token] = weights.get(token, 0.0) + SEARCH_FIELD_WEIGHTS[field]
+        for token, weight in weights.items():
+            posting = self._postings.get(token)
+            if posting is None:
+                posting = self._postings[token] = {}
+                self._vocabulary_dirty = True
+            posting[video_id] = weight
+        self._doc_tokens[video_id] = weights
+        self._doc_signatures[video_id] = signature
+
+    def sync(self, snapshot):
+        """Brings the index up to date with a CatalogSnapshot (no-op if already current)."""
+        if self.version == (snapshot.version, id(snapshot)):
+            return
+        with self._lock:
+            if self.version == (snapshot.version, id(snapshot)):
+                return
+            started = time.monotonic()
+            reindexed = 0
+            current_ids = set()
+            for video in snapshot.videos:
+                video_id = video['db_id']
+                current_ids.add(video_id)
+                fields = tuple(self._document_fields(video, snapshot.categories))
+                signature = hash(fields)
+                # Always keep the newest mapping so likes etc. are current in results.
+                self._videos[video_id] = video
+                if self._doc_signatures.get(video_id) != signature:
+                    self._remove_document(video_id)
+                    self._add_document(video_id, fields, signature)
+                    reindexed += 1
+            for stale_id in set(self._doc_signatures) - current_ids:
+                self._remove_document(stale_id)
+                self._videos.pop(stale_id, None)
+                reindexed += 1
+            if self._vocabulary_dirty:
+                self._vocabulary = sorted(self._postings)
+                self._vocabulary_dirty = False
+            # Precomputed position in (likes desc, title asc) order, used to break score ties.
+            ordered = sorted(self._videos.values(), key=lambda v: (-(v.get('likes') or 0), v.get('title') or ''))
+            self._tiebreak = {video['db_id']: position for position, video in enumerate(ordered)}
+            self.version = (snapshot.version, id(snapshot))
+            self.stats['syncs'] += 1
+            self.stats['documents_reindexed'] += reindexed
+            self.stats['last_sync_seconds'] = time.monotonic() - started
+
+    def _prefix_scores(self, prefix):
+        """Union of postings for every vocabulary term starting with prefix (best weight per video)."""
+        scores = {}
+        vocabulary = self._vocabulary
+        position = bisect.bisect_left(vocabulary, prefix)
+        while position < len(vocabulary) and vocabulary[position].startswith(prefix):
+            for video_id, weight in self._postings[vocabulary[position]].items():
+                if weight > scores.get(video_id, 0.0):
+                    scores[video_id] = weight
+            position += 1
+        return scores
+
+    def search(self, query, limit=None):
+        """Returns (the `limit` best matches in rank order, total number of matches)."""
+        tokens = list(dict.fromkeys(tokenize_search_text(query)))
+        if not tokens:
+            return [], 0
+        with self._lock:
+            self.stats['queries'] += 1
+            token_scores = sorted((self._prefix_scores(token) for token in tokens), key=len)
+            if not token_scores[0]:
+                return [], 0
+            # Intersect starting from the shortest posting list.
+            totals = dict(token_scores[0])
+            for scores in token_scores[1:]:
+                totals = {vid: total + scores[vid] for vid, total in totals.items() if vid in scores}
+                if not totals:
+                    return [], 0
+            tiebreak = self._tiebreak
+            rank_key = lambda vid: (-totals[vid], tiebreak[vid])
+            if limit is not None and limit < len(totals):
+                ranked = heapq.nsmallest(limit, totals, key=rank_key)
+            else:
+                ranked = sorted(totals, key=rank_key)
+            return [self._videos[vid] for vid in ranked], len(totals)
+
+    def summary(self):
+        return {
+            'documents': len(self._doc_signatures),
+            'terms': len(self._postings),
+            'catalog_version': self.version[0] if self.version else None,
+            **self.stats,
+        }
+
+_search_indexes = {}
+_search_indexes_lock = threading.Lock()
+
+def get_search_index(site_key=None):
+    """Returns the in-memory SearchIndex for a site, synced to the current catalog snapshot."""
+    snapshot = get_catalog_snapshot(site_key)
+    with _search_indexes_lock:
+        index = _search_indexes.get(site_key)
+        if index is None:
+            index = _search_indexes[site_key] = SearchIndex()
+    index.sync(snapshot)
+    return index
+
+SEARCH_BACKEND = os.getenv('SEARCH_BACKEND', 'memory').lower()  # 'memory' or 'postgres'
+SEARCH_PAGE_SIZE = int(os.getenv('SEARCH_PAGE_SIZE', '24'))
+
+def _search_memory(query, site_key, page, page_size):
+    # Only rank as far as the requested page; the total still counts every match.
+    start = (page - 1) * page_size
+    results, total = get_search_index(site_key).search(query, limit=start + page_size)
+    return live_video_records(results[start:], get_catalog_snapshot(site_key).ranking), total
+
+def _search_postgres(query, site_key, page, page_size):
+    """
+    Full-text search in Postgres over videos.search_vector (GIN indexed, see
+    database_schema.sql). Ranked with ts_rank and paginated in SQL; matching ids are mapped
+    back onto the cached catalog snapshot for rendering.
+
+    The search is limited to the snapshot's own video ids (which already carry the site
+    filter), so the total counts exactly the videos that can be shown. The count comes from
+    the whole match set, not the page, and stays right for pages past the last match.
+    """
+    tokens = list(dict.fromkeys(tokenize_search_text(query)))
+    if not tokens:
+        return [], 0
+    ranking = get_catalog_snapshot(site_key).ranking
+    visible_ids = ranking.video_ids()
+    if not visible_ids:
+        return [], 0
+
+    params = {
+        'tsquery': ' & '.join(f"{token}:*" for token in tokens),
+        'visible_ids': visible_ids,
+        'limit': page_size,
+        'offset': (page - 1) * page_size,
+    }
+    ctx, owns_ctx = acquire_data_context()
+    cur = None
+    try:
+        cur = ctx.cursor()
         cur.execute(
-            "SELECT id, series_key, name, description FROM series WHERE series_key = %s LIMIT 1",
-            (series_key,)
+            f"""
+            WITH matches AS (
+                SELECT v.id, ts_rank(v.search_vector, q) AS rank,
+                       {schema_capabilities.video_column('v', 'likes', '0')} AS likes, v.title
+                FROM videos v, to_tsquery('english', %(tsquery)s) q
+                WHERE v.search_vector @@ q AND v.id = ANY(%(visible_ids)s)
+            )
+            SELECT (SELECT COUNT(*) FROM matches) AS total_matches,
+                   ARRAY(
+                       SELECT id FROM matches
+                       ORDER BY rank DESC, likes DESC, title ASC, id ASC
+                       LIMIT %(limit)s OFFSET %(offset)s
+                   ) AS page_ids
+            """,
+            params
         )
         row = cur.fetchone()
-        if not row:
-            return None, []
+    except psycopg2.Error:
+        ctx.recover()
+        raise
+    finally:
+        if cur:
+            cur.close()
+        if owns_ctx:
+            ctx.close()
 
-        series_info = dict(row)
+    videos = [video for video in map(ranking.get, row['page_ids']) if video is not None]
+    return videos, row['total_matches']
 
-        site_assignments_enabled = _video_site_assignments_enabled(cur)
-        if site_key and (not site_assignments_enabled) and site_key != "vespa":
-            # Sister sites should not accidentally show everything before the migration is applied
-            return series_info, []
+def search_videos(query, site_key=None, page=1, page_size=SEARCH_PAGE_SIZE):
+    """
+    Returns (results_for_page, total_matches) using the configured SEARCH_BACKEND.
+    The Postgres backend needs the search_vector migration; without it (or on a DB
+    error) the in-memory index answers instead.
+    """
+    page = max(1, page)
+    if SEARCH_BACKEND == 'postgres' and schema_capabilities.has_column('videos', 'search_vector'):
+        try:
+            return _search_postgres(query, site_key, page, page_size)
+        except (psycopg2.Error, Exception) as e:
+            print(f"Postgres search failed, falling back to in-memory index: {e}")
+    return _search_memory(query, site_key, page, page_size)
+
+SUGGEST_LIMIT = int(os.getenv('SUGGEST_LIMIT', '8'))
+SUGGEST_MIN_SIMILARITY = float(os.getenv('SUGGEST_MIN_SIMILARITY', '0.3'))
+SUGGEST_KIND_BONUS = {'title': 0.3, 'problem': 0.2, 'keyword': 0.1}
+SUGGEST_CANDIDATE_LIMIT = 500
+
+def _trigrams(word):
+    """pg_trgm-style trigrams: the word padded with two leading spaces and one trailing."""
+    padded = f"  {word} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+class SuggestIndex:
+    """
+    Immutable autocomplete index for one catalog snapshot.
 
-        join_site = ""
-        where_site = ""
-        params = [series_info["id"]]
-        if site_key and site_assignments_enabled:
-            join_site = "JOIN video_site_assignments vsite ON v.id = vsite.video_db_id"
-            where_site = "AND vsite.site_key = %s"
-            params.append(site_key)
+    Suggestions are phrases - video titles, individual keywords and problem texts. Each
+    query word is matched against the words of those phrases by prefix (bisect over the
+    sorted vocabulary) or, failing that, by trigram similarity so typos like "revison"
+    still find "revision". A phrase must match every query word to be suggested.
+    Everything is precomputed at build time; queries never touch the database.
+    """
+
+    PREFIX_EXPANSION_LIMIT = 200
+
+    def __init__(self, snapshot):
+        started = time.monotonic()
+        self.version = (snapshot.version, id(snapshot))
+        phrases = {}
+        for video in snapshot.videos:
+            likes = video.get('likes') or 0
+            candidates = [('title', video.get('title'))]
+            candidates += [('keyword', keyword) for keyword in (video.get('keywords') or '').split(',')]
+            candidates += [('problem', problem.get('text')) for problem in video.get('problems') or ()]
+            for kind, text in candidates:
+                text = (text or '').strip()
+                if not text:
+                    continue
+                key = (kind, text.lower())
+                existing = phrases.get(key)
+                if existing is None or likes > existing[2]:
+                    phrases[key] = (text, kind, likes)
+
+        # Most popular phrases first, so every posting list below is already in popularity order
+        # and a capped candidate scan keeps the phrases most worth suggesting.
+        self.entries = sorted(phrases.values(), key=lambda entry: (-SUGGEST_KIND_BONUS[entry[1]], -entry[2], entry[0]))
+        self.entry_words = []
+        word_entries = {}
+        for entry_id, (text, _, _) in enumerate(self.entries):
+            words = frozenset(tokenize_search_text(text))
+            self.entry_words.append(words)
+            for word in words:
+                word_entries.setdefault(word, []).append(entry_id)
+        self.word_entries = word_entries
+        self.vocabulary = sorted(word_entries)
+        self.word_trigrams = {word: _trigrams(word) for word in self.vocabulary}
+        trigram_words = {}
+        for word, grams in self.word_trigrams.items():
+            for gram in grams:
+                trigram_words.setdefault(gram, []).append(word)
+        self.trigram_words = trigram_words
+        self._cache = {}
+        self._stats_lock = threading.Lock()
+        self.stats = {'queries': 0, 'cache_hits': 0, 'total_query_seconds': 0.0, 'max_query_seconds': 0.0}
+        self.build_seconds = time.monotonic() - started
+
+    def _record_query(self, started, cache_hit):
+        elapsed = time.perf_counter() - started
+        with self._stats_lock:
+            self.stats['queries'] += 1
+            self.stats['cache_hits'] += cache_hit
+            self.stats['total_query_seconds'] += elapsed
+            self.stats['max_query_seconds'] = max(self.stats['max_query_seconds'], elapsed)
+
+    def _word_matches(self, token):
+        """{vocabulary word: match quality} for one query token."""
+        matches = {}
+        position = bisect.bisect_left(self.vocabulary, token)
+        end = min(len(self.vocabulary), position + self.PREFIX_EXPANSION_LIMIT)
+        while position < end and self.vocabulary[position].startswith(token):
+            word = self.vocabulary[position]
+            matches[word] = 1.0 if word == token else 0.9
+            position += 1
+        if matches or len(token) < 3:
+            return matches
+
+        token_grams = _trigrams(token)
+        shared = {}
+        for gram in token_grams:
+            for word in self.trigram_words.get(gram, ()):
+                shared[word] = shared.get(word, 0) + 1
+        for word, common in shared.items():
+            similarity = common / (len(token_grams) + len(self.word_trigrams[word]) - common)
+            if similarity >= SUGGEST_MIN_SIMILARITY:
+                matches[word] = 0.8 * similarity
+        return matches
+
+    def suggest(self, query, limit=SUGGEST_LIMIT):
+        started = time.perf_counter()
+        tokens = list(dict.fromkeys(tokenize_search_text(query)))
+        if not tokens:
+            return []
+        cache_key = (' '.join(tokens), limit)
+        cached = self._cache.get(cache_key)
+        if cached is not None:
+            self._record_query(started, True)
+            return cached
+
+        token_matches = [self._word_matches(token) for token in tokens]
+        # Drive the scan from the most selective token and check the others against each
+        # candidate's word set, so a common word ("tips") never has to be expanded in full.
+        token_matches.sort(key=lambda matches: sum(len(self.word_entries[word]) for word in matches))
+        entry_scores = {}
+        driver = sorted(token_matches[0].items(), key=lambda item: -item[1])
+        for word, quality in driver:
+            for entry_id in self.word_entries[word]:
+                if entry_id not in entry_scores:
+                    entry_scores[entry_id] = quality
+                    if len(entry_scores) >= SUGGEST_CANDIDATE_LIMIT:
+                        break
+            if len(entry_scores) >= SUGGEST_CANDIDATE_LIMIT:
+                break
+        for matches in token_matches[1:]:
+            narrowed = {}
+            for entry_id, score in entry_scores.items():
+                best = max((matches[word] for word in self.entry_words[entry_id] if word in matches), default=0.0)
+                if best:
+                    narrowed[entry_id] = score + best
+            entry_scores = narrowed
+            if not entry_scores:
+                break
+
+        results = []
+        if entry_scores:
+            phrase = ' '.join(tokens)
+
+            def rank(entry_id):
+                text, kind, likes = self.entries[entry_id]
+                starts_with = 0.5 if text.lower().startswith(phrase) else 0.0
+                return (-(entry_scores[entry_id] + starts_with + SUGGEST_KIND_BONUS[kind]), -likes, len(text))
+
+            for entry_id in heapq.nsmallest(limit, entry_scores, key=rank):
+                text, kind, _ = self.entries[entry_id]
+                results.append({'text': text, 'kind': kind})
+
+        if len(self._cache) > 2048:
+            self._cache.clear()
+        self._cache[cache_key] = results
+        self._record_query(started, False)
+        return results
+
+    def summary(self):
+        with self._stats_lock:
+            stats = dict(self.stats)
+        queries = stats['queries']
+        return {
+            'phrases': len(self.entries),
+            'words': len(self.vocabulary),
+            'trigrams': len(self.trigram_words),
+            'build_seconds': self.build_seconds,
+            'catalog_version': self.version[0],
+            'avg_query_seconds': stats['total_query_seconds'] / queries if queries else None,
+            **stats,
+        }
+
+_suggest_indexes = {}
+_suggest_build_locks = {}
+_suggest_refreshing = set()
+_suggest_indexes_lock = threading.Lock()
+_suggest_refresh_executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix='suggest-refresh')
+_suggest_stats = {'inline_builds': 0, 'background_refreshes': 0, 'stale_served': 0, 'refresh_errors': 0}
+
+def _build_suggest_index(site_key):
+    """Brings a site's index up to its current catalog snapshot; one build per site at a time."""
+    with _suggest_indexes_lock:
+        build_lock = _suggest_build_locks.setdefault(site_key, threading.Lock())
+    with build_lock:
+        snapshot = get_catalog_snapshot(site_key)  # May rebuild the catalog from the DB
+        index = _suggest_indexes.get(site_key)
+        if index is None or index.version != (snapshot.version, id(snapshot)):
+            # Built off to the side and swapped in, so concurrent readers never see a partial index.
+            index = SuggestIndex(snapshot)
+            _suggest_indexes[site_key] = index
+        return index
+
+def _refresh_suggest_index(site_key):
+    try:
+        _build_suggest_index(site_key)
+    except Exception as e:
+        print(f"Error refreshing suggest index for site {site_key!r}: {e}")
+        with _suggest_indexes_lock:
+            _suggest_stats['refresh_errors'] += 1
+    finally:
+        with _suggest_indexes_lock:
+            _suggest_refreshing.discard(site_key)
 
+def get_suggest_index(site_key=None):
+    """
+    Returns the SuggestIndex for a site without making the request wait on a rebuild.
+
+    Only the very first call per site builds inline. After that, once the catalog snapshot
+    is invalidated or past its TTL, the current index keeps answering while one background
+    task per site reloads the catalog (if nobody else has yet) and builds the new index.
+    """
+    index = _suggest_indexes.get(site_key)
+    if index is None:
+        with _suggest_indexes_lock:
+            _suggest_stats['inline_builds'] += 1
+        return _build_suggest_index(site_key)
+
+    snapshot = catalog_cache.peek(site_key)
+    if snapshot is not None and index.version == (snapshot.version, id(snapshot)):
+        return index
+    with _suggest_indexes_lock:
+        _suggest_stats['stale_served'] += 1
+        start_refresh = site_key not in _suggest_refreshing
+        if start_refresh:
+            _suggest_refreshing.add(site_key)
+            _suggest_stats['background_refreshes'] += 1
+    if start_refresh:
+        _suggest_refresh_executor.submit(_refresh_suggest_index, site_key)
+    return index
+
+def suggest_stats():
+    with _suggest_indexes_lock:
+        stats = dict(_suggest_stats, refreshing=sorted(map(str, _suggest_refreshing)))
+    stats['sites'] = {str(site_key): index.summary() for site_key, index in list(_suggest_indexes.items())}
+    return stats
+
+def get_all_problems():
+    """Fetches all unique problems from the database for search filters."""
+    ctx, owns_ctx = acquire_data_context()
+    cur = None
+    problems_list = []
+    try:
+        cur = ctx.cursor()
+        cur.execute("SELECT problem_id, problem_text, theme FROM problems ORDER BY theme, problem_text")
+        problems_list = cur.fetchall()
+    except (psycopg2.Error, Exception) as e:
+        ctx.recover()
+        flash(f"Database error loading problems: {e}", "danger")
+        print(f"Database error in get_all_problems: {e}")
+    finally:
+        if cur:
+            cur.close()
+        if owns_ctx:
+            ctx.close()
+    return problems_list
+
+def shared_video_record(vid_row, ranking):
+    """
+    The catalog's live VideoRecord for a series row (from the snapshot's RankingIndex, so its
+    likes match "most liked"), so series lists don't duplicate videos.
+    """
+    return ranking.get(vid_row['id']) or VideoRecord.from_mapping(vid_row)
+
+def live_video_records(videos, ranking):
+    """Swaps snapshot records for the RankingIndex's current ones, which carry likes applied since the build."""
+    return [ranking.get(video.db_id) or video for video in videos]
+
+SERIES_TOP_N = 3  # Videos shown per series on the homepages before "view all"
+SERIES_CACHE_MAX_ENTRIES = 64
+
+class SeriesCache:
+    """
+    load_series_batch() layouts ({series_key: (info, videos)}) per worker, keyed by the request
+    plus the catalog snapshot (version and build), so admin writes and TTL rebuilds retire
+    them. Likes are not part of the layout; they're resolved per call. FIFO-bounded.
+    """
+
+    def __init__(self, max_entries=SERIES_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._stats = {'hits': 0, 'misses': 0}
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            self._stats['hits' if entry is not None else 'misses'] += 1
+            return entry
+
+    def put(self, key, entry):
+        with self._lock:
+            while len(self._entries) >= self.max_entries:
+                self._entries.pop(next(iter(self._entries)))
+            self._entries[key] = entry
+
+    def discard_series(self, series_id):
+        """Drops every cached layout that contains the given series; returns how many."""
+        with self._lock:
+            keys = [
+                key for key, layout in self._entries.items()
+                if any(info['id'] == series_id for info, _ in layout.values())
+            ]
+            for key in keys:
+                del self._entries[key]
+            return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, entries=len(self._entries))
+
+series_cache = SeriesCache()
+
+def note_series_shown(batch):
+    """Records the series a request rendered, so cached_page can tag the stored page with them."""
+    if has_request_context():
+        g.series_shown = g.get('series_shown', frozenset()) | {series['info']['id'] for series in batch.values()}
+
+def load_series_batch(series_keys=(), site_key=None, include_featured=False, top_n=SERIES_TOP_N):
+    """
+    Loads several series and their videos in one query. Returns {series_key: {'info': ...,
+    'videos': (...), 'top_videos': (...)}} where `videos` is the full list in display_order
+    (likes desc, then id, breaking ties) and `top_videos` the `top_n` most liked. With
+    include_featured the featured series is added as well (its info has is_featured=True).
+
+    If site_key is given and video_site_assignments exists, videos are filtered to that site.
+    Videos are the catalog snapshot's shared, live VideoRecords. The series layout is cached
+    per snapshot; likes and the top_n order are resolved against the ranking on every call.
+    """
+    series_keys = tuple(series_keys)
+    snapshot = get_catalog_snapshot(site_key)
+    cache_key = (site_key, series_keys, include_featured, top_n, snapshot.version, snapshot.built_monotonic)
+    layout = series_cache.get(cache_key)
+    if layout is not None:
+        batch = _resolve_series_batch(layout, snapshot.ranking, top_n)
+        note_series_shown(batch)
+        return batch
+
+    site_assignments_enabled = schema_capabilities.site_assignments
+    # Sister sites should not accidentally show everything before the migration is applied
+    hide_videos = bool(site_key) and (not site_assignments_enabled) and site_key != "vespa"
+    join_site = ""
+    where_site = ""
+    params = []
+    if site_key and site_assignments_enabled:
+        join_site = "JOIN video_site_assignments vsite ON v.id = vsite.video_db_id"
+        where_site = "AND vsite.site_key = %s"
+        params.append(site_key)
+    params.append(list(series_keys))
+
+    ctx, owns_ctx = acquire_data_context()
+    cur = None
+    try:
+        cur = ctx.cursor()
         cur.execute(
             f"""
-            SELECT v.id, v.platform, v.video_id_on_platform, v.title, v.view_count, v.likes, v.id as db_id
-            FROM videos v
-            JOIN video_series_assignments vsa ON v.id = vsa.video_db_id
-            {join_site}
-            WHERE vsa.series_db_id = %s
-            {where_site}
-            ORDER BY vsa.display_order ASC, v.likes DESC, v.id ASC
+            SELECT s.id, s.series_key, s.name, s.description, s.is_featured,
+                   COALESCE(sv.videos, '[]'::json) AS videos
+            FROM series s
+            LEFT JOIN LATERAL (
+                SELECT json_agg(json_build_object(
+                    'id', v.id,
+                    'platform', v.platform,
+                    'video_id_on_platform', v.video_id_on_platform,
+                    'title', v.title,
+                    'view_count', v.view_count,
+                    'likes', v.likes
+                ) ORDER BY vsa.display_order ASC, v.likes DESC, v.id ASC) AS videos
+                FROM video_series_assignments vsa
+                JOIN videos v ON v.id = vsa.video_db_id
+                {join_site}
+                WHERE vsa.series_db_id = s.id
+                {where_site}
+            ) sv ON TRUE
+            WHERE s.series_key = ANY(%s) {"OR s.is_featured = TRUE" if include_featured else ""}
+            ORDER BY s.id
             """,
             tuple(params)
         )
-
-        for vid_row in cur.fetchall():
-            series_videos.append({
-                "db_id": vid_row["id"],
-                "platform": vid_row["platform"],
-                "video_id": vid_row["video_id_on_platform"],
-                "video_id_on_platform": vid_row["video_id_on_platform"],
-                "title": vid_row["title"],
-                "view_count": vid_row["view_count"],
-                "likes": vid_row["likes"],
-            })
-
+        rows = cur.fetchall()
     except (psycopg2.Error, Exception) as e:
-        print(f"Database error in load_series_videos_for_site({series_key}): {e}")
-        return None, []
+        ctx.recover()
+        print(f"Database error in load_series_batch({', '.join(series_keys)}): {e}")
+        return {}
     finally:
         if cur:
             cur.close()
-        if conn:
-            conn.close()
+        if owns_ctx:
+            ctx.close()
+
+    ranking = snapshot.ranking
+    layout = {}
+    featured_seen = False
+    for row in rows:
+        is_featured = bool(row['is_featured']) and not featured_seen
+        if row['series_key'] not in series_keys and not is_featured:
+            continue  # A second featured series (only one is meant to exist)
+        featured_seen = featured_seen or is_featured
+        layout[row['series_key']] = (
+            {
+                'id': row['id'],
+                'series_key': row['series_key'],
+                'name': row['name'],
+                'description': row['description'],
+                'is_featured': is_featured,
+            },
+            () if hide_videos else tuple(shared_video_record(vid_row, ranking) for vid_row in row['videos']),
+        )
+    series_cache.put(cache_key, layout)
+    batch = _resolve_series_batch(layout, ranking, top_n)
+    note_series_shown(batch)
+    return batch
+
+def _resolve_series_batch(layout, ranking, top_n):
+    """Builds a load_series_batch() result from a cached layout with each video's live record."""
+    batch = {}
+    for series_key, (info, videos) in layout.items():
+        videos = tuple(live_video_records(videos, ranking))
+        # Most liked first; display position breaks ties, as the old per-series query did.
+        top_positions = heapq.nsmallest(top_n, range(len(videos)), key=lambda i: (-(videos[i].likes or 0), i))
+        batch[series_key] = {
+            'info': info,
+            'videos': videos,
+            'top_videos': tuple(videos[i] for i in top_positions),
+        }
+    return batch
+
+def featured_series_from_batch(batch):
+    """(info, top videos, all videos) of the featured series in a load_series_batch() result."""
+    for series in batch.values():
+        if series['info']['is_featured']:
+            return series['info'], list(series['top_videos']), list(series['videos'])
+    return None, [], []
 
-    return series_info, series_videos
+def load_featured_series_data(site_key=None):
+    """Loads the featured series and its top 3 liked videos."""
+    return featured_series_from_batch(load_series_batch(site_key=site_key, include_featured=True))
+
+def load_series_videos_for_site(series_key, site_key=None):
+    """
+    Load a specific series (by series_key) and its videos.
+    If site_key is provided and video_site_assignments exists, videos are filtered to that site.
+    """
+    series = load_series_batch([series_key], site_key=site_key).get(series_key)
+    if series is None:
+        return None, []
+    return series['info'], list(series['videos'])
 
 def login_required(f):
     @wraps(f)
@@ -474,12 +3178,425 @@ def login_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+VIDEO_FACADES = os.getenv('VIDEO_FACADES', 'on').lower() not in ('0', 'off', 'false', 'no')
+THUMB_CACHE_DIR = os.getenv('THUMB_CACHE_DIR') or os.path.join(tempfile.gettempdir(), 'vespa_thumbs')
+THUMB_CACHE_MAX_BYTES = int(os.getenv('THUMB_CACHE_MAX_BYTES', str(200 * 1024 * 1024)))
+THUMB_WIDTH = 480
+THUMB_MAX_AGE = 30 * 24 * 3600  # Posters for a video id never change upstream
+THUMB_FAILURE_TTL = 300  # Seconds before retrying an upstream that had no poster
+THUMB_FAILURE_MAX_ENTRIES = 4096  # Remembered failures; /thumb is public, so ids are attacker-chosen
+THUMB_DEFAULT_TYPE = 'image/jpeg'
+THUMB_FETCH_TIMEOUT = 5
+_THUMB_ID_RE = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+def video_embed_url(platform, video_id, autoplay=False):
+    """Player iframe URL for a video, or None for unsupported platforms."""
+    quoted_id = urllib.parse.quote(str(video_id), safe='')
+    if platform == 'muse':
+        return f"https://muse.ai/embed/{quoted_id}?cover_play_position=center&autoplay={1 if autoplay else 0}&loop=0"
+    if platform == 'youtube':
+        return f"https://www.youtube.com/embed/{quoted_id}" + ("?autoplay=1" if autoplay else "")
+    if platform == 'vimeo':
+        return f"https://player.vimeo.com/video/{quoted_id}" + ("?autoplay=1" if autoplay else "")
+    return None
+
+app.jinja_env.globals.update(video_embed_url=video_embed_url, video_facades=VIDEO_FACADES)
+
+def _http_get(url):
+    request_obj = urllib.request.Request(url, headers={'User-Agent': 'vespa-videos-thumbnailer/1.0'})
+    with urllib.request.urlopen(request_obj, timeout=THUMB_FETCH_TIMEOUT) as response:
+        return response.read(), response.headers.get_content_type()
+
+def fetch_platform_thumbnail(platform, video_id):
+    """
+    Default upstream fetcher: returns (image bytes, content type) for a video's poster.
+    YouTube posters are at a fixed URL; Muse and Vimeo publish theirs through oEmbed.
+    Swap via app.config['THUMBNAIL_FETCHER'] (same signature) for a local fake.
+    """
+    if platform == 'youtube':
+        return _http_get(f"https://i.ytimg.com/vi/{urllib.parse.quote(video_id)}/hqdefault.jpg")
+    if platform == 'vimeo':
+        oembed_url = "https://vimeo.com/api/oembed.json?url=" + urllib.parse.quote(f"https://vimeo.com/{video_id}", safe='')
+    elif platform == 'muse':
+        oembed_url = "https://muse.ai/oembed?url=" + urllib.parse.quote(f"https://muse.ai/v/{video_id}", safe='')
+    else:
+        raise ValueError(f"Unsupported platform '{platform}'")
+    body, _ = _http_get(oembed_url)
+    thumbnail_url = json.loads(body).get('thumbnail_url')
+    if not thumbnail_url:
+        raise ValueError(f"No thumbnail_url in oEmbed response for {platform}/{video_id}")
+    return _http_get(thumbnail_url)
+
+app.config.setdefault('THUMBNAIL_FETCHER', fetch_platform_thumbnail)
+
+class ThumbnailCache:
+    """
+    Video posters on local disk, fetched from the platform once and then served from here.
+
+    With Pillow installed posters are resized to THUMB_WIDTH and re-encoded as JPEG;
+    without it the upstream bytes are stored as-is. Files are written atomically, their
+    mtime is bumped on every hit, and once the directory passes max_bytes the least
+    recently used files are deleted until it is back under 90%. Concurrent requests for
+    the same missing poster share one upstream fetch, and failures are remembered for
+    THUMB_FAILURE_TTL seconds (at most THUMB_FAILURE_MAX_ENTRIES of them) so a dead
+    upstream isn't hammered. Each poster's content type is kept in a small sidecar file.
+    """
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self._failures = {}
+        self._size = None
+        self._stats = {'hits': 0, 'fetches': 0, 'failures': 0, 'evictions': 0}
+
+    def _path(self, platform, video_id):
+        return os.path.join(self.directory, f"{platform}_{video_id}.img")
+
+    @staticmethod
+    def _type_path(path):
+        return path + '.type'
+
+    @staticmethod
+    def _clean_type(content_type):
+        content_type = (content_type or '').strip().lower()
+        if content_type.startswith('image/') and content_type.isascii() and ';' not in content_type and len(content_type) <= 64:
+            return content_type
+        return THUMB_DEFAULT_TYPE
+
+    def content_type(self, path):
+        """The stored content type of a cached poster (JPEG if unknown)."""
+        try:
+            with open(self._type_path(path), encoding='ascii') as f:
+                return self._clean_type(f.read())
+        except (OSError, ValueError):
+            return THUMB_DEFAULT_TYPE
+
+    def _write(self, path, data):
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as tmp_file:
+            tmp_file.write(data)
+        os.replace(tmp_path, path)
+
+    def _remember_failure(self, key):
+        """Called with self._lock held. Drops expired failures, then the oldest past the cap."""
+        now = time.monotonic()
+        self._failures.pop(key, None)
+        for stale_key in [k for k, failed_at in self._failures.items() if now - failed_at >= THUMB_FAILURE_TTL]:
+            del self._failures[stale_key]
+        while len(self._failures) >= THUMB_FAILURE_MAX_ENTRIES:
+            self._failures.pop(next(iter(self._failures)))
+        self._failures[key] = now
+
+    def _shrink(self, data, content_type):
+        """Returns (bytes to store, their content type)."""
+        if Image is None:
+            return data, content_type
+        try:
+            with Image.open(io.BytesIO(data)) as image:
+                image = image.convert('RGB')
+                if image.width > THUMB_WIDTH:
+                    image = image.resize((THUMB_WIDTH, round(image.height * THUMB_WIDTH / image.width)))
+                out = io.BytesIO()
+                image.save(out, format='JPEG', quality=80, optimize=True, progressive=True)
+                return out.getvalue(), 'image/jpeg'
+        except Exception as e:
+            print(f"Could not resize thumbnail, storing original: {e}")
+            return data, content_type
+
+    def _evict(self):
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and entry.name.endswith('.img'):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        if total > self.max_bytes:
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes * 0.9:
+                    break
+                try:
+                    os.remove(path)
+                    total -= size
+                    self._stats['evictions'] += 1
+                except OSError:
+                    continue
+                try:
+                    os.remove(self._type_path(path))
+                except OSError:
+                    pass
+        self._size = total
+
+    def get(self, platform, video_id):
+        """Returns the path of the cached poster, fetching it first if needed; None if unavailable."""
+        path = self._path(platform, video_id)
+        if os.path.exists(path):
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+            self._stats['hits'] += 1
+            return path
+
+        key = (platform, video_id)
+
+        def recently_failed():
+            failed_at = self._failures.get(key)
+            return failed_at is not None and time.monotonic() - failed_at < THUMB_FAILURE_TTL
+
+        with self._lock:
+            if recently_failed():
+                return None
+            # Only requests currently fetching hold an entry here; it is removed when they finish.
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        try:
+            with key_lock:
+                if os.path.exists(path):
+                    return path
+                with self._lock:
+                    if recently_failed():  # Failed while this request waited for the lock
+                        return None
+                try:
+                    data, content_type = app.config['THUMBNAIL_FETCHER'](platform, video_id)
+                    data, content_type = self._shrink(data, content_type)
+                    os.makedirs(self.directory, exist_ok=True)
+                    # Type first, so a visible poster always has its sidecar.
+                    self._write(self._type_path(path), self._clean_type(content_type).encode('ascii'))
+                    self._write(path, data)
+                    self._stats['fetches'] += 1
+                except Exception as e:
+                    print(f"Error fetching thumbnail for {platform}/{video_id}: {e}")
+                    with self._lock:
+                        self._remember_failure(key)
+                    self._stats['failures'] += 1
+                    return None
+        finally:
+            with self._lock:
+                self._key_locks.pop(key, None)
+
+        with self._lock:
+            self._failures.pop(key, None)
+            self._size = None if self._size is None else self._size + len(data)
+            needs_eviction = self._size is None or self._size > self.max_bytes
+        if needs_eviction:
+            self._evict()
+        return path
+
+    def stats(self):
+        with self._lock:
+            remembered_failures = len(self._failures)
+        return dict(
+            self._stats, directory=self.directory, approx_bytes=self._size, pillow=Image is not None,
+            remembered_failures=remembered_failures,
+        )
+
+thumbnail_cache = ThumbnailCache(THUMB_CACHE_DIR, THUMB_CACHE_MAX_BYTES)
+
+METADATA_WORKERS = int(os.getenv('METADATA_WORKERS', '8'))  # Concurrent oEmbed requests
+METADATA_REFRESH_DAYS = float(os.getenv('METADATA_REFRESH_DAYS', '30'))
+METADATA_RETRY_HOURS = 6  # How soon a failed fetch is tried again
+
+OEMBED_ENDPOINTS = {
+    'muse': ("https://muse.ai/oembed", "https://muse.ai/v/{}"),
+    'youtube': ("https://www.youtube.com/oembed", "https://www.youtube.com/watch?v={}"),
+    'vimeo': ("https://vimeo.com/api/oembed.json", "https://vimeo.com/{}"),
+}
+
+def fetch_oembed_metadata(platform, video_id, etag=None, last_modified=None):
+    """
+    Default metadata fetcher: one conditional oEmbed request. Returns a dict with
+    not_modified=True on 304, else the parsed fields plus the response's validators.
+    Swap via app.config['METADATA_FETCHER'] (same signature) for a local fake.
+    """
+    endpoint, page_url = OEMBED_ENDPOINTS[platform]
+    url = f"{endpoint}?format=json&url={urllib.parse.quote(page_url.format(video_id), safe='')}"
+    headers = {'User-Agent': 'vespa-videos-harvester/1.0'}
+    if etag:
+        headers['If-None-Match'] = etag
+    if last_modified:
+        headers['If-Modified-Since'] = last_modified
+    try:
+        with urllib.request.urlopen(urllib.request.Request(url, headers=headers), timeout=THUMB_FETCH_TIMEOUT) as response:
+            data = json.loads(response.read())
+            validators = {'etag': response.headers.get('ETag'), 'last_modified': response.headers.get('Last-Modified')}
+    except urllib.error.HTTPError as e:
+        if e.code == 304:
+            return {'not_modified': True}
+        raise
+    return {
+        'not_modified': False,
+        'provider_title': data.get('title'),
+        'duration_seconds': int(data['duration']) if data.get('duration') else None,
+        'width': int(data['width']) if data.get('width') else None,
+        'height': int(data['height']) if data.get('height') else None,
+        'thumbnail_url': data.get('thumbnail_url'),
+        'raw': data,
+        **validators,
+    }
+
+app.config.setdefault('METADATA_FETCHER', fetch_oembed_metadata)
+
+def harvest_video_metadata(video_ids=None, force=False, limit=None):
+    """
+    Fetches oEmbed metadata for videos that have none yet or are due for refresh (all given
+    video_ids when force is set) on a bounded thread pool, then upserts every result into
+    video_metadata in one statement. Returns counts by outcome.
+    """
+    conn = None
+    cur = None
+    try:
+        conn = get_db_connection()
+        cur = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
+        cur.execute("""
+            SELECT v.id, v.platform, v.video_id_on_platform, m.etag, m.last_modified
+            FROM videos v
+            LEFT JOIN video_metadata m ON m.video_db_id = v.id
+            WHERE v.platform = ANY(%(platforms)s)
+              AND (%(video_ids)s::int[] IS NULL OR v.id = ANY(%(video_ids)s::int[]))
+              AND (%(force)s OR m.video_db_id IS NULL OR m.refresh_after <= NOW())
+            ORDER BY m.fetched_at NULLS FIRST, v.id
+            LIMIT %(limit)s
+        """, {
+            'platforms': list(SUPPORTED_PLATFORMS),
+            'video_ids': list(video_ids) if video_ids is not None else None,
+            'force': force,
+            'limit': limit,
+        })
+        due = cur.fetchall()
+        conn.rollback()
+        if not due:
+            return {'due': 0}
+
+        fetcher = app.config['METADATA_FETCHER']
+
+        def fetch(row):
+            # Forced refreshes skip the validators so the platform sends the full document.
+            etag, last_modified = (None, None) if force else (row['etag'], row['last_modified'])
+            try:
+                return row, fetcher(row['platform'], row['video_id_on_platform'], etag, last_modified), None
+            except Exception as e:
+                return row, None, str(e)
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=METADATA_WORKERS) as pool:
+            results = list(pool.map(fetch, due))
+
+        counts = {'due': len(due), 'updated': 0, 'not_modified': 0, 'errors': 0}
+        upserts = []
+        unchanged_ids = []
+        for row, metadata, error in results:
+            if error is not None:
+                counts['errors'] += 1
+                upserts.append((row['id'], row['platform'], None, None, None, None, None, None, None, None, 'error', error, METADATA_RETRY_HOURS * 3600))
+            elif metadata.get('not_modified'):
+                counts['not_modified'] += 1
+                unchanged_ids.append(row['id'])
+            else:
+                counts['updated'] += 1
+                upserts.append((
+                    row['id'], row['platform'], metadata.get('provider_title'), metadata.get('duration_seconds'),
+                    metadata.get('width'), metadata.get('height'), metadata.get('thumbnail_url'),
+                    psycopg2.extras.Json(metadata.get('raw')), metadata.get('etag'), metadata.get('last_modified'),
+                    'ok', None, METADATA_REFRESH_DAYS * 86400,
+                ))
+
+        if upserts:
+            # Errors keep whatever good metadata the row already had; only status/error/refresh_after change.
+            psycopg2.extras.execute_values(cur, """
+                INSERT INTO video_metadata AS m (video_db_id, platform, provider_title, duration_seconds, width, height,
+                                                 thumbnail_url, raw, etag, last_modified, status, error, fetched_at, refresh_after)
+                SELECT d.video_db_id, d.platform, d.provider_title, d.duration_seconds, d.width, d.height,
+                       d.thumbnail_url, d.raw, d.etag, d.last_modified, d.status, d.error,
+                       NOW(), NOW() + make_interval(secs => d.refresh_secs)
+                FROM (VALUES %s) AS d(video_db_id, platform, provider_title, duration_seconds, width, height,
+                                      thumbnail_url, raw, etag, last_modified, status, error, refresh_secs)
+                ON CONFLICT (video_db_id) DO UPDATE SET
+                    platform = EXCLUDED.platform,
+                    provider_title = CASE WHEN EXCLUDED.status = 'ok' THEN EXCLUDED.provider_title ELSE m.provider_title END,
+                    duration_seconds = CASE WHEN EXCLUDED.status = 'ok' THEN EXCLUDED.duration_seconds ELSE m.duration_seconds END,
+                    width = CASE WHEN EXCLUDED.status = 'ok' THEN EXCLUDED.width ELSE m.width END,
+                    height = CASE WHEN EXCLUDED.status = 'ok' THEN EXCLUDED.height ELSE m.height END,
+                    thumbnail_url = CASE WHEN EXCLUDED.status = 'ok' THEN EXCLUDED.thumbnail_url ELSE m.thumbnail_url END,
+                    raw = CASE WHEN EXCLUDED.status = 'ok' THEN EXCLUDED.raw ELSE m.raw END,
+                    etag = CASE WHEN EXCLUDED.status = 'ok' THEN EXCLUDED.etag ELSE m.etag END,
+                    last_modified = CASE WHEN EXCLUDED.status = 'ok' THEN EXCLUDED.last_modified ELSE m.last_modified END,
+                    status = EXCLUDED.status,
+                    error = EXCLUDED.error,
+                    fetched_at = EXCLUDED.fetched_at,
+                    refresh_after = EXCLUDED.refresh_after
+            """, upserts, template="(%s::int, %s, %s, %s::int, %s::int, %s::int, %s, %s::jsonb, %s, %s, %s, %s, %s::float8)")
+        if unchanged_ids:
+            cur.execute("""
+                UPDATE video_metadata
+                SET status = 'ok', error = NULL, fetched_at = NOW(),
+                    refresh_after = NOW() + make_interval(secs => %s)
+                WHERE video_db_id = ANY(%s)
+            """, (METADATA_REFRESH_DAYS * 86400, unchanged_ids))
+        conn.commit()
+    except (psycopg2.Error, Exception) as e:
+        if conn:
+            conn.rollback()
+        print(f"Database error in harvest_video_metadata: {e}")
+        raise
+    finally:
+        if cur:
+            cur.close()
+        if conn:
+            release_db_connection(conn)
+
+    if counts['updated']:
+        invalidate_catalog()  # Player sizes are part of the catalog
+    return counts
+
+_metadata_executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix='metadata-harvest')
+
+def harvest_metadata_in_background(video_ids):
+    """Fire-and-forget harvest for freshly added videos; the admin request doesn't wait on oEmbed."""
+    if not schema_capabilities.has_table('video_metadata'):
+        return
+
+    def run():
+        try:
+            harvest_video_metadata(video_ids)
+        except Exception as e:
+            print(f"Background metadata harvest failed for {video_ids}: {e}")
+
+    _metadata_executor.submit(run)
+
+@app.cli.command('harvest-metadata')
+@click.option('--force', is_flag=True, help='Refetch every video, ignoring refresh_after and validators.')
+@click.option('--limit', type=int, default=None, help='Harvest at most this many videos.')
+def harvest_metadata_command(force, limit):
+    """Fetches oEmbed metadata (size, duration, thumbnail) for videos that are missing or due."""
+    counts = harvest_video_metadata(force=force, limit=limit)
+    print(', '.join(f"{key}: {value}" for key, value in counts.items()))
+
+def video_aspect_style(video):
+    """
+    CSS padding for a .video-embed-container matching the player's native shape, from the
+    harvested metadata; empty (the 16:9 stylesheet default) when unknown or already 16:9.
+    """
+    ratio = video.get('aspect_ratio') if video else None
+    if not ratio or abs(ratio - 0.5625) < 0.01:
+        return ''
+    return f"padding-bottom: {min(max(ratio, 0.3), 2.0) * 100:.4f}%;"
+
+app.jinja_env.globals['video_aspect_style'] = video_aspect_style
+
+THUMB_PLACEHOLDER_SVG = (
+    '<svg xmlns="http://www.w3.org/2000/svg" width="480" height="270" viewBox="0 0 480 270">'
+    '<rect width="480" height="270" fill="#1f2d3d"/></svg>'
+)
+
 @app.route('/')
+@cached_page
 def index():
     message = request.args.get('message')
     error = request.args.get('error')
     site_ctx = get_site_context_from_request()
-    vespa_categories_data, all_videos_data = load_data(site_key=site_ctx.get("site_key"))
+    catalog_snapshot = get_catalog_snapshot(site_ctx.get("site_key"))
+    vespa_categories_data, all_videos_data = catalog_snapshot.categories, catalog_snapshot.videos
     all_problems_for_filter = get_all_problems() # Fetch all problems
     
     featured_video = None
@@ -500,16 +3617,31 @@ def index():
 
         # Prepare categories for display, ensuring "Fresh New Vids" is first if it exists.
         ordered_display_categories = []
-        fresh_vids_category_key = 'fresh_new_vids' # Key used in load_data
+        fresh_vids_category_key = FRESH_NEW_VIDS_KEY # Key used in load_data
 
         if fresh_vids_category_key in vespa_categories_data:
             # Add Fresh New Vids first, and include its key for the template if needed
             fresh_vids_data = vespa_categories_data[fresh_vids_category_key]
             ordered_display_categories.append( (fresh_vids_category_key, fresh_vids_data) )
 
+        for dynamic_key in (TRENDING_KEY, MOST_VIEWED_KEY):
+            if dynamic_key in vespa_categories_data:
+                ordered_display_categories.append( (dynamic_key, vespa_categories_data[dynamic_key]) )
+
         for cat_key, cat_data in vespa_categories_data.items():
-            if cat_key != MARKETING_PROMO_CATEGORY_KEY and cat_key != fresh_vids_category_key:
+            if cat_key not in (MARKETING_PROMO_CATEGORY_KEY, fresh_vids_category_key, MOST_VIEWED_KEY, TRENDING_KEY):
                 ordered_display_categories.append( (cat_key, cat_data) )
+
+        # Revisions are read before the lists, so a fragment is never stored under a newer
+        # revision than the order it shows.
+        category_revisions = {
+            cat_key: catalog_snapshot.ranking.list_revision(cat_key) for cat_key, _ in ordered_display_categories
+        }
+        # Likes-ordered categories and Fresh New Vids in their live order (see RankingIndex)
+        ordered_display_categories = [
+            (cat_key, {**cat_data, 'videos': ranked_category_videos(catalog_snapshot, cat_key, cat_data)})
+            for cat_key, cat_data in ordered_display_categories
+        ]
         
         # display_categories = {} # Original approach, replaced by ordered_display_categories
         # for cat_key, cat_data in vespa_categories_data.items():
@@ -517,32 +3649,40 @@ def index():
         #         display_categories[cat_key] = cat_data
     else:
         ordered_display_categories = [] # Ensure it's an empty list if vespa_categories_data is empty
+        category_revisions = {}
     
     # Prepare most liked videos (after all_videos_data is populated with likes)
+    most_liked_revision = catalog_snapshot.ranking.list_revision(MOST_LIKED_LIST)
     if all_videos_data:
-        # Sort videos by likes in descending order
-        sorted_videos_by_likes = sorted(all_videos_data, key=lambda v: v.get('likes', 0), reverse=True)
-        most_liked_videos = sorted_videos_by_likes[:3] # Get top 3 liked videos
-
-    # Load featured series data (VESPA homepage uses this; CSC template currently ignores it)
-    featured_series_info, featured_series_top_videos, featured_series_all_videos = load_featured_series_data()
+        most_liked_videos = catalog_snapshot.ranking.top_liked(3) # Top 3 liked videos, kept ordered by the ranking index
 
-    # CSC homepage: two audience sections using series keys
+    # Series sections, all fetched in one query: the featured series (VESPA homepage; the
+    # CSC template ignores it) or the two CSC audience series keyed by series_key.
+    featured_series_info, featured_series_top_videos, featured_series_all_videos = None, [], []
     csc_student_series_info = None
     csc_student_series_videos = []
     csc_staff_series_info = None
     csc_staff_series_videos = []
 
     if site_ctx.get("site_key") == "csc":
-        csc_student_series_info, csc_student_series_videos = load_series_videos_for_site(
-            "csc_students",
-            site_key=site_ctx.get("site_key")
-        )
-        csc_staff_series_info, csc_staff_series_videos = load_series_videos_for_site(
-            "csc_staff",
-            site_key=site_ctx.get("site_key")
+        series_batch = load_series_batch(["csc_students", "csc_staff"], site_key=site_ctx.get("site_key"))
+        if "csc_students" in series_batch:
+            csc_student_series_info = series_batch["csc_students"]['info']
+            csc_student_series_videos = series_batch["csc_students"]['videos']
+        if "csc_staff" in series_batch:
+            csc_staff_series_info = series_batch["csc_staff"]['info']
+            csc_staff_series_videos = series_batch["csc_staff"]['videos']
+    else:
+        featured_series_info, featured_series_top_videos, featured_series_all_videos = featured_series_from_batch(
+            load_series_batch(site_key=site_ctx.get("site_key"), include_featured=True)
         )
 
+    # Category modals ship only their first page; the rest is fetched from the catalog API.
+    category_next_cursors = {
+        cat_key: page_category_videos(cat_data['videos'], cat_key)[1]
+        for cat_key, cat_data in ordered_display_categories
+    }
+
     template_name = 'csc_index.html' if site_ctx.get("site_key") == "csc" else 'index.html'
 
     return render_template(
@@ -562,6 +3702,11 @@ def index():
         csc_staff_series_info=csc_staff_series_info,
         csc_staff_series_videos=csc_staff_series_videos,
         all_problems=all_problems_for_filter, # Pass problems to template
+        category_page_size=CATEGORY_PAGE_SIZE,
+        category_next_cursors=category_next_cursors,
+        catalog_version=snapshot_token(catalog_snapshot), # Fragment cache key part
+        category_revisions=category_revisions, # Per-list key parts, so a like re-renders only the lists it moved
+        most_liked_revision=most_liked_revision,
         current_year=datetime.date.today().year,
         **site_ctx
     )
@@ -575,72 +3720,113 @@ def search():
     if not query and problem_query_val:
         query = problem_query_val
         
-    categories_data, all_videos_data = load_data(site_key=site_ctx.get("site_key"))
     all_problems_for_filter = get_all_problems() # Fetch problems for the modal
     
+    page = max(1, request.args.get('page', 1, type=int) or 1)
     search_results = []
+    total_results = 0
     
     if query:
-        query_lower = query.lower()
-        for video in all_videos_data:
-            # Check title
-            if query_lower in video.get('title', '').lower():
-                search_results.append(video)
-                continue
-            
-            # Check keywords
-            if query_lower in video.get('keywords', '').lower():
-                search_results.append(video)
-                continue
-            
-            # Check problems
-            for problem in video.get('problems', []):
-                if query_lower in problem.get('text', '').lower() or \
-                   query_lower in problem.get('theme', '').lower():
-                    search_results.append(video)
-                    break # Found a match in problems, move to next video
-            if video in search_results: # If added from problem search, continue
-                continue
-
-            # Check categories the video is assigned to
-            for cat_key in video.get('category_keys', []):
-                if cat_key in categories_data: # Ensure category exists in loaded data
-                    category_name = categories_data[cat_key].get('name', '').lower()
-                    if query_lower in category_name:
-                        search_results.append(video)
-                        break # Found a match in category names, move to next video
-            # No need to continue here, it's the last check for this video
+        search_results, total_results = search_videos(query, site_key=site_ctx.get("site_key"), page=page)
 
     return render_template('search_results.html',
                            query=query,
                            results=search_results,
+                           total_results=total_results,
+                           page=page,
+                           page_size=SEARCH_PAGE_SIZE,
                            all_problems=all_problems_for_filter, # Pass problems to template
                            current_year=datetime.date.today().year,
                            **site_ctx)
 
+@app.route('/search/suggest')
+def search_suggest():
+    """Autocomplete for the search box: prefix and typo-tolerant matches from memory, no DB access."""
+    query = request.args.get('q', '').strip()
+    site_ctx = get_site_context_from_request()
+    suggestions = get_suggest_index(site_ctx.get("site_key")).suggest(query[:100]) if query else []
+    response = jsonify({'query': query, 'suggestions': suggestions})
+    response.headers['Cache-Control'] = 'public, max-age=60'
+    return response
+
+@app.route('/thumb/<platform>/<video_id>')
+def video_thumbnail(platform, video_id):
+    """Poster image for click-to-load players, served from the local thumbnail cache."""
+    if platform not in SUPPORTED_PLATFORMS or not _THUMB_ID_RE.match(video_id):
+        abort(404)
+    path = thumbnail_cache.get(platform, video_id)
+    if path is None:
+        # Plain dark poster; short-lived so the real one shows up once upstream recovers.
+        response = app.response_class(THUMB_PLACEHOLDER_SVG, mimetype='image/svg+xml')
+        response.cache_control.public = True
+        response.cache_control.max_age = THUMB_FAILURE_TTL
+        return response
+    # Without Pillow the stored bytes keep the upstream format, recorded next to the file.
+    response = send_from_directory(
+        thumbnail_cache.directory, os.path.basename(path), mimetype=thumbnail_cache.content_type(path), max_age=THUMB_MAX_AGE
+    )
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+@app.route('/api/sites/<site_key>/categories/<category_key>/videos')
+def api_category_videos(site_key, category_key):
+    """One page of a category's videos as JSON, for "load more" on the homepage."""
+    if site_key not in AVAILABLE_SITES:
+        return jsonify({'error': f"Unknown site '{site_key}'."}), 404
+    try:
+        limit = max(1, min(int(request.args.get('limit', CATEGORY_PAGE_SIZE)), CATEGORY_PAGE_MAX))
+    except ValueError:
+        return jsonify({'error': 'limit must be an integer.'}), 400
+
+    snapshot = get_catalog_snapshot(site_key)
+    category = snapshot.categories.get(category_key)
+    if category is None:
+        return jsonify({'error': f"Unknown category '{category_key}'."}), 404
+    videos = ranked_category_videos(snapshot, category_key, category)
+    try:
+        page, next_cursor = page_category_videos(videos, category_key, request.args.get('cursor'), limit)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    response = jsonify({
+        'site': site_key,
+        'category': category_key,
+        'total': len(videos),
+        'videos': [compact_video(video) for video in page],
+        'next_cursor': next_cursor,
+    })
+    response.headers['Cache-Control'] = 'public, max-age=30'
+    return response
+
 @app.route('/submit', methods=['POST'])
 def submit_form():
-    name = request.form.get('name')
-    email = request.form.get('email')
-    school = request.form.get('school', 'Not Provided')
-    message_body = request.form.get('message')
-    vespa_categories_data, all_videos_data = load_data()
-    featured_video_for_error = featured_video_for_success = None
-    if all_videos_data:
-        day_of_year = datetime.date.today().timetuple().tm_yday
-        featured_video_for_error = all_videos_data[0]
-        featured_video_for_success = all_videos_data[(day_of_year - 1) % len(all_videos_data)]
-    if not all([SENDGRID_API_KEY, RECIPIENT_EMAIL, SENDER_EMAIL]):
-        return render_template('index.html', error='Sorry, server email config error.', vespa_categories=vespa_categories_data, featured_video=featured_video_for_error, current_year=datetime.date.today().year)
+    """Validates the enquiry form and queues the email; sending happens in the email worker (see enqueue_email)."""
+    name = (request.form.get('name') or '').strip()
+    email = (request.form.get('email') or '').strip()
+    school = (request.form.get('school') or '').strip() or 'Not Provided'
+    message_body = (request.form.get('message') or '').strip()
+    if not all([RECIPIENT_EMAIL, SENDER_EMAIL]):  # The client factory checks its own credentials
+        return redirect(url_for('index', error='Sorry, server email config error.'))
     if not all([name, email, message_body]):
-        return render_template('index.html', error='Please fill in all required fields.', vespa_categories=vespa_categories_data, featured_video=featured_video_for_error, current_year=datetime.date.today().year)
-    mail_to_send = Mail(from_email=SENDER_EMAIL, to_emails=[RECIPIENT_EMAIL], subject=f"New VESPA Academy Enquiry from {name}", html_content=f"<h3>New VESPA Enquiry</h3><p>Name: {name}</p><p>Email: {email}</p><p>School: {school}</p><hr><p>Message:</p><p>{message_body.replace('\n', '<br>')}</p>")
+        return redirect(url_for('index', error='Please fill in all required fields.'))
+    if not EMAIL_ADDRESS_RE.match(email):
+        return redirect(url_for('index', error='Please enter a valid email address.'))
+
+    message_html = '<br>'.join(escape(line) for line in message_body.splitlines())
     try:
-        SendGridAPIClient(SENDGRID_API_KEY).send(mail_to_send)
-        return render_template('index.html', message='Thank you! Your message has been sent.', vespa_categories=vespa_categories_data, featured_video=featured_video_for_success, current_year=datetime.date.today().year)
-    except Exception as e:
-        print(f"Error sending email: {e}")
-        return render_template('index.html', error='Sorry, an error occurred.', vespa_categories=vespa_categories_data, featured_video=featured_video_for_error, current_year=datetime.date.today().year)
+        enqueue_email(
+            subject=f"New VESPA Academy Enquiry from {name}",
+            html_content=(
+                f"<h3>New VESPA Enquiry</h3><p>Name: {escape(name)}</p><p>Email: {escape(email)}</p>"
+                f"<p>School: {escape(school)}</p><hr><p>Message:</p><p>{message_html}</p>"
+            ),
+        )
+    except (psycopg2.Error, Exception) as e:
+        print(f"Error queueing email: {e}")
+        return redirect(url_for('index', error='Sorry, an error occurred.'))
+    # Usually only queued at this point, so don't claim it has been sent.
+    return redirect(url_for('index', message='Thank you! Your message has been received.'))
 
 @app.route('/admin/login', methods=['GET', 'POST'])
 def admin_login():
@@ -667,21 +3853,20 @@ def admin_dashboard():
     vespa_categories_from_db, all_videos = load_data()
     all_problems_for_filter = get_all_problems() # Fetch all problems
     
-    conn = None
+    ctx, _ = acquire_data_context()
+    cur = None
     all_series_for_dashboard = []
     try:
-        conn = get_db_connection()
-        cur = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
+        cur = ctx.cursor()
         cur.execute("SELECT id, series_key, name FROM series ORDER BY name")
         all_series_for_dashboard = cur.fetchall()
     except (psycopg2.Error, Exception) as e_series_fetch:
+        ctx.recover()
         print(f"Error fetching series for admin dashboard navbar: {e_series_fetch}")
         # flash('Could not load series list for navbar.', 'warning') # Optional: flash message
     finally:
-        if conn:
-            if cur: # cur might not be defined if get_db_connection failed
-                cur.close()
-            conn.close()
+        if cur:
+            cur.close()
 
     return render_template(
         'admin.html', 
@@ -690,8 +3875,583 @@ def admin_dashboard():
         supported_platforms=SUPPORTED_PLATFORMS,
         all_series=all_series_for_dashboard,
         all_problems=all_problems_for_filter, # Pass problems
-        available_sites=AVAILABLE_SITES
+        available_sites=AVAILABLE_SITES,
+        keywords_enabled=schema_capabilities.has_column('videos', 'keywords'),
+        bulk_categories=[  # Real categories only; the derived ones can't be assigned
+            (cat_key, cat_data['name']) for cat_key, cat_data in vespa_categories_from_db.items()
+            if cat_key not in RankingIndex.DERIVED_KEYS
+        ]
+    )
+
+# kind -> (assignment table, its key column, referenced table, referenced column, key type)
+ASSIGNMENT_KINDS = {
+    'categories': ('video_category_assignments', 'category_db_key', 'categories', 'category_key', str),
+    'series': ('video_series_assignments', 'series_db_id', 'series', 'id', int),
+    'problems': ('video_problems', 'problem_id', 'problems', 'problem_id', int),
+    'sites': ('video_site_assignments', 'site_key', 'sites', 'site_key', str),
+}
+ASSIGNMENT_LABELS = {'categories': 'category', 'series': 'series ID', 'problems': 'problem ID', 'sites': 'site'}
+
+def validate_assignments(cur, wanted):
+    """
+    Checks submitted assignment keys ({kind: [form values]}) before anything is written.
+    Returns (valid, invalid): valid maps kind -> unique keys in submitted order (typed), invalid
+    maps kind -> values that don't parse or don't exist. All kinds are checked in one query.
+    A kind submitted empty stays in `valid` as [] (clear it); a kind whose submitted values
+    all failed is left out, so write_assignments() keeps the video's current rows for it.
+    """
+    valid = {}
+    invalid = {}
+    candidates = {}
+    for kind, values in wanted.items():
+        key_type = ASSIGNMENT_KINDS[kind][4]
+        parsed = []
+        for value in values:
+            try:
+                key = key_type(value)
+            except (TypeError, ValueError):
+                invalid.setdefault(kind, []).append(value)
+                continue
+            if kind == 'sites' and key not in AVAILABLE_SITES:
+                invalid.setdefault(kind, []).append(value)
+                continue
+            if key not in parsed:
+                parsed.append(key)
+        candidates[kind] = parsed
+
+    checked = [
+        kind for kind, keys in candidates.items()
+        if keys and (kind != 'sites' or schema_capabilities.has_table('sites'))
+    ]
+    existing = {}
+    if checked:
+        selects = [
+            f"ARRAY(SELECT {ASSIGNMENT_KINDS[kind][3]} FROM {ASSIGNMENT_KINDS[kind][2]} "
+            f"WHERE {ASSIGNMENT_KINDS[kind][3]} = ANY(%s))"
+            for kind in checked
+        ]
+        cur.execute(f"SELECT {', '.join(selects)}", tuple(candidates[kind] for kind in checked))
+        existing = dict(zip(checked, (set(keys) for keys in cur.fetchone())))
+
+    for kind, keys in candidates.items():
+        found = existing.get(kind)
+        kept = [key for key in keys if found is None or key in found]
+        if kept or not wanted[kind]:
+            valid[kind] = kept
+        invalid.setdefault(kind, []).extend(str(key) for key in keys if found is not None and key not in found)
+        if not invalid[kind]:
+            del invalid[kind]
+    return valid, invalid
+
+def flash_invalid_assignments(invalid, title):
+    for kind, values in invalid.items():
+        flash(
+            f"Warning: Skipped {ASSIGNMENT_LABELS[kind]} {', '.join(repr(v) for v in values)} "
+            f"for video '{title}' (invalid or not found).",
+            "warning"
+        )
+
+def write_assignments(cur, video_db_id, valid, is_new=False, current=None):
+    """
+    Brings a video's assignments for each kind in `valid` to exactly that set, writing only the
+    difference: one DELETE ... = ANY(%s) for rows to drop and one multi-row INSERT for rows to
+    add per kind. Current rows are taken from `current` ({kind: keys}) where the caller already
+    has them, otherwise read in a single query (nothing to read for a new video).
+    Returns {kind: (added, removed)}.
+    """
+    kinds = list(valid)
+    known = {} if current is None else current
+    current = {kind: set(known[kind]) for kind in kinds if kind in known}
+    to_read = [] if is_new else [kind for kind in kinds if kind not in current]
+    if to_read:
+        selects = [
+            f"ARRAY(SELECT {ASSIGNMENT_KINDS[kind][1]} FROM {ASSIGNMENT_KINDS[kind][0]} WHERE video_db_id = %s)"
+            for kind in to_read
+        ]
+        cur.execute(f"SELECT {', '.join(selects)}", (video_db_id,) * len(to_read))
+        current.update(zip(to_read, (set(keys) for keys in cur.fetchone())))
+    for kind in kinds:
+        current.setdefault(kind, set())
+
+    changes = {}
+    for kind in kinds:
+        table, column = ASSIGNMENT_KINDS[kind][:2]
+        to_add = [key for key in valid[kind] if key not in current[kind]]
+        to_remove = [key for key in current[kind] if key not in valid[kind]]
+        if to_remove:
+            cur.execute(
+                f"DELETE FROM {table} WHERE video_db_id = %s AND {column} = ANY(%s)",
+                (video_db_id, to_remove)
+            )
+        if to_add:
+            psycopg2.extras.execute_values(
+                cur,
+                f"INSERT INTO {table} (video_db_id, {column}) VALUES %s ON CONFLICT DO NOTHING",
+                [(video_db_id, key) for key in to_add]
+            )
+        changes[kind] = (len(to_add), len(to_remove))
+    return changes
+
+CATALOG_FILE_FORMATS = ('csv', 'jsonl', 'legacy')
+CATALOG_LIST_FIELDS = ('categories', 'series', 'problems', 'sites')
+CATALOG_SERIES_ORDER_FIELD = 'series_order'  # display_order of each entry in `series`, same positions
+CATALOG_CSV_FIELDS = ('platform', 'video_id', 'title', 'keywords', 'likes', 'view_count') + CATALOG_LIST_FIELDS + (CATALOG_SERIES_ORDER_FIELD,)
+CATALOG_CSV_LIST_SEPARATOR = '|'  # Joins list cells in CSV files (problem texts contain commas)
+CATALOG_DIFF_SAMPLE = 20  # Changed videos listed by import-catalog
+
+# kind -> (assignment table, its column, referenced table, column used in files, column stored)
+CATALOG_IMPORT_LINKS = {
+    'categories': ('video_category_assignments', 'category_db_key', 'categories', 'category_key', 'category_key'),
+    'series': ('video_series_assignments', 'series_db_id', 'series', 'series_key', 'id'),
+    'problems': ('video_problems', 'problem_id', 'problems', 'problem_text', 'problem_id'),
+    'sites': ('video_site_assignments', 'site_key', 'sites', 'site_key', 'site_key'),
+}
+
+def catalog_file_format(path, fmt=None):
+    """The explicit --format, else one inferred from the extension (.json is the legacy data.json)."""
+    if fmt:
+        return fmt
+    extension = os.path.splitext(path)[1].lower()
+    formats = {'.csv': 'csv', '.jsonl': 'jsonl', '.ndjson': 'jsonl', '.json': 'legacy'}
+    if extension not in formats:
+        raise click.BadParameter(f"Can't tell the format of '{path}'; pass --format.", param_hint='--format')
+    return formats[extension]
+
+def _copy_field(value):
+    """One column in COPY's text format."""
+    if value is None:
+        return '\\N'
+    return str(value).replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+
+def _copy_rows(rows):
+    payload = io.StringIO()
+    for row in rows:
+        payload.write('\t'.join(_copy_field(value) for value in row) + '\n')
+    payload.seek(0)
+    return payload
+
+def export_catalog_rows(cur):
+    """Every video with its keywords, counters and assignments (series by key, problems by text)."""
+    keywords_column = schema_capabilities.video_column('v', 'keywords', 'NULL::text')
+    sites_expr = (
+        "ARRAY(SELECT vsite.site_key FROM video_site_assignments vsite WHERE vsite.video_db_id = v.id ORDER BY vsite.site_key)"
+        if schema_capabilities.site_assignments else "ARRAY[]::text[]"
+    )
+    cur.execute(f"""
+        SELECT v.platform, v.video_id_on_platform, v.title, {keywords_column} AS keywords, v.likes, v.view_count,
+               ARRAY(SELECT vca.category_db_key FROM video_category_assignments vca
+                     WHERE vca.video_db_id = v.id ORDER BY vca.id) AS categories,
+               ARRAY(SELECT s.series_key FROM video_series_assignments vsa JOIN series s ON s.id = vsa.series_db_id
+                     WHERE vsa.video_db_id = v.id ORDER BY vsa.display_order, s.series_key) AS series,
+               ARRAY(SELECT COALESCE(vsa.display_order, 0) FROM video_series_assignments vsa JOIN series s ON s.id = vsa.series_db_id
+                     WHERE vsa.video_db_id = v.id ORDER BY vsa.display_order, s.series_key) AS series_order,
+               ARRAY(SELECT p.problem_text FROM video_problems vp JOIN problems p ON p.problem_id = vp.problem_id
+                     WHERE vp.video_db_id = v.id ORDER BY vp.id) AS problems,
+               {sites_expr} AS sites
+        FROM videos v
+        ORDER BY v.id
+    """)
+    for row in cur:
+        yield {
+            'platform': row[0],
+            'video_id': row[1],
+            'title': row[2],
+            'keywords': row[3] or '',
+            'likes': row[4] or 0,
+            'view_count': row[5] or 0,
+            'categories': list(row[6]),
+            'series': list(row[7]),
+            'problems': list(row[9]),
+            'sites': list(row[10]),
+            CATALOG_SERIES_ORDER_FIELD: list(row[8]),
+        }
+
+def write_catalog_file(path, fmt, videos, categories):
+    """Writes export_catalog_rows() output; `categories` (key -> name/color/description) only feeds the legacy format."""
+    count = 0
+    if fmt == 'legacy':
+        legacy_videos = [
+            {'video_id': video['video_id'], 'platform': video['platform'], 'title': video['title'],
+             'category_keys': video['categories']}
+            for video in videos
+        ]
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'categories': categories, 'videos': legacy_videos}, f, indent=2, ensure_ascii=False)
+        return len(legacy_videos)
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        if fmt == 'csv':
+            writer = csv.DictWriter(f, fieldnames=CATALOG_CSV_FIELDS)
+            writer.writeheader()
+            for video in videos:
+                writer.writerow({
+                    key: CATALOG_CSV_LIST_SEPARATOR.join(str(item) for item in value) if isinstance(value, list) else value
+                    for key, value in video.items()
+                })
+                count += 1
+        else:
+            for video in videos:
+                f.write(json.dumps(video, ensure_ascii=False) + '\n')
+                count += 1
+    return count
+
+def _catalog_list(value, line, field):
+    if value is None:
+        return []
+    if isinstance(value, str):
+        return [item.strip() for item in value.split(CATALOG_CSV_LIST_SEPARATOR) if item.strip()]
+    if isinstance(value, list):
+        return [str(item).strip() for item in value if str(item).strip()]
+    raise ValueError(f"line {line}: '{field}' must be a list")
+
+def _catalog_count(value, line, field):
+    if value in (None, ''):
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"line {line}: '{field}' must be a whole number")
+
+def read_catalog_file(path, fmt):
+    """
+    Parses an import file into (videos, kinds, categories, errors). `kinds` are the assignment
+    lists the file carries (a missing column or field leaves those assignments alone); `categories` are
+    the legacy file's category definitions. Invalid rows (and legacy categories) are reported in
+    `errors` and skipped, and a later row for the same (platform, video_id) replaces an earlier one.
+    A file that can't be read as a whole (e.g. legacy JSON that doesn't parse) raises ValueError.
+    """
+    raw_rows = []
+    kinds = set()
+    categories = {}
+    errors = []
+    with open(path, encoding='utf-8-sig', newline='') as f:
+        if fmt == 'csv':
+            reader = csv.DictReader(f)
+            kinds = {field for field in reader.fieldnames or () if field in CATALOG_LIST_FIELDS}
+            for line, row in enumerate(reader, start=2):
+                raw_rows.append((line, row))
+        elif fmt == 'jsonl':
+            # Parsed per row below, so one bad line is skipped and reported like any invalid row.
+            for line, text in enumerate(f, start=1):
+                if text.strip():
+                    raw_rows.append((line, text))
+        else:
+            data = json.load(f)
+            if not isinstance(data, dict):
+                raise ValueError("legacy file must be a JSON object with 'categories' and 'videos'")
+            kinds = {'categories'}
+            raw_categories = data.get('categories') or {}
+            if not isinstance(raw_categories, dict):
+                errors.append("categories: expected an object of category_key -> {name, color, description}")
+                raw_categories = {}
+            for key, category in raw_categories.items():
+                if isinstance(category, dict):
+                    categories[key] = category
+                else:
+                    errors.append(f"category '{key}': expected an object with name/color/description")
+            for position, row in enumerate(data.get('videos') or [], start=1):
+                raw_rows.append((position, dict(row, categories=row.get('category_keys')) if isinstance(row, dict) else row))
+
+    videos = {}
+    for line, row in raw_rows:
+        try:
+            if fmt == 'jsonl':
+                try:
+                    row = json.loads(row)
+                except ValueError as e:
+                    raise ValueError(f"line {line}: invalid JSON ({e})")
+            if not isinstance(row, dict):
+                raise ValueError(f"line {line}: expected an object, got {type(row).__name__}")
+            if fmt == 'jsonl':
+                kinds.update(field for field in row if field in CATALOG_LIST_FIELDS)
+            platform = str(row.get('platform') or '').strip()
+            video_id = str(row.get('video_id') or row.get('video_id_on_platform') or '').strip()
+            title = str(row.get('title') or '').strip()
+            if platform not in SUPPORTED_PLATFORMS:
+                raise ValueError(f"line {line}: unknown platform '{platform}'")
+            if not video_id or not title:
+                raise ValueError(f"line {line}: video_id and title are required")
+            video = {
+                'line': line,
+                'platform': platform,
+                'video_id': video_id,
+                'title': title,
+                'keywords': row.get('keywords'),
+                'likes': _catalog_count(row.get('likes'), line, 'likes'),
+                'view_count': _catalog_count(row.get('view_count'), line, 'view_count'),
+            }
+            for kind in CATALOG_LIST_FIELDS:
+                video[kind] = _catalog_list(row.get(kind), line, kind)
+            series_order = _catalog_list(row.get(CATALOG_SERIES_ORDER_FIELD), line, CATALOG_SERIES_ORDER_FIELD)
+            if series_order and len(series_order) != len(video['series']):
+                raise ValueError(f"line {line}: '{CATALOG_SERIES_ORDER_FIELD}' must have one entry per series")
+            # Position of the video in each listed series; without series_order, existing positions are kept.
+            video['series_positions'] = (
+                [_catalog_count(position, line, CATALOG_SERIES_ORDER_FIELD) for position in series_order]
+                or [None] * len(video['series'])
+            )
+            # Kinds this row sets; a missing field (or an empty site list) leaves them as they are.
+            video['kinds'] = [
+                kind for kind in CATALOG_LIST_FIELDS
+                if kind in kinds and kind in row and (kind != 'sites' or video['sites'])
+            ]
+        except ValueError as e:
+            errors.append(str(e))
+            continue
+        videos[(platform, video_id)] = video
+    return list(videos.values()), kinds, categories, errors
+
+def import_catalog(videos, kinds, categories=None, dry_run=False):
+    """
+    Loads parsed catalog rows in one transaction: COPY into temporary staging tables, then
+    set-based statements - an upsert on (platform, video_id_on_platform) that changes only
+    title/keywords of existing videos (counters are set for new videos only), and per
+    assignment kind one DELETE of rows the file no longer lists and one INSERT of new ones.
+    Only kinds a row carries are replaced; videos listing no sites keep theirs (new ones get
+    'vespa', as in add_video).
+    With dry_run everything runs and is reported, then rolled back. Returns the report.
+    """
+    report = {
+        'rows': len(videos), 'inserted': 0, 'updated': 0, 'categories_added': [],
+        'changes': [], 'unknown': {}, 'assignments': {}, 'warnings': [],
+    }
+    kinds = [kind for kind in CATALOG_LIST_FIELDS if kind in kinds]
+    if 'sites' in kinds and not schema_capabilities.site_assignments:
+        kinds.remove('sites')
+        report['warnings'].append("Site visibility table not found in DB; site lists were ignored.")
+    has_keywords = schema_capabilities.has_column('videos', 'keywords')
+
+    conn = None
+    cur = None
+    try:
+        conn = get_db_connection()
+        cur = conn.cursor()
+        cur.execute("""
+            CREATE TEMP TABLE import_videos (
+                line INTEGER, platform TEXT, video_id_on_platform TEXT, title TEXT,
+                keywords TEXT, likes INTEGER, view_count INTEGER, kinds TEXT[]
+            ) ON COMMIT DROP;
+            CREATE TEMP TABLE import_assignments (
+                platform TEXT, video_id_on_platform TEXT, kind TEXT, key TEXT, position INTEGER
+            ) ON COMMIT DROP;
+        """)
+        cur.copy_expert(
+            "COPY import_videos (line, platform, video_id_on_platform, title, keywords, likes, view_count, kinds) FROM STDIN",
+            _copy_rows(
+                (video['line'], video['platform'], video['video_id'], video['title'], video['keywords'],
+                 video['likes'], video['view_count'], '{' + ','.join(video['kinds']) + '}')
+                for video in videos
+            )
+        )
+        cur.copy_expert(
+            "COPY import_assignments (platform, video_id_on_platform, kind, key, position) FROM STDIN",
+            _copy_rows(
+                (video['platform'], video['video_id'], kind, key,
+                 video['series_positions'][index] if kind == 'series' else None)
+                for video in videos for kind in video['kinds'] if kind in kinds
+                for index, key in enumerate(video[kind])
+            )
+        )
+        cur.execute("ANALYZE import_videos; ANALYZE import_assignments")
+
+        if categories:
+            rows = psycopg2.extras.execute_values(
+                cur,
+                """
+                INSERT INTO categories (category_key, name, color, description) VALUES %s
+                ON CONFLICT (category_key) DO NOTHING RETURNING category_key
+                """,
+                [(key, data.get('name') or key, data.get('color'), data.get('description'))
+                 for key, data in categories.items()],
+                fetch=True
+            )
+            report['categories_added'] = [row[0] for row in rows]
+
+        keywords_changed = "OR (i.keywords IS NOT NULL AND v.keywords IS DISTINCT FROM i.keywords)" if has_keywords else ""
+        cur.execute(f"""
+            SELECT i.line, i.platform, i.video_id_on_platform, i.title, v.title
+            FROM import_videos i
+            LEFT JOIN videos v ON v.platform = i.platform AND v.video_id_on_platform = i.video_id_on_platform
+            WHERE v.id IS NULL OR v.title IS DISTINCT FROM i.title {keywords_changed}
+            ORDER BY i.line
+            LIMIT %s
+        """, (CATALOG_DIFF_SAMPLE,))
+        report['changes'] = [
+            {'line': row[0], 'platform': row[1], 'video_id': row[2], 'title': row[3], 'old_title': row[4]}
+            for row in cur.fetchall()
+        ]
+
+        for kind in kinds:
+            _, _, ref_table, file_column, _ = CATALOG_IMPORT_LINKS[kind]
+            cur.execute(f"""
+                SELECT DISTINCT a.key FROM import_assignments a
+                WHERE a.kind = %s AND NOT EXISTS (SELECT 1 FROM {ref_table} r WHERE r.{file_column} = a.key)
+                ORDER BY a.key
+            """, (kind,))
+            unknown = [row[0] for row in cur.fetchall()]
+            if unknown:
+                report['unknown'][kind] = unknown
+
+        keyword_insert = ", keywords" if has_keywords else ""
+        keyword_select = ", keywords" if has_keywords else ""
+        keyword_update = ", keywords = COALESCE(EXCLUDED.keywords, videos.keywords)" if has_keywords else ""
+        keyword_compare = (
+            "(videos.title, videos.keywords) IS DISTINCT FROM (EXCLUDED.title, COALESCE(EXCLUDED.keywords, videos.keywords))"
+            if has_keywords else "videos.title IS DISTINCT FROM EXCLUDED.title"
+        )
+        cur.execute(f"""
+            INSERT INTO videos (platform, video_id_on_platform, title{keyword_insert}, likes, view_count)
+            SELECT platform, video_id_on_platform, title{keyword_select}, COALESCE(likes, 0), COALESCE(view_count, 0)
+            FROM import_videos
+            ON CONFLICT (platform, video_id_on_platform) DO UPDATE
+            SET title = EXCLUDED.title{keyword_update}
+            WHERE {keyword_compare}
+            RETURNING id, (xmax = 0) AS inserted
+        """)
+        written = cur.fetchall()
+        new_video_ids = [row[0] for row in written if row[1]]
+        report['inserted'] = len(new_video_ids)
+        report['updated'] = len(written) - len(new_video_ids)
+
+        for kind in kinds:
+            table, column, ref_table, file_column, stored_column = CATALOG_IMPORT_LINKS[kind]
+            cur.execute(f"""
+                DELETE FROM {table} t
+                USING import_videos i
+                JOIN videos v ON v.platform = i.platform AND v.video_id_on_platform = i.video_id_on_platform
+                WHERE t.video_db_id = v.id
+                  AND %s = ANY(i.kinds)
+                  AND NOT EXISTS (
+                      SELECT 1 FROM import_assignments a
+                      JOIN {ref_table} r ON r.{file_column} = a.key
+                      WHERE a.kind = %s AND a.platform = i.platform
+                        AND a.video_id_on_platform = i.video_id_on_platform
+                        AND r.{stored_column} = t.{column}
+                  )
+            """, (kind, kind))
+            removed = cur.rowcount
+            # Series also carry the video's position in the series (display_order).
+            order_insert = ", display_order" if kind == 'series' else ""
+            order_select = ", COALESCE(max(a.position), 0)" if kind == 'series' else ""
+            cur.execute(f"""
+                INSERT INTO {table} (video_db_id, {column}{order_insert})
+                SELECT v.id, r.{stored_column}{order_select}
+                FROM import_assignments a
+                JOIN videos v ON v.platform = a.platform AND v.video_id_on_platform = a.video_id_on_platform
+                JOIN {ref_table} r ON r.{file_column} = a.key
+                WHERE a.kind = %s
+                  AND NOT EXISTS (SELECT 1 FROM {table} t WHERE t.video_db_id = v.id AND t.{column} = r.{stored_column})
+                GROUP BY v.id, r.{stored_column}
+                ON CONFLICT DO NOTHING
+            """, (kind,))
+            report['assignments'][kind] = {'added': cur.rowcount, 'removed': removed}
+            if kind == 'series':
+                cur.execute("""
+                    UPDATE video_series_assignments t SET display_order = a.position
+                    FROM import_assignments a
+                    JOIN videos v ON v.platform = a.platform AND v.video_id_on_platform = a.video_id_on_platform
+                    JOIN series r ON r.series_key = a.key
+                    WHERE a.kind = 'series' AND a.position IS NOT NULL
+                      AND t.video_db_id = v.id AND t.series_db_id = r.id
+                      AND t.display_order IS DISTINCT FROM a.position
+                    RETURNING t.series_db_id
+                """)
+                reordered_series = sorted({row[0] for row in cur.fetchall()})
+                report['assignments'][kind]['reordered'] = cur.rowcount
+                if reordered_series and series_reorder_enabled():
+                    # An open reorder dialog based on the old order must not overwrite this one.
+                    cur.execute("UPDATE series SET version = version + 1 WHERE id = ANY(%s)", (reordered_series,))
+
+        if schema_capabilities.site_assignments and new_video_ids:
+            cur.execute("""
+                INSERT INTO video_site_assignments (video_db_id, site_key)
+                SELECT v.id, 'vespa' FROM videos v
+                WHERE v.id = ANY(%s)
+                  AND NOT EXISTS (SELECT 1 FROM video_site_assignments s WHERE s.video_db_id = v.id)
+                ON CONFLICT DO NOTHING
+            """, (new_video_ids,))
+
+        if dry_run:
+            conn.rollback()
+        else:
+            conn.commit()
+            invalidate_catalog()
+    except (psycopg2.Error, Exception):
+        if conn:
+            conn.rollback()
+        raise
+    finally:
+        if cur:
+            cur.close()
+        if conn:
+            release_db_connection(conn)
+    return report
+
+@app.cli.command('export-catalog')
+@click.argument('path', type=click.Path(dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(CATALOG_FILE_FORMATS), default=None,
+              help='csv, jsonl or legacy (data.json). Defaults from the file extension.')
+def export_catalog_command(path, fmt):
+    """Writes every video with its keywords and category/series/problem/site assignments."""
+    fmt = catalog_file_format(path, fmt)
+    conn = None
+    cur = None
+    try:
+        conn = get_db_connection()
+        cur = conn.cursor()
+        categories = {}
+        if fmt == 'legacy':
+            cur.execute("SELECT category_key, name, color, description FROM categories ORDER BY id")
+            categories = {row[0]: {'name': row[1], 'color': row[2], 'description': row[3]} for row in cur.fetchall()}
+        count = write_catalog_file(path, fmt, export_catalog_rows(cur), categories)
+        conn.rollback()
+    finally:
+        if cur:
+            cur.close()
+        if conn:
+            release_db_connection(conn)
+    print(f"Exported {count} videos to {path} ({fmt}).")
+
+@app.cli.command('import-catalog')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(CATALOG_FILE_FORMATS), default=None,
+              help='csv, jsonl or legacy (data.json). Defaults from the file extension.')
+@click.option('--dry-run', is_flag=True, help='Report what would change, then roll back.')
+def import_catalog_command(path, fmt, dry_run):
+    """Upserts videos and their assignments from an export-catalog (or legacy data.json) file."""
+    fmt = catalog_file_format(path, fmt)
+    started = time.monotonic()
+    try:
+        videos, kinds, categories, errors = read_catalog_file(path, fmt)
+    except ValueError as e:
+        raise click.ClickException(f"Can't read {path}: {e}")
+    for error in errors:
+        print(f"Skipped {error}")
+    report = import_catalog(videos, kinds, categories, dry_run=dry_run)
+    elapsed = time.monotonic() - started
+
+    for warning in report['warnings']:
+        print(f"Warning: {warning}")
+    for change in report['changes']:
+        if change['old_title'] is None:
+            print(f"  + {change['platform']}/{change['video_id']}: {change['title']}")
+        elif change['old_title'] != change['title']:
+            print(f"  ~ {change['platform']}/{change['video_id']}: {change['old_title']} -> {change['title']}")
+        else:
+            print(f"  ~ {change['platform']}/{change['video_id']}: keywords")
+    for kind, keys in report['unknown'].items():
+        print(f"Unknown {kind} (skipped): {', '.join(keys)}")
+    if report['categories_added']:
+        print(f"Categories added: {', '.join(report['categories_added'])}")
+    for kind, counts in report['assignments'].items():
+        reordered = f" ({counts['reordered']} reordered)" if counts.get('reordered') else ""
+        print(f"{kind}: +{counts['added']} -{counts['removed']}{reordered}")
+    verb = 'Would import' if dry_run else 'Imported'
+    print(
+        f"{verb} {report['rows']} rows in {elapsed:.1f}s: {report['inserted']} new, {report['updated']} updated"
+        f"{', ' + str(len(errors)) + ' skipped' if errors else ''}."
     )
+    if report['inserted'] and not dry_run:
+        print("Run `flask harvest-metadata` to fetch player sizes for the new videos.")
 
 @app.route('/admin/add_video', methods=['POST'])
 @login_required
@@ -714,14 +4474,14 @@ def add_video():
         return redirect(url_for('admin_dashboard'))
 
     conn = None
+    cur = None
     video_db_id_to_use = None
     was_existing_video = False
 
     try:
         conn = get_db_connection()
         cur = conn.cursor()
-        cur_for_checks = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
-        site_assignments_enabled = _video_site_assignments_enabled(cur_for_checks)
+        site_assignments_enabled = schema_capabilities.site_assignments
 
         # Check if video already exists
         cur.execute(
@@ -736,62 +4496,31 @@ def add_video():
             # If it's an existing video, its title is NOT updated here. Users should use Edit for that.
             # We only update assignments if new ones are provided in the form.
 
-            # Handle Category Assignments for Existing Video
-            if category_keys_from_form: # Only update categories if new ones are actually submitted
-                cur.execute("DELETE FROM video_category_assignments WHERE video_db_id = %s", (video_db_id_to_use,))
-                for cat_key in category_keys_from_form:
-                    try:
-                        cur.execute(
-                            "INSERT INTO video_category_assignments (video_db_id, category_db_key) VALUES (%s, %s)",
-                            (video_db_id_to_use, cat_key)
-                        )
-                    except psycopg2.errors.ForeignKeyViolation:
-                        flash(f"Warning: Could not assign category '{cat_key}' to video '{title}'. Category might not exist.", "warning")
-                    except psycopg2.errors.UniqueViolation:
-                        pass # Should be fine since we deleted first
-            # If category_keys_from_form is empty, existing categories are preserved.
-
-            # Handle Series Assignments for Existing Video
-            if series_ids_from_form: # Only update series if new ones are actually submitted
-                cur.execute("DELETE FROM video_series_assignments WHERE video_db_id = %s", (video_db_id_to_use,))
-                for series_id_str in series_ids_from_form:
-                    try:
-                        series_id = int(series_id_str)
-                        cur.execute(
-                            "INSERT INTO video_series_assignments (video_db_id, series_db_id) VALUES (%s, %s)",
-                            (video_db_id_to_use, series_id)
-                        )
-                    except psycopg2.errors.ForeignKeyViolation:
-                        flash(f"Warning: Could not assign series ID '{series_id}' to video '{title}'. Series might not exist.", "warning")
-                    except psycopg2.errors.UniqueViolation:
-                        pass # Should be fine
-                    except ValueError:
-                        flash(f"Warning: Invalid series ID '{series_id_str}' provided for existing video.", "warning")
-            # If series_ids_from_form is empty, existing series are preserved.
-
-            # Handle Site Assignments for Existing Video
-            if site_assignments_enabled and site_keys_from_form:
-                cur.execute("DELETE FROM video_site_assignments WHERE video_db_id = %s", (video_db_id_to_use,))
-                for site_key in site_keys_from_form:
-                    if site_key not in AVAILABLE_SITES:
-                        continue
-                    try:
-                        cur.execute(
-                            "INSERT INTO video_site_assignments (video_db_id, site_key) VALUES (%s, %s)",
-                            (video_db_id_to_use, site_key)
-                        )
-                    except psycopg2.errors.ForeignKeyViolation:
-                        flash(f"Warning: Could not assign site '{site_key}' to video '{title}'. Site might not exist in DB.", "warning")
-                    except psycopg2.errors.UniqueViolation:
-                        pass
-            elif (not site_assignments_enabled) and site_keys_from_form:
+            # Only kinds with something submitted are updated; an empty list keeps what's there.
+            # Problems are left alone here, as before; use Edit to change them.
+            wanted = {
+                'categories': category_keys_from_form,
+                'series': series_ids_from_form,
+            }
+            if site_assignments_enabled:
+                wanted['sites'] = site_keys_from_form
+            elif site_keys_from_form:
                 flash("Warning: Site visibility table not found in DB. Run the migration to enable CSC/VESPA visibility.", "warning")
+            valid, invalid = validate_assignments(cur, {kind: values for kind, values in wanted.items() if values})
+            flash_invalid_assignments(invalid, title)
+            write_assignments(cur, video_db_id_to_use, valid)
 
         else: # Video does not exist, create it new
-            cur.execute(
-                "INSERT INTO videos (platform, video_id_on_platform, title, keywords) VALUES (%s, %s, %s, %s) RETURNING id",
-                (platform, video_id_on_platform, title, keywords) # Add keywords to insert
-            )
+            if schema_capabilities.has_column('videos', 'keywords'):
+                cur.execute(
+                    "INSERT INTO videos (platform, video_id_on_platform, title, keywords) VALUES (%s, %s, %s, %s) RETURNING id",
+                    (platform, video_id_on_platform, title, keywords) # Add keywords to insert
+                )
+            else:
+                cur.execute(
+                    "INSERT INTO videos (platform, video_id_on_platform, title) VALUES (%s, %s, %s) RETURNING id",
+                    (platform, video_id_on_platform, title)
+                )
             new_video_db_id_row = cur.fetchone()
             if new_video_db_id_row:
                 video_db_id_to_use = new_video_db_id_row[0]
@@ -800,73 +4529,29 @@ def add_video():
                 flash('Error creating new video record.', 'danger')
                 return redirect(url_for('admin_dashboard'))
             
-            # For new videos, assign categories, series, and problems as submitted
-            if video_db_id_to_use and category_keys_from_form:
-                for cat_key in category_keys_from_form:
-                    try:
-                        cur.execute(
-                            "INSERT INTO video_category_assignments (video_db_id, category_db_key) VALUES (%s, %s)",
-                            (video_db_id_to_use, cat_key)
-                        )
-                    except psycopg2.errors.ForeignKeyViolation:
-                        flash(f"Warning: Could not assign category '{cat_key}' to new video '{title}'. Category might not exist.", "warning")
-                    except psycopg2.errors.UniqueViolation:
-                        flash(f"Warning: New video '{title}' already assigned to category '{cat_key}'. (Should be rare)", "warning")
-            
-            if video_db_id_to_use and series_ids_from_form:
-                for series_id_str in series_ids_from_form:
-                    try:
-                        series_id = int(series_id_str)
-                        cur.execute(
-                            "INSERT INTO video_series_assignments (video_db_id, series_db_id) VALUES (%s, %s)",
-                            (video_db_id_to_use, series_id)
-                        )
-                    except psycopg2.errors.ForeignKeyViolation:
-                        flash(f"Warning: Could not assign series ID '{series_id}' to new video '{title}'. Series might not exist.", "warning")
-                    except psycopg2.errors.UniqueViolation:
-                        flash(f"Warning: New video '{title}' already assigned to series ID '{series_id}'. (Should be rare)", "warning")
-                    except ValueError:
-                        flash(f"Warning: Invalid series ID '{series_id_str}' provided for new video.", "warning")
-
-            # Add problem assignments for new video
-            if video_db_id_to_use and problem_ids_from_form:
-                for problem_id_str in problem_ids_from_form:
-                    try:
-                        problem_id = int(problem_id_str)
-                        cur.execute(
-                            "INSERT INTO video_problems (video_db_id, problem_id) VALUES (%s, %s)",
-                            (video_db_id_to_use, problem_id)
-                        )
-                    except psycopg2.errors.ForeignKeyViolation:
-                        flash(f"Warning: Could not assign problem ID '{problem_id}' to new video '{title}'. Problem might not exist.", "warning")
-                    except psycopg2.errors.UniqueViolation:
-                        flash(f"Warning: New video '{title}' already assigned to problem ID '{problem_id}'.", "warning")
-                    except ValueError:
-                        flash(f"Warning: Invalid problem ID '{problem_id_str}' provided for new video.", "warning")
-
-            # Add site assignments for new video
-            if site_assignments_enabled and video_db_id_to_use:
-                effective_site_keys = site_keys_from_form or ['vespa']
-                for site_key in effective_site_keys:
-                    if site_key not in AVAILABLE_SITES:
-                        continue
-                    try:
-                        cur.execute(
-                            "INSERT INTO video_site_assignments (video_db_id, site_key) VALUES (%s, %s)",
-                            (video_db_id_to_use, site_key)
-                        )
-                    except psycopg2.errors.ForeignKeyViolation:
-                        flash(f"Warning: Could not assign site '{site_key}' to new video '{title}'. Site might not exist in DB.", "warning")
-                    except psycopg2.errors.UniqueViolation:
-                        pass
-            elif (not site_assignments_enabled) and (site_keys_from_form and video_db_id_to_use):
+            # For new videos, assign categories, series, problems and sites as submitted
+            wanted = {
+                'categories': category_keys_from_form,
+                'series': series_ids_from_form,
+                'problems': problem_ids_from_form,
+            }
+            if site_assignments_enabled:
+                wanted['sites'] = site_keys_from_form or ['vespa']
+            elif site_keys_from_form:
                 flash("Warning: Site visibility table not found in DB. Run the migration to enable CSC/VESPA visibility.", "warning")
+            valid, invalid = validate_assignments(cur, wanted)
+            flash_invalid_assignments(invalid, title)
+            if site_assignments_enabled and not valid.get('sites'):
+                valid.update(validate_assignments(cur, {'sites': ['vespa']})[0])  # None of the ticked sites exist
+            write_assignments(cur, video_db_id_to_use, valid, is_new=True)
 
         conn.commit()
+        invalidate_catalog()
         if was_existing_video:
             flash(f'Assignments for existing video \'{title}\' updated successfully!', 'success')
         else:
             flash(f'Video \'{title}\' added and assigned successfully!', 'success')
+            harvest_metadata_in_background([video_db_id_to_use])
 
     except (psycopg2.Error, Exception) as e:
         if conn:
@@ -876,10 +4561,8 @@ def add_video():
     finally:
         if cur:
             cur.close()
-        if 'cur_for_checks' in locals() and cur_for_checks:
-            cur_for_checks.close()
         if conn:
-            conn.close()
+            release_db_connection(conn)
     
     return redirect(url_for('admin_dashboard'))
 
@@ -887,6 +4570,7 @@ def add_video():
 @login_required
 def delete_video(platform, video_id_on_platform_from_url):
     conn = None
+    cur = None
     deleted_title = None # To store the title for the flash message
 
     try:
@@ -909,6 +4593,7 @@ def delete_video(platform, video_id_on_platform_from_url):
             # Assignments in video_category_assignments should be deleted automatically due to ON DELETE CASCADE.
             cur.execute("DELETE FROM videos WHERE id = %s", (video_db_id,))
             conn.commit()
+            invalidate_catalog()
             flash(f'Video \'{deleted_title}\' ({SUPPORTED_PLATFORMS.get(platform, platform)}) deleted successfully.', 'success')
         else:
             flash(f'Video \'{video_id_on_platform_from_url}\' ({SUPPORTED_PLATFORMS.get(platform, platform)}) not found for deletion.', 'warning')
@@ -922,7 +4607,7 @@ def delete_video(platform, video_id_on_platform_from_url):
         if cur:
             cur.close()
         if conn:
-            conn.close()
+            release_db_connection(conn)
     
     return redirect(url_for('admin_dashboard'))
 
@@ -930,6 +4615,7 @@ def delete_video(platform, video_id_on_platform_from_url):
 @login_required
 def edit_video(platform, video_id_on_platform_from_url):
     conn = None
+    cur = None
     video_to_edit = None
     video_db_id = None 
     all_series_for_form = [] 
@@ -941,13 +4627,14 @@ def edit_video(platform, video_id_on_platform_from_url):
     try:
         conn = get_db_connection()
         cur = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
-        site_assignments_enabled = _video_site_assignments_enabled(cur)
+        site_assignments_enabled = schema_capabilities.site_assignments
 
         cur.execute("SELECT id, series_key, name FROM series ORDER BY name")
         all_series_for_form = cur.fetchall()
 
+        keywords_column = schema_capabilities.video_column('videos', 'keywords', 'NULL::text')
         cur.execute(
-            "SELECT id, platform, video_id_on_platform, title, keywords FROM videos WHERE platform = %s AND video_id_on_platform = %s", # Added keywords
+            f"SELECT id, platform, video_id_on_platform, title, {keywords_column} AS keywords FROM videos WHERE platform = %s AND video_id_on_platform = %s", # Added keywords
             (platform, video_id_on_platform_from_url)
         )
         fetched_video = cur.fetchone()
@@ -1021,75 +4708,38 @@ def edit_video(platform, video_id_on_platform_from_url):
                     assigned_site_keys=assigned_site_keys
                 )
 
-            cur.execute(
-                "UPDATE videos SET title = %s, keywords = %s WHERE id = %s", # Add keywords to update
-                (new_title, new_keywords, video_db_id)
-            )
-
-            cur.execute("DELETE FROM video_category_assignments WHERE video_db_id = %s", (video_db_id,))
-            if new_category_keys:
-                for cat_key in new_category_keys:
-                    try:
-                        cur.execute(
-                            "INSERT INTO video_category_assignments (video_db_id, category_db_key) VALUES (%s, %s)",
-                            (video_db_id, cat_key)
-                        )
-                    except psycopg2.errors.ForeignKeyViolation:
-                        flash(f"Warning: Could not assign category '{cat_key}' to video '{new_title}'. Category may not exist.", "warning")
-                        print(f"ForeignKeyViolation: edit_video - Could not assign '{cat_key}' to video DB ID {video_db_id}")
-            
-            cur.execute("DELETE FROM video_series_assignments WHERE video_db_id = %s", (video_db_id,))
-            if new_series_ids:
-                for series_id_str in new_series_ids:
-                    try:
-                        series_id = int(series_id_str)
-                        cur.execute(
-                            "INSERT INTO video_series_assignments (video_db_id, series_db_id) VALUES (%s, %s)",
-                            (video_db_id, series_id)
-                        )
-                    except psycopg2.errors.ForeignKeyViolation:
-                        flash(f"Warning: Could not assign series ID '{series_id}' to video '{new_title}'. Series may not exist.", "warning")
-                        print(f"ForeignKeyViolation: edit_video - Could not assign series ID '{series_id}' to video DB ID {video_db_id}")
-                    except ValueError:
-                        flash(f"Warning: Invalid series ID '{series_id_str}' submitted.", "warning")
-                        print(f"ValueError: edit_video - Invalid series ID '{series_id_str}' for video DB ID {video_db_id}")
-
-            # Update problem assignments
-            cur.execute("DELETE FROM video_problems WHERE video_db_id = %s", (video_db_id,))
-            if new_problem_ids:
-                for problem_id_str in new_problem_ids:
-                    try:
-                        problem_id = int(problem_id_str)
-                        cur.execute(
-                            "INSERT INTO video_problems (video_db_id, problem_id) VALUES (%s, %s)",
-                            (video_db_id, problem_id)
-                        )
-                    except psycopg2.errors.ForeignKeyViolation:
-                        flash(f"Warning: Could not assign problem ID '{problem_id}' to video '{new_title}'. Problem may not exist.", "warning")
-                    except psycopg2.errors.UniqueViolation: # Should not happen due to prior delete, but good practice
-                        flash(f"Warning: Video '{new_title}' already assigned to problem ID '{problem_id}'.", "warning")
-                    except ValueError:
-                        flash(f"Warning: Invalid problem ID '{problem_id_str}' submitted for video '{new_title}'.", "warning")
-
-            # Update site assignments (if supported)
+            if schema_capabilities.has_column('videos', 'keywords'):
+                cur.execute(
+                    "UPDATE videos SET title = %s, keywords = %s WHERE id = %s", # Add keywords to update
+                    (new_title, new_keywords, video_db_id)
+                )
+            else:
+                cur.execute("UPDATE videos SET title = %s WHERE id = %s", (new_title, video_db_id))
+
+            # Categories, series and problems are replaced by what was submitted; sites only
+            # when at least one is ticked (a video must stay visible somewhere).
+            wanted = {
+                'categories': new_category_keys,
+                'series': new_series_ids,
+                'problems': new_problem_ids,
+            }
             if site_assignments_enabled and new_site_keys:
-                cur.execute("DELETE FROM video_site_assignments WHERE video_db_id = %s", (video_db_id,))
-                for site_key in new_site_keys:
-                    if site_key not in AVAILABLE_SITES:
-                        continue
-                    try:
-                        cur.execute(
-                            "INSERT INTO video_site_assignments (video_db_id, site_key) VALUES (%s, %s)",
-                            (video_db_id, site_key)
-                        )
-                    except psycopg2.errors.ForeignKeyViolation:
-                        flash(f"Warning: Could not assign site '{site_key}' to video '{new_title}'. Site may not exist in DB.", "warning")
-                    except psycopg2.errors.UniqueViolation:
-                        pass
+                wanted['sites'] = new_site_keys
             elif (not site_assignments_enabled) and new_site_keys:
                 flash("Warning: Site visibility table not found in DB. Run the migration to enable CSC/VESPA visibility.", "warning")
+            valid, invalid = validate_assignments(cur, wanted)
+            flash_invalid_assignments(invalid, new_title)
+            current = {
+                'categories': video_to_edit['category_keys'],
+                'series': assigned_series_ids,
+                'problems': assigned_problem_ids,
+            }
+            if site_assignments_enabled:
+                current['sites'] = assigned_site_keys
+            write_assignments(cur, video_db_id, valid, current=current)  # Current rows were read above
 
             conn.commit()
+            invalidate_catalog()
             flash(f'Video \'{new_title}\' updated successfully.', 'success')
             return redirect(url_for('admin_dashboard'))
 
@@ -1103,7 +4753,7 @@ def edit_video(platform, video_id_on_platform_from_url):
         if cur:
             cur.close()
         if conn:
-            conn.close()
+            release_db_connection(conn)
 
     return render_template(
         'admin_edit_video.html', 
@@ -1120,6 +4770,155 @@ def edit_video(platform, video_id_on_platform_from_url):
         assigned_site_keys=assigned_site_keys
     )
 
+BULK_ACTIONS = ('add', 'remove')
+BULK_TARGETS = ('categories', 'series', 'problems', 'sites', 'keywords')
+BULK_ARRAY_TYPES = {str: 'text[]', int: 'integer[]'}
+
+def split_keywords(text):
+    """Comma-separated keywords as a list, trimmed, without blanks or case-insensitive repeats."""
+    keywords = []
+    for keyword in (text or '').split(','):
+        keyword = keyword.strip()
+        if keyword and keyword.lower() not in (k.lower() for k in keywords):
+            keywords.append(keyword)
+    return keywords
+
+def apply_bulk_video_action(cur, video_ids, action, target, values):
+    """
+    Adds or removes categories/series/problems/sites (validated keys) or keywords for every
+    video in `video_ids` with one set-based statement. Returns (rows changed, videos skipped);
+    a site is never removed from a video it is the last visible site of.
+    """
+    if target == 'keywords':
+        lowered = [value.lower() for value in values]
+        if action == 'add':
+            cur.execute("""
+                UPDATE videos v SET keywords = (
+                    SELECT string_agg(k, ', ' ORDER BY n) FROM (
+                        SELECT DISTINCT ON (lower(k)) k, n FROM (
+                            SELECT btrim(e.k) AS k, e.n
+                            FROM unnest(string_to_array(COALESCE(v.keywords, ''), ',')) WITH ORDINALITY AS e(k, n)
+                            UNION ALL
+                            SELECT a.k, 1000000 + a.n FROM unnest(%s::text[]) WITH ORDINALITY AS a(k, n)
+                        ) merged
+                        WHERE k <> ''
+                        ORDER BY lower(k), n
+                    ) deduped
+                )
+                WHERE v.id = ANY(%s)
+                  AND EXISTS (
+                      SELECT 1 FROM unnest(%s::text[]) AS a(k)
+                      WHERE a.k <> ALL(SELECT lower(btrim(e.k)) FROM unnest(string_to_array(COALESCE(v.keywords, ''), ',')) AS e(k))
+                  )
+            """, (values, video_ids, lowered))
+        else:
+            cur.execute("""
+                UPDATE videos v SET keywords = COALESCE((
+                    SELECT string_agg(btrim(e.k), ', ' ORDER BY e.n)
+                    FROM unnest(string_to_array(v.keywords, ',')) WITH ORDINALITY AS e(k, n)
+                    WHERE btrim(e.k) <> '' AND lower(btrim(e.k)) <> ALL(%s)
+                ), '')
+                WHERE v.id = ANY(%s)
+                  AND EXISTS (SELECT 1 FROM unnest(string_to_array(v.keywords, ',')) AS e(k) WHERE lower(btrim(e.k)) = ANY(%s))
+            """, (lowered, video_ids, lowered))
+        return cur.rowcount, 0
+
+    table, column, _, _, key_type = ASSIGNMENT_KINDS[target]
+    array_type = BULK_ARRAY_TYPES[key_type]
+    if action == 'add':
+        cur.execute(f"""
+            INSERT INTO {table} (video_db_id, {column})
+            SELECT v.id, k.key FROM videos v CROSS JOIN unnest(%s::{array_type}) AS k(key)
+            WHERE v.id = ANY(%s)
+            ON CONFLICT DO NOTHING
+        """, (values, video_ids))
+        return cur.rowcount, 0
+
+    if target == 'sites':
+        cur.execute(f"""
+            DELETE FROM {table} t
+            WHERE t.video_db_id = ANY(%s) AND t.{column} = ANY(%s::{array_type})
+              AND EXISTS (
+                  SELECT 1 FROM {table} other
+                  WHERE other.video_db_id = t.video_db_id AND other.{column} <> ALL(%s::{array_type})
+              )
+        """, (video_ids, values, values))
+        removed = cur.rowcount
+        cur.execute(f"""
+            SELECT count(DISTINCT video_db_id) FROM {table}
+            WHERE video_db_id = ANY(%s) AND {column} = ANY(%s::{array_type})
+        """, (video_ids, values))
+        return removed, cur.fetchone()[0]
+
+    cur.execute(
+        f"DELETE FROM {table} WHERE video_db_id = ANY(%s) AND {column} = ANY(%s::{array_type})",
+        (video_ids, values)
+    )
+    return cur.rowcount, 0
+
+@app.route('/admin/videos/bulk', methods=['POST'])
+@login_required
+def bulk_update_videos():
+    """Applies one add/remove operation to every video ticked on the dashboard, in a single transaction."""
+    action = request.form.get('bulk_action')
+    target = request.form.get('bulk_target')
+    try:
+        video_ids = sorted({int(value) for value in request.form.getlist('video_ids')})
+    except ValueError:
+        flash('Invalid video selection.', 'danger')
+        return redirect(url_for('admin_dashboard'))
+
+    if not video_ids:
+        flash('Select at least one video first.', 'warning')
+        return redirect(url_for('admin_dashboard'))
+    if action not in BULK_ACTIONS or target not in BULK_TARGETS:
+        flash('Choose what to add or remove.', 'danger')
+        return redirect(url_for('admin_dashboard'))
+    if target == 'sites' and not schema_capabilities.site_assignments:
+        flash("Site visibility table not found in DB. Run the migration to enable CSC/VESPA visibility.", "warning")
+        return redirect(url_for('admin_dashboard'))
+    if target == 'keywords' and not schema_capabilities.has_column('videos', 'keywords'):
+        flash("Keywords column not found in DB. Run the migration to enable video keywords.", "warning")
+        return redirect(url_for('admin_dashboard'))
+
+    conn = None
+    cur = None
+    try:
+        conn = get_db_connection()
+        cur = conn.cursor()
+        if target == 'keywords':
+            values = split_keywords(request.form.get('values_keywords'))
+        else:
+            valid, invalid = validate_assignments(cur, {target: request.form.getlist(f'values_{target}')})
+            values = valid.get(target, [])
+            for kind, bad_values in invalid.items():
+                flash(f"Skipped {ASSIGNMENT_LABELS[kind]} {', '.join(repr(v) for v in bad_values)} (invalid or not found).", 'warning')
+        if not values:
+            conn.rollback()
+            flash(f'Nothing to {action}: pick at least one valid value.', 'warning')
+            return redirect(url_for('admin_dashboard'))
+
+        changed, skipped = apply_bulk_video_action(cur, video_ids, action, target, values)
+        conn.commit()
+        if changed:
+            invalidate_catalog()
+        label = 'keyword' if target == 'keywords' else ASSIGNMENT_LABELS[target].split()[0]
+        verb = 'Added' if action == 'add' else 'Removed'
+        flash(f"{verb} {label} {', '.join(str(v) for v in values)}: {changed} change(s) across {len(video_ids)} selected video(s).", 'success')
+        if skipped:
+            flash(f"{skipped} video(s) kept that site because it is the only one they are visible on.", 'warning')
+    except (psycopg2.Error, Exception) as e:
+        if conn:
+            conn.rollback()
+        flash(f'Database error applying bulk action: {e}', 'danger')
+        print(f"Database error in bulk_update_videos: {e}")
+    finally:
+        if cur:
+            cur.close()
+        if conn:
+            release_db_connection(conn)
+    return redirect(url_for('admin_dashboard'))
+
 # Comment out or remove the migrate_data_to_db function if you haven't already
 # @app.route('/admin/migrate_to_db')
 # @login_required
@@ -1132,41 +4931,56 @@ def like_video(video_db_id):
     if not video_db_id:
         return jsonify({'success': False, 'error': 'Video ID not provided'}), 400
 
-    conn = None
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
+        # Buffered: the click is written back with other likes in the next batched flush.
+        new_like_count = like_counter.increment(video_db_id)
+        if new_like_count is not None:
+            engagement_log.record(video_db_id, 'like')
+    except (psycopg2.Error, Exception) as e:
+        print(f"Database error in like_video: {e}")
+        return jsonify({'success': False, 'error': 'Database error'}), 500
 
-        # Increment the likes count for the video
-        cur.execute(
-            "UPDATE videos SET likes = likes + 1 WHERE id = %s RETURNING likes",
-            (video_db_id,)
-        )
-        updated_likes = cur.fetchone()
-        
-        if updated_likes:
-            conn.commit()
-            return jsonify({'success': True, 'new_like_count': updated_likes[0]})
-        else:
-            # This case means the video_db_id didn't exist
-            conn.rollback() # Rollback if no update occurred
-            return jsonify({'success': False, 'error': 'Video not found'}), 404
+    if new_like_count is None:
+        return jsonify({'success': False, 'error': 'Video not found'}), 404
+    return jsonify({'success': True, 'new_like_count': new_like_count})
+
+@app.route('/view_video/<int:video_db_id>', methods=['POST'])
+def view_video(video_db_id):
+    """
+    Play beacon. Counts at most one view per video per session within VIEW_DEDUPE_WINDOW
+    (tracked in the signed session cookie, so it holds across workers) and buffers the
+    increment in view_counter rather than writing it inline.
+    """
+    now = int(time.time())
+    recent_views = {
+        video_key: viewed_at for video_key, viewed_at in session.get('recent_views', {}).items()
+        if now - viewed_at < VIEW_DEDUPE_WINDOW
+    }
+    video_key = str(video_db_id)
+    if video_key in recent_views:
+        session['recent_views'] = recent_views
+        return jsonify({'success': True, 'counted': False})
 
+    try:
+        new_view_count = view_counter.increment(video_db_id)
     except (psycopg2.Error, Exception) as e:
-        if conn:
-            conn.rollback()
-        print(f"Database error in like_video: {e}")
+        print(f"Database error in view_video: {e}")
         return jsonify({'success': False, 'error': 'Database error'}), 500
-    finally:
-        if cur:
-            cur.close()
-        if conn:
-            conn.close()
+    if new_view_count is None:
+        return jsonify({'success': False, 'error': 'Video not found'}), 404
+
+    engagement_log.record(video_db_id, 'view')
+    recent_views[video_key] = now
+    if len(recent_views) > VIEW_DEDUPE_MAX:
+        recent_views = dict(sorted(recent_views.items(), key=lambda item: item[1])[-VIEW_DEDUPE_MAX:])
+    session['recent_views'] = recent_views
+    return jsonify({'success': True, 'counted': True, 'view_count': new_view_count})
 
 @app.route('/admin/series', methods=['GET', 'POST'])
 @login_required
 def admin_manage_series():
     conn = None
+    cur = None
     all_problems_for_filter = get_all_problems() # Fetch problems
     try:
         conn = get_db_connection()
@@ -1191,6 +5005,7 @@ def admin_manage_series():
                         (series_key, name, description, is_featured)
                     )
                     conn.commit()
+                    invalidate_catalog()
                     flash(f'Series \'{name}\' added successfully!', 'success')
                 except psycopg2.errors.UniqueViolation:
                     conn.rollback()
@@ -1213,7 +5028,7 @@ def admin_manage_series():
         if conn:
             if cur:
                 cur.close()
-            conn.close()
+            release_db_connection(conn)
     
     return render_template('admin_series.html', all_series=all_series, all_problems=all_problems_for_filter)
 
@@ -1221,6 +5036,7 @@ def admin_manage_series():
 @login_required
 def admin_toggle_feature_series(series_id):
     conn = None
+    cur = None
     try:
         conn = get_db_connection()
         cur = conn.cursor()
@@ -1241,6 +5057,7 @@ def admin_toggle_feature_series(series_id):
         # Update the target series
         cur.execute("UPDATE series SET is_featured = %s WHERE id = %s", (new_status, series_id))
         conn.commit()
+        invalidate_catalog()
         flash('Series featured status updated successfully.', 'success')
 
     except (psycopg2.Error, Exception) as e:
@@ -1252,13 +5069,14 @@ def admin_toggle_feature_series(series_id):
         if conn:
             if cur:
                 cur.close()
-            conn.close()
+            release_db_connection(conn)
     return redirect(url_for('admin_manage_series'))
 
 @app.route('/admin/series/delete/<int:series_id>', methods=['POST'])
 @login_required
 def admin_delete_series(series_id):
     conn = None
+    cur = None
     try:
         conn = get_db_connection()
         cur = conn.cursor()
@@ -1268,6 +5086,7 @@ def admin_delete_series(series_id):
         cur.execute("DELETE FROM series WHERE id = %s RETURNING name", (series_id,))
         deleted_series = cur.fetchone()
         conn.commit()
+        invalidate_catalog()
         if deleted_series:
             flash(f'Series \'{deleted_series[0]}\' deleted successfully.', 'success')
         else:
@@ -1281,8 +5100,191 @@ def admin_delete_series(series_id):
         if conn:
             if cur:
                 cur.close()
-            conn.close()
+            release_db_connection(conn)
     return redirect(url_for('admin_manage_series'))
 
+def series_reorder_enabled():
+    """True once the series.version column (optimistic locking for reorders) exists."""
+    return schema_capabilities.has_column('series', 'version')
+
+@app.route('/admin/series/<int:series_id>/order', methods=['GET'])
+@login_required
+def admin_series_order(series_id):
+    """The series' videos in display order plus the version a reorder must be based on."""
+    conn = None
+    cur = None
+    try:
+        conn = get_db_connection()
+        cur = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
+        version_sql = "version" if series_reorder_enabled() else "NULL::integer AS version"
+        cur.execute(f"SELECT id, series_key, name, {version_sql} FROM series WHERE id = %s", (series_id,))
+        series_row = cur.fetchone()
+        if not series_row:
+            return jsonify({'success': False, 'error': 'Series not found'}), 404
+        cur.execute(
+            """
+            SELECT v.id, v.platform, v.video_id_on_platform, v.title, v.likes, vsa.display_order
+            FROM video_series_assignments vsa
+            JOIN videos v ON v.id = vsa.video_db_id
+            WHERE vsa.series_db_id = %s
+            ORDER BY vsa.display_order ASC, v.likes DESC, v.id ASC
+            """,
+            (series_id,)
+        )
+        videos = [
+            {
+                'db_id': row['id'],
+                'platform': row['platform'],
+                'video_id': row['video_id_on_platform'],
+                'title': row['title'],
+                'likes': row['likes'] or 0,
+                'display_order': row['display_order'],
+            }
+            for row in cur.fetchall()
+        ]
+    except (psycopg2.Error, Exception) as e:
+        print(f"Database error in admin_series_order: {e}")
+        return jsonify({'success': False, 'error': 'Database error'}), 500
+    finally:
+        if cur:
+            cur.close()
+        if conn:
+            release_db_connection(conn)
+    return jsonify({
+        'success': True,
+        'series_id': series_row['id'],
+        'series_key': series_row['series_key'],
+        'name': series_row['name'],
+        'version': series_row['version'],
+        'reorder_enabled': series_row['version'] is not None,
+        'videos': videos,
+    })
+
+@app.route('/admin/series/<int:series_id>/order', methods=['POST'])
+@login_required
+def admin_reorder_series(series_id):
+    """
+    Replaces a series' video order. Expects JSON {"version": n, "video_ids": [...]} listing
+    every video in the series exactly once, first to last. The write is rejected with 409
+    if the series was reordered since version n was read, or its videos changed; otherwise
+    all positions are rewritten in one UPDATE ... FROM (VALUES ...) and the version bumped.
+    """
+    if not series_reorder_enabled():
+        return jsonify({
+            'success': False,
+            'error': 'Reordering needs the series.version column; run the "Series reordering" migration in database_schema.sql.',
+        }), 400
+
+    payload = request.get_json(silent=True) or {}
+    expected_version = payload.get('version')
+    video_ids = payload.get('video_ids')
+    if (
+        not isinstance(expected_version, int) or isinstance(expected_version, bool)
+        or not isinstance(video_ids, list)
+        or not all(isinstance(video_id, int) and not isinstance(video_id, bool) for video_id in video_ids)
+    ):
+        return jsonify({'success': False, 'error': 'Expected {"version": <int>, "video_ids": [<int>, ...]}'}), 400
+    if len(set(video_ids)) != len(video_ids):
+        return jsonify({'success': False, 'error': 'A video is listed more than once'}), 400
+
+    conn = None
+    cur = None
+    try:
+        conn = get_db_connection()
+        cur = conn.cursor()
+        # Claims the version first: the row lock also serialises concurrent reorders of this series.
+        cur.execute(
+            "UPDATE series SET version = version + 1 WHERE id = %s AND version = %s RETURNING version",
+            (series_id, expected_version)
+        )
+        row = cur.fetchone()
+        if row is None:
+            cur.execute("SELECT version FROM series WHERE id = %s", (series_id,))
+            current = cur.fetchone()
+            conn.rollback()
+            if current is None:
+                return jsonify({'success': False, 'error': 'Series not found'}), 404
+            return jsonify({
+                'success': False,
+                'error': 'This series was reordered by someone else. Reload to see the latest order.',
+                'version': current[0],
+            }), 409
+        new_version = row[0]
+
+        cur.execute("SELECT video_db_id FROM video_series_assignments WHERE series_db_id = %s", (series_id,))
+        assigned = {assigned_row[0] for assigned_row in cur.fetchall()}
+        if assigned != set(video_ids):
+            conn.rollback()
+            return jsonify({
+                'success': False,
+                'error': 'Videos were added to or removed from this series. Reload to see the current list.',
+                'version': expected_version,
+            }), 409
+
+        changed = 0
+        if video_ids:
+            changed_rows = psycopg2.extras.execute_values(
+                cur,
+                """
+                UPDATE video_series_assignments AS vsa SET display_order = o.display_order
+                FROM (VALUES %s) AS o(series_db_id, video_db_id, display_order)
+                WHERE vsa.series_db_id = o.series_db_id
+                  AND vsa.video_db_id = o.video_db_id
+                  AND vsa.display_order IS DISTINCT FROM o.display_order
+                RETURNING vsa.video_db_id
+                """,
+                # execute_values takes one placeholder (the VALUES list), so the series id rides in each row.
+                [(series_id, video_id, position) for position, video_id in enumerate(video_ids, start=1)],
+                template="(%s::int, %s::int, %s::int)",
+                page_size=len(video_ids),
+                fetch=True
+            )
+            changed = len(changed_rows)
+        conn.commit()
+    except (psycopg2.Error, Exception) as e:
+        if conn:
+            conn.rollback()
+        print(f"Database error in admin_reorder_series: {e}")
+        return jsonify({'success': False, 'error': 'Database error'}), 500
+    finally:
+        if cur:
+            cur.close()
+        if conn:
+            release_db_connection(conn)
+
+    if changed:
+        invalidate_series_lists(series_id)
+    return jsonify({'success': True, 'version': new_version, 'changed': changed})
+
+@app.route('/admin/schema/refresh', methods=['POST'])
+@login_required
+def admin_refresh_schema():
+    """Re-detects optional schema features after a migration, in this and every other worker."""
+    schema_capabilities.refresh()
+    invalidate_catalog(scope='schema')
+    return jsonify({'success': True, 'schema': schema_capabilities.summary()})
+
+@app.route('/admin/stats')
+@login_required
+def admin_stats():
+    """JSON snapshot of this worker process's runtime internals (connection pool, caches)."""
+    return jsonify({
+        'pid': os.getpid(),
+        'db_pool': db_pool.stats(),
+        'catalog_cache': catalog_cache.stats(),
+        'catalog_listener': catalog_listener.stats(),
+        'schema': schema_capabilities.summary(),
+        'search_index': {str(site_key): index.summary() for site_key, index in list(_search_indexes.items())},
+        'suggest_index': suggest_stats(),
+        'like_counter': like_counter.stats(),
+        'view_counter': view_counter.stats(),
+        'engagement_log': engagement_log.stats(),
+        'email_jobs': email_worker.stats(),
+        'page_cache': page_cache.stats(),
+        'fragment_cache': fragment_cache.stats(),
+        'series_cache': series_cache.stats(),
+        'thumbnails': thumbnail_cache.stats(),
+    })
+
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5000, debug=True) 
\ No newline at end of file
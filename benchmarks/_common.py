@@ -0,0 +1,22 @@
+"""Shared setup for the benchmark scripts in this directory."""
+import contextlib
+import io
+import os
+import sys
+
+from dotenv import load_dotenv
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def import_app():
+    """
+    Imports app.py from the repository root after load_dotenv(), so it sees the same
+    environment. Its import-time config warnings (SendGrid, recipient) are swallowed:
+    they say nothing about the benchmark.
+    """
+    load_dotenv(os.path.join(REPO_ROOT, '.env'))
+    if REPO_ROOT not in sys.path:
+        sys.path.insert(0, REPO_ROOT)
+    with contextlib.redirect_stdout(io.StringIO()):
+        import app
+    return app
@@ -0,0 +1,206 @@
+"""
+Benchmark: legacy five-query load_data() pipeline vs the single aggregated catalog query.
+
+Seeds a throwaway schema (bench_catalog) in the database pointed to by BENCH_DATABASE_URL
+(falls back to DATABASE_URL), runs both loaders for several catalog sizes and prints
+round trips and wall time. The schema is dropped afterwards.
+
+    python benchmarks/bench_catalog.py              # 1k, 10k and 50k videos
+    python benchmarks/bench_catalog.py 5000 20000   # custom sizes
+"""
+import os
+import sys
+import time
+
+import psycopg2
+import psycopg2.extras
+
+from _common import import_app
+
+app = import_app()
+
+BENCH_SCHEMA = "bench_catalog"
+DEFAULT_SIZES = [1000, 10000, 50000]
+REPEATS = 5
+
+class CountingCursor(psycopg2.extras.DictCursor):
+    """DictCursor that counts statements sent to the server (one round trip each)."""
+    round_trips = 0
+
+    def execute(self, query, vars=None):
+        CountingCursor.round_trips += 1
+        return super().execute(query, vars)
+
+def create_schema(cur, video_count):
+    cur.execute(f"DROP SCHEMA IF EXISTS {BENCH_SCHEMA} CASCADE")
+    cur.execute(f"CREATE SCHEMA {BENCH_SCHEMA}")
+    cur.execute(f"SET search_path TO {BENCH_SCHEMA}")
+    cur.execute("""
+        CREATE TABLE categories (id SERIAL PRIMARY KEY, category_key TEXT UNIQUE NOT NULL, name TEXT NOT NULL, color TEXT, description TEXT);
+        CREATE TABLE videos (
+            id SERIAL PRIMARY KEY, platform TEXT NOT NULL, video_id_on_platform TEXT NOT NULL, title TEXT NOT NULL,
+            view_count INTEGER DEFAULT 0, likes INTEGER DEFAULT 0, keywords TEXT,
+            created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE (platform, video_id_on_platform)
+        );
+        CREATE TABLE video_category_assignments (
+            id SERIAL PRIMARY KEY, video_db_id INTEGER NOT NULL REFERENCES videos(id) ON DELETE CASCADE,
+            category_db_key TEXT NOT NULL REFERENCES categories(category_key) ON DELETE CASCADE,
+            UNIQUE (video_db_id, category_db_key)
+        );
+        CREATE TABLE problems (problem_id SERIAL PRIMARY KEY, problem_text TEXT NOT NULL, theme TEXT NOT NULL);
+        CREATE TABLE video_problems (
+            id SERIAL PRIMARY KEY, video_db_id INTEGER NOT NULL REFERENCES videos(id) ON DELETE CASCADE,
+            problem_id INTEGER NOT NULL REFERENCES problems(problem_id) ON DELETE CASCADE,
+            UNIQUE (video_db_id, problem_id)
+        );
+        CREATE TABLE sites (site_key TEXT PRIMARY KEY, name TEXT NOT NULL);
+        CREATE TABLE video_site_assignments (
+            video_db_id INTEGER NOT NULL REFERENCES videos(id) ON DELETE CASCADE,
+            site_key TEXT NOT NULL REFERENCES sites(site_key) ON DELETE CASCADE,
+            PRIMARY KEY (video_db_id, site_key)
+        );
+    """)
+    cur.execute("""
+        INSERT INTO categories (category_key, name, color, description)
+        SELECT k, upper(k), '#008080', 'Benchmark category ' || k
+        FROM unnest(ARRAY['vision', 'effort', 'systems', 'practice', 'attitude']) AS k;
+        INSERT INTO problems (problem_text, theme)
+        SELECT 'Problem ' || g, (ARRAY['VISION', 'EFFORT', 'SYSTEMS', 'PRACTICE', 'ATTITUDE'])[1 + g % 5]
+        FROM generate_series(1, 60) AS g;
+        INSERT INTO sites (site_key, name) VALUES ('vespa', 'VESPA Videos'), ('csc', 'CSC Videos');
+    """)
+    cur.execute("""
+        INSERT INTO videos (platform, video_id_on_platform, title, likes, keywords, created_at)
+        SELECT (ARRAY['muse', 'youtube', 'vimeo'])[1 + g % 3], 'vid' || g, 'Benchmark video ' || g,
+               (g * 7919) % 500, 'motivation, revision, focus ' || g,
+               NOW() - ((g % 60) || ' days')::interval
+        FROM generate_series(1, %s) AS g
+    """, (video_count,))
+    cur.execute("""
+        INSERT INTO video_category_assignments (video_db_id, category_db_key)
+        SELECT v.id, c.category_key FROM videos v JOIN categories c ON (v.id + c.id) % 3 = 0;
+        INSERT INTO video_problems (video_db_id, problem_id)
+        SELECT v.id, p.problem_id FROM videos v JOIN problems p ON (v.id + p.problem_id) % 20 = 0;
+        INSERT INTO video_site_assignments (video_db_id, site_key)
+        SELECT id, 'vespa' FROM videos;
+        INSERT INTO video_site_assignments (video_db_id, site_key)
+        SELECT id, 'csc' FROM videos WHERE id % 4 = 0;
+        ANALYZE;
+    """)
+
+def legacy_load(cur, site_key):
+    """The pre-aggregation load_data(): probe + five queries stitched together in Python."""
+    categories_map = {}
+    all_videos_list = []
+    videos_by_db_id = {}
+
+    cur.execute("SELECT category_key, name, color, description FROM categories ORDER BY id")
+    for cat_row in cur.fetchall():
+        categories_map[cat_row['category_key']] = {
+            'name': cat_row['name'], 'color': cat_row['color'], 'description': cat_row['description'],
+            'videos': [], 'icon': app.CATEGORY_ICONS.get(cat_row['category_key'].lower(), 'bi-collection-play'),
+        }
+
+    cur.execute("SELECT 1 FROM information_schema.tables WHERE table_name = 'video_site_assignments' LIMIT 1")
+    cur.fetchone()
+    cur.execute(
+        """
+        SELECT v.id, v.platform, v.video_id_on_platform, v.title, v.view_count, v.likes, v.created_at, v.keywords
+        FROM videos v JOIN video_site_assignments vsa ON v.id = vsa.video_db_id
+        WHERE vsa.site_key = %s ORDER BY v.id
+        """,
+        (site_key,),
+    )
+    for vid_row in cur.fetchall():
+        video_dict = {
+            'db_id': vid_row['id'], 'platform': vid_row['platform'],
+            'video_id': vid_row['video_id_on_platform'], 'video_id_on_platform': vid_row['video_id_on_platform'],
+            'title': vid_row['title'], 'view_count': vid_row['view_count'], 'likes': vid_row['likes'],
+            'created_at': vid_row['created_at'], 'keywords': vid_row['keywords'] or '',
+            'category_keys': [], 'problems': [], 'site_keys': [],
+        }
+        all_videos_list.append(video_dict)
+        videos_by_db_id[vid_row['id']] = video_dict
+
+    cur.execute("SELECT video_db_id, site_key FROM video_site_assignments")
+    for row in cur.fetchall():
+        if row['video_db_id'] in videos_by_db_id:
+            videos_by_db_id[row['video_db_id']]['site_keys'].append(row['site_key'])
+
+    cur.execute("SELECT video_db_id, category_db_key FROM video_category_assignments")
+    for row in cur.fetchall():
+        if row['category_db_key'] in categories_map and row['video_db_id'] in videos_by_db_id:
+            videos_by_db_id[row['video_db_id']]['category_keys'].append(row['category_db_key'])
+            categories_map[row['category_db_key']]['videos'].append(videos_by_db_id[row['video_db_id']])
+
+    cur.execute("""
+        SELECT vp.video_db_id, p.problem_text, p.theme
+        FROM video_problems vp JOIN problems p ON vp.problem_id = p.problem_id
+    """)
+    for row in cur.fetchall():
+        if row['video_db_id'] in videos_by_db_id:
+            videos_by_db_id[row['video_db_id']]['problems'].append({'text': row['problem_text'], 'theme': row['theme']})
+
+    for cat_data in categories_map.values():
+        cat_data['videos'].sort(key=lambda v: (v.get('likes', 0), v.get('title', '')))
+        cat_data['videos'].sort(key=lambda v: v.get('likes', 0), reverse=True)
+    return categories_map, all_videos_list
+
+BENCH_CAPABILITIES = app.SchemaCapabilities()
+
+def aggregated_load(cur, site_key):
+    sql, params = app.build_catalog_query(site_key, BENCH_CAPABILITIES)
+    cur.execute(sql, params)
+    return app.assemble_catalog(cur.fetchone())
+
+def measure(conn, loader, site_key):
+    timings = []
+    round_trips = 0
+    video_count = 0
+    for _ in range(REPEATS):
+        CountingCursor.round_trips = 0
+        cur = conn.cursor(cursor_factory=CountingCursor)
+        started = time.perf_counter()
+        _, videos = loader(cur, site_key)
+        timings.append(time.perf_counter() - started)
+        cur.close()
+        conn.rollback()
+        round_trips = CountingCursor.round_trips
+        video_count = len(videos)
+    timings.sort()
+    return timings[len(timings) // 2], round_trips, video_count
+
+def main():
+    dsn = os.getenv('BENCH_DATABASE_URL') or os.getenv('DATABASE_URL')
+    if not dsn:
+        print("Set BENCH_DATABASE_URL (or DATABASE_URL) to a database where a scratch schema may be created.")
+        sys.exit(1)
+    sizes = [int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES
+
+    conn = psycopg2.connect(dsn)
+    try:
+        print(f"{'videos':>8} {'site':>6} {'loaded':>8} | {'legacy ms':>10} {'trips':>5} | {'single ms':>10} {'trips':>5} | {'speedup':>7}")
+        for size in sizes:
+            with conn.cursor() as cur:
+                create_schema(cur, size)
+            conn.commit()
+            with conn.cursor() as cur:
+                cur.execute(f"SET search_path TO {BENCH_SCHEMA}")
+                BENCH_CAPABILITIES.detect(cur)
+            conn.commit()
+            for site_key in ('vespa', 'csc'):
+                legacy_s, legacy_trips, loaded = measure(conn, legacy_load, site_key)
+                single_s, single_trips, _ = measure(conn, aggregated_load, site_key)
+                print(
+                    f"{size:>8} {site_key:>6} {loaded:>8} | {legacy_s * 1000:>10.1f} {legacy_trips:>5} | "
+                    f"{single_s * 1000:>10.1f} {single_trips:>5} | {legacy_s / single_s:>6.1f}x"
+                )
+    finally:
+        with conn.cursor() as cur:
+            cur.execute(f"DROP SCHEMA IF EXISTS {BENCH_SCHEMA} CASCADE")
+        conn.commit()
+        conn.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+"""
+Benchmark: memory held per video by a catalog snapshot, per-video dicts vs VideoRecord.
+
+Builds a synthetic catalog row in the shape build_catalog_query() returns (no database
+needed), decodes it from JSON the way psycopg2 does for json columns, assembles and
+freezes it, drops the raw row and reports how many bytes stay allocated (tracemalloc).
+
+    python benchmarks/bench_memory.py               # 10k and 100k videos
+    python benchmarks/bench_memory.py 50000         # custom sizes
+"""
+import datetime
+import gc
+import json
+import sys
+import time
+import tracemalloc
+from types import MappingProxyType
+
+from _common import import_app
+
+app = import_app()
+
+DEFAULT_SIZES = [10000, 100000]
+CATEGORY_KEYS = ['vision', 'effort', 'systems', 'practice', 'attitude']
+THEMES = ['VISION', 'EFFORT', 'SYSTEMS', 'PRACTICE', 'ATTITUDE']
+PLATFORMS = ['muse', 'youtube', 'vimeo']
+
+def synthetic_catalog_json(video_count):
+    """Catalog row JSON with the same mix of categories, problems and sites as bench_catalog.py."""
+    now = datetime.datetime.now(datetime.timezone.utc)
+    categories = [
+        {'category_key': key, 'name': key.upper(), 'color': '#008080', 'description': f'Benchmark category {key}'}
+        for key in CATEGORY_KEYS
+    ]
+    videos = []
+    for g in range(1, video_count + 1):
+        videos.append({
+            'id': g,
+            'platform': PLATFORMS[g % 3],
+            'video_id_on_platform': f'vid{g}',
+            'title': f'Benchmark video {g}',
+            'view_count': 0,
+            'likes': (g * 7919) % 500,
+            'created_at': (now - datetime.timedelta(days=g % 60)).isoformat(),
+            'keywords': f'motivation, revision, focus {g}',
+            'category_keys': [key for c, key in enumerate(CATEGORY_KEYS, start=1) if (g + c) % 3 == 0],
+            'problems': [
+                {'text': f'Problem {p}', 'theme': THEMES[p % 5]}
+                for p in range(1, 61) if (g + p) % 20 == 0
+            ],
+            'site_keys': ['vespa', 'csc'] if g % 4 == 0 else ['vespa'],
+            'trending_score': 0,
+            'aspect_ratio': None,
+            'duration_seconds': None,
+        })
+    return json.dumps({'categories': categories, 'videos': videos})
+
+def legacy_snapshot(catalog_row):
+    """The pre-VideoRecord shape: one dict per video (wrapped in a MappingProxyType), lists tupled."""
+    categories_map = {
+        cat_row['category_key']: {'name': cat_row['name'], 'color': cat_row['color'],
+                                  'description': cat_row['description'], 'videos': []}
+        for cat_row in catalog_row['categories']
+    }
+    all_videos_list = []
+    for vid_row in catalog_row['videos']:
+        video_dict = {
+            'db_id': vid_row['id'],
+            'platform': vid_row['platform'],
+            'video_id': vid_row['video_id_on_platform'],
+            'video_id_on_platform': vid_row['video_id_on_platform'],
+            'title': vid_row['title'],
+            'view_count': vid_row['view_count'],
+            'likes': vid_row['likes'],
+            'created_at': app._parse_json_timestamp(vid_row['created_at']),
+            'keywords': vid_row['keywords'] or '',
+            'category_keys': [key for key in vid_row['category_keys'] if key in categories_map],
+            'problems': vid_row['problems'],
+            'site_keys': vid_row['site_keys'],
+            'trending_score': float(vid_row.get('trending_score') or 0),
+            'aspect_ratio': vid_row.get('aspect_ratio'),
+            'duration_seconds': vid_row.get('duration_seconds'),
+        }
+        all_videos_list.append(video_dict)
+        for category_key in video_dict['category_keys']:
+            categories_map[category_key]['videos'].append(video_dict)
+
+    fourteen_days_ago = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(days=14)
+    categories_map[app.FRESH_NEW_VIDS_KEY] = {
+        'name': 'Fresh New Vids',
+        'videos': [video for video in all_videos_list if video['created_at'] >= fourteen_days_ago],
+    }
+
+    frozen_by_id = {
+        id(video): MappingProxyType({
+            key: tuple(value) if isinstance(value, list) else value
+            for key, value in video.items()
+        })
+        for video in all_videos_list
+    }
+    categories = MappingProxyType({
+        cat_key: MappingProxyType({**cat_data, 'videos': tuple(frozen_by_id[id(v)] for v in cat_data['videos'])})
+        for cat_key, cat_data in categories_map.items()
+    })
+    return categories, tuple(frozen_by_id[id(v)] for v in all_videos_list)
+
+def record_snapshot(catalog_row):
+    return app._freeze_catalog(*app.assemble_catalog(catalog_row))
+
+def measure(payload, builder):
+    """Returns (bytes retained by the built snapshot, build seconds)."""
+    gc.collect()
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    started = time.perf_counter()
+    catalog_row = json.loads(payload)
+    snapshot = builder(catalog_row)
+    elapsed = time.perf_counter() - started
+    del catalog_row
+    gc.collect()
+    retained = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+    del snapshot
+    return retained, elapsed
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES
+
+    print(f"{'videos':>8} | {'dict B/video':>12} {'build ms':>9} | {'record B/video':>14} {'build ms':>9} | {'saving':>6}")
+    for size in sizes:
+        payload = synthetic_catalog_json(size)
+        legacy_bytes, legacy_s = measure(payload, legacy_snapshot)
+        record_bytes, record_s = measure(payload, record_snapshot)
+        print(
+            f"{size:>8} | {legacy_bytes / size:>12.0f} {legacy_s * 1000:>9.0f} | "
+            f"{record_bytes / size:>14.0f} {record_s * 1000:>9.0f} | {1 - record_bytes / legacy_bytes:>6.0%}"
+        )
+
+if __name__ == '__main__':
+    main()
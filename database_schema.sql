@@ -113,4 +113,247 @@ ON CONFLICT (site_key) DO NOTHING;
 INSERT INTO video_site_assignments (video_db_id, site_key)
 SELECT v.id, 'vespa'
 FROM videos v
-ON CONFLICT DO NOTHING;
\ No newline at end of file
+ON CONFLICT DO NOTHING;
+
+-- ============================================================
+-- Cross-worker catalog cache invalidation
+-- ============================================================
+-- Each web worker caches the catalog in memory. Admin writes bump this single-row
+-- version and send NOTIFY vespa_catalog_changed so other workers drop their cache.
+-- Workers that cannot LISTEN (transaction-mode pooler) poll this row instead
+-- (set CATALOG_SYNC_MODE=poll).
+
+CREATE TABLE IF NOT EXISTS catalog_version (
+    id INTEGER PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+    version BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+INSERT INTO catalog_version (id, version)
+VALUES (1, 0)
+ON CONFLICT (id) DO NOTHING;
+
+-- ============================================================
+-- Postgres full-text search backend (SEARCH_BACKEND=postgres)
+-- ============================================================
+-- A tsvector per video over its title (weight A), keywords (B), linked problem text/theme (C)
+-- and category names (D). It spans several tables, so it is kept up to date by triggers
+-- rather than being a GENERATED column (generated columns can only read their own row).
+-- After running this, POST /admin/schema/refresh (or restart) so the app sees the column.
+
+ALTER TABLE videos ADD COLUMN IF NOT EXISTS search_vector tsvector;
+
+CREATE OR REPLACE FUNCTION video_search_vector(target_video_id INTEGER, video_title TEXT, video_keywords TEXT)
+RETURNS tsvector AS $$
+    SELECT
+        setweight(to_tsvector('english', coalesce(video_title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(video_keywords, '')), 'B') ||
+        setweight(to_tsvector('english', coalesce((
+            SELECT string_agg(p.problem_text || ' ' || p.theme, ' ')
+            FROM video_problems vp
+            JOIN problems p ON p.problem_id = vp.problem_id
+            WHERE vp.video_db_id = target_video_id
+        ), '')), 'C') ||
+        setweight(to_tsvector('english', coalesce((
+            SELECT string_agg(c.name, ' ')
+            FROM video_category_assignments vca
+            JOIN categories c ON c.category_key = vca.category_db_key
+            WHERE vca.video_db_id = target_video_id
+        ), '')), 'D');
+$$ LANGUAGE sql STABLE;
+
+-- Title/keyword edits: compute in a BEFORE trigger so no second UPDATE is needed.
+CREATE OR REPLACE FUNCTION videos_search_vector_trigger() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector := video_search_vector(NEW.id, NEW.title, NEW.keywords);
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_videos_search_vector ON videos;
+CREATE TRIGGER trg_videos_search_vector
+BEFORE INSERT OR UPDATE OF title, keywords ON videos
+FOR EACH ROW EXECUTE FUNCTION videos_search_vector_trigger();
+
+-- Assignment changes: refresh each affected video once per statement (this UPDATE does not
+-- touch title/keywords, so it does not re-fire the trigger above). Statement-level with
+-- transition tables, so a bulk write of N rows for one video rewrites it once, not N times.
+-- Postgres allows transition tables only on single-event triggers, hence three per table.
+CREATE OR REPLACE FUNCTION video_assignment_search_vector_trigger() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        UPDATE videos v
+        SET search_vector = video_search_vector(v.id, v.title, v.keywords)
+        WHERE v.id IN (SELECT DISTINCT video_db_id FROM new_rows);
+    ELSIF TG_OP = 'DELETE' THEN
+        UPDATE videos v
+        SET search_vector = video_search_vector(v.id, v.title, v.keywords)
+        WHERE v.id IN (SELECT DISTINCT video_db_id FROM old_rows);
+    ELSE
+        UPDATE videos v
+        SET search_vector = video_search_vector(v.id, v.title, v.keywords)
+        WHERE v.id IN (SELECT video_db_id FROM old_rows UNION SELECT video_db_id FROM new_rows);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Replaces the earlier FOR EACH ROW triggers of the same name.
+DROP TRIGGER IF EXISTS trg_video_problems_search_vector ON video_problems;
+DROP TRIGGER IF EXISTS trg_video_problems_search_vector_ins ON video_problems;
+DROP TRIGGER IF EXISTS trg_video_problems_search_vector_upd ON video_problems;
+DROP TRIGGER IF EXISTS trg_video_problems_search_vector_del ON video_problems;
+CREATE TRIGGER trg_video_problems_search_vector_ins
+AFTER INSERT ON video_problems REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION video_assignment_search_vector_trigger();
+CREATE TRIGGER trg_video_problems_search_vector_upd
+AFTER UPDATE ON video_problems REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION video_assignment_search_vector_trigger();
+CREATE TRIGGER trg_video_problems_search_vector_del
+AFTER DELETE ON video_problems REFERENCING OLD TABLE AS old_rows
+FOR EACH STATEMENT EXECUTE FUNCTION video_assignment_search_vector_trigger();
+
+DROP TRIGGER IF EXISTS trg_video_categories_search_vector ON video_category_assignments;
+DROP TRIGGER IF EXISTS trg_video_categories_search_vector_ins ON video_category_assignments;
+DROP TRIGGER IF EXISTS trg_video_categories_search_vector_upd ON video_category_assignments;
+DROP TRIGGER IF EXISTS trg_video_categories_search_vector_del ON video_category_assignments;
+CREATE TRIGGER trg_video_categories_search_vector_ins
+AFTER INSERT ON video_category_assignments REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION video_assignment_search_vector_trigger();
+CREATE TRIGGER trg_video_categories_search_vector_upd
+AFTER UPDATE ON video_category_assignments REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION video_assignment_search_vector_trigger();
+CREATE TRIGGER trg_video_categories_search_vector_del
+AFTER DELETE ON video_category_assignments REFERENCING OLD TABLE AS old_rows
+FOR EACH STATEMENT EXECUTE FUNCTION video_assignment_search_vector_trigger();
+
+-- Renaming a problem or category refreshes every video linked to it.
+CREATE OR REPLACE FUNCTION problems_search_vector_trigger() RETURNS trigger AS $$
+BEGIN
+    UPDATE videos v
+    SET search_vector = video_search_vector(v.id, v.title, v.keywords)
+    WHERE v.id IN (SELECT vp.video_db_id FROM video_problems vp WHERE vp.problem_id = NEW.problem_id);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_problems_search_vector ON problems;
+CREATE TRIGGER trg_problems_search_vector
+AFTER UPDATE OF problem_text, theme ON problems
+FOR EACH ROW EXECUTE FUNCTION problems_search_vector_trigger();
+
+CREATE OR REPLACE FUNCTION categories_search_vector_trigger() RETURNS trigger AS $$
+BEGIN
+    UPDATE videos v
+    SET search_vector = video_search_vector(v.id, v.title, v.keywords)
+    WHERE v.id IN (SELECT vca.video_db_id FROM video_category_assignments vca WHERE vca.category_db_key = NEW.category_key);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_categories_search_vector ON categories;
+CREATE TRIGGER trg_categories_search_vector
+AFTER UPDATE OF name ON categories
+FOR EACH ROW EXECUTE FUNCTION categories_search_vector_trigger();
+
+-- Backfill existing rows, then index.
+UPDATE videos SET search_vector = video_search_vector(id, title, keywords);
+
+CREATE INDEX IF NOT EXISTS idx_videos_search_vector ON videos USING GIN (search_vector);
+
+-- ============================================================
+-- Engagement event log and rollups (Trending)
+-- ============================================================
+-- Every counted like and view is appended here by the web workers in batched COPYs.
+-- No foreign key: a batch must never fail because a video was deleted in the meantime;
+-- the rollups only count events whose video still exists.
+CREATE TABLE IF NOT EXISTS engagement_events (
+    id BIGSERIAL PRIMARY KEY,
+    video_db_id INTEGER NOT NULL,
+    event_type TEXT NOT NULL CHECK (event_type IN ('like', 'view')),
+    occurred_at TIMESTAMP WITH TIME ZONE NOT NULL
+);
+
+-- Incrementally maintained from engagement_events (see rollup_engagement() in app.py).
+-- Keyed video-first so the per-video trending lookup is an index range scan.
+CREATE TABLE IF NOT EXISTS engagement_hourly (
+    video_db_id INTEGER NOT NULL REFERENCES videos(id) ON DELETE CASCADE,
+    hour TIMESTAMP WITH TIME ZONE NOT NULL,
+    likes INTEGER NOT NULL DEFAULT 0,
+    views INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (video_db_id, hour)
+);
+
+CREATE TABLE IF NOT EXISTS engagement_daily (
+    video_db_id INTEGER NOT NULL REFERENCES videos(id) ON DELETE CASCADE,
+    day DATE NOT NULL,
+    likes INTEGER NOT NULL DEFAULT 0,
+    views INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (video_db_id, day)
+);
+
+-- High-water mark: the last engagement_events.id already folded into the rollups.
+CREATE TABLE IF NOT EXISTS engagement_rollup_state (
+    id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+    last_event_id BIGINT NOT NULL DEFAULT 0,
+    rolled_up_at TIMESTAMP WITH TIME ZONE
+);
+
+INSERT INTO engagement_rollup_state (id, last_event_id) VALUES (TRUE, 0)
+ON CONFLICT (id) DO NOTHING;
+
+-- ============================================================
+-- Outgoing email job queue
+-- ============================================================
+-- /submit only inserts a row here; a background worker in each web process claims due
+-- jobs with FOR UPDATE SKIP LOCKED, sends them, and retries failures with exponential
+-- backoff. Jobs that exhaust max_attempts stay in the table with status 'dead' (the
+-- dead-letter store) until someone looks at them and resets status to 'pending'.
+CREATE TABLE IF NOT EXISTS email_jobs (
+    id BIGSERIAL PRIMARY KEY,
+    payload JSONB NOT NULL,                -- from_email, to_emails, subject, html_content
+    status TEXT NOT NULL DEFAULT 'pending' CHECK (status IN ('pending', 'sending', 'sent', 'dead')),
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 6,
+    run_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    locked_at TIMESTAMP WITH TIME ZONE,
+    last_error TEXT,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    sent_at TIMESTAMP WITH TIME ZONE
+);
+
+CREATE INDEX IF NOT EXISTS idx_email_jobs_due ON email_jobs (run_at, id) WHERE status IN ('pending', 'sending');
+
+-- ============================================================
+-- Platform metadata cache (oEmbed)
+-- ============================================================
+-- Filled by `flask harvest-metadata` and after each add_video. width/height are the player's
+-- native size, so templates can size containers for odd shapes (e.g. a 746x720 Muse upload)
+-- instead of forcing 16:9. etag/last_modified let a refresh ask the platform whether
+-- anything changed; refresh_after decides when a row is due again.
+CREATE TABLE IF NOT EXISTS video_metadata (
+    video_db_id INTEGER PRIMARY KEY REFERENCES videos(id) ON DELETE CASCADE,
+    platform TEXT NOT NULL,
+    provider_title TEXT,
+    duration_seconds INTEGER,
+    width INTEGER,
+    height INTEGER,
+    thumbnail_url TEXT,
+    raw JSONB,
+    etag TEXT,
+    last_modified TEXT,
+    status TEXT NOT NULL DEFAULT 'ok' CHECK (status IN ('ok', 'error')),
+    error TEXT,
+    fetched_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    refresh_after TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_video_metadata_refresh_after ON video_metadata (refresh_after);
+
+-- ============================================================
+-- Series reordering (drag-and-drop on /admin/series)
+-- ============================================================
+-- Every saved reorder bumps series.version. A save names the version it was based on and is
+-- rejected (HTTP 409) if another admin reordered the series in the meantime, instead of
+-- silently overwriting their order. After running this, POST /admin/schema/refresh.
+ALTER TABLE series ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 0;
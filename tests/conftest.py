@@ -0,0 +1,103 @@
+import datetime
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as vespa_app  # noqa: E402
+
+
+class RecordingCursor:
+    """Stands in for a psycopg2 cursor: records executed SQL and returns canned rows."""
+
+    def __init__(self, rows=()):
+        self.rows = list(rows)
+        self.executed = []
+
+    def execute(self, sql, params=None):
+        self.executed.append((sql, params))
+
+    def fetchall(self):
+        return list(self.rows)
+
+    def fetchone(self):
+        return self.rows[0] if self.rows else None
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def schema():
+    """
+    Loads schema_capabilities from a list of 'table' / 'table.column' names and restores
+    the previous registry afterwards, so no test needs a database for detection.
+    """
+    capabilities = vespa_app.schema_capabilities
+    saved = (capabilities.tables, capabilities.columns, capabilities.indexes,
+             capabilities.detected_at, capabilities._loaded)
+
+    def load(*names):
+        rows = [('column', name) if '.' in name else ('table', name) for name in names]
+        capabilities.detect(RecordingCursor(rows))
+        return capabilities
+
+    yield load
+    (capabilities.tables, capabilities.columns, capabilities.indexes,
+     capabilities.detected_at, capabilities._loaded) = saved
+
+
+def make_catalog_row(video_count=30, category_keys=('vision', 'effort', 'systems')):
+    """A build_catalog_query() row: `video_count` videos spread over a few categories."""
+    now = datetime.datetime.now(datetime.timezone.utc)
+    categories = [
+        {'category_key': key, 'name': key.title(), 'color': '#008080', 'description': f'{key} videos'}
+        for key in category_keys
+    ]
+    videos = [
+        {
+            'id': n,
+            'platform': ('youtube', 'vimeo', 'muse')[n % 3],
+            'video_id_on_platform': f'vid{n}',
+            'title': f'Study skills video {n}',
+            'view_count': n % 4,
+            'likes': (n * 37) % 100,
+            'created_at': (now - datetime.timedelta(days=n)).isoformat(),
+            'keywords': f'revision, motivation, topic{n}',
+            'category_keys': [key for c, key in enumerate(category_keys) if (n + c) % 2 == 0],
+            'problems': [{'text': f'I struggle with problem {n % 5}', 'theme': 'Vision'}],
+            'site_keys': ['vespa'],
+            'trending_score': 0,
+            'aspect_ratio': None,
+            'duration_seconds': None,
+        }
+        for n in range(1, video_count + 1)
+    ]
+    return {'categories': categories, 'videos': videos}
+
+
+@pytest.fixture
+def catalog(monkeypatch):
+    """
+    Serves make_catalog_row() through the real CatalogCache (no database), with the
+    per-worker caches emptied before and after. Returns a function giving the snapshot.
+    """
+    def clear():
+        vespa_app.catalog_cache._snapshots.clear()
+        vespa_app.page_cache.clear()
+        vespa_app.fragment_cache.clear()
+        vespa_app.series_cache.clear()
+        vespa_app._suggest_indexes.clear()
+        vespa_app._search_indexes.clear()
+
+    clear()
+    monkeypatch.setattr(vespa_app.catalog_cache, '_builder', lambda site_key: vespa_app.assemble_catalog(make_catalog_row()))
+    monkeypatch.setattr(vespa_app, 'get_all_problems', lambda: [])
+    monkeypatch.setattr(vespa_app, 'load_series_batch', lambda *args, **kwargs: {})
+    yield vespa_app.get_catalog_snapshot
+    clear()
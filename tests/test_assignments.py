@@ -0,0 +1,66 @@
+import app as vespa_app
+from conftest import RecordingCursor
+
+
+class ExistingKeysCursor(RecordingCursor):
+    """Answers validate_assignments()' single ARRAY(...) query from {kind: existing keys}."""
+
+    def __init__(self, existing):
+        super().__init__()
+        self.existing = existing
+
+    def fetchone(self):
+        sql, params = self.executed[-1]
+        row = []
+        for select, keys in zip(sql.split('ARRAY(')[1:], params):
+            table = select.split(' FROM ')[1].split()[0]
+            row.append([key for key in keys if key in self.existing.get(table, ())])
+        return row
+
+
+def test_parses_dedupes_and_keeps_submitted_order(schema):
+    schema('sites', 'categories', 'series')
+    cur = ExistingKeysCursor({'categories': {'vision', 'effort'}, 'series': {3, 5}})
+    valid, invalid = vespa_app.validate_assignments(cur, {
+        'categories': ['effort', 'vision', 'effort'],
+        'series': ['5', 'x', '3', '5'],
+    })
+    assert valid == {'categories': ['effort', 'vision'], 'series': [5, 3]}
+    assert invalid == {'series': ['x']}
+    assert len(cur.executed) == 1
+
+
+def test_unknown_keys_are_reported(schema):
+    schema('sites', 'categories')
+    cur = ExistingKeysCursor({'categories': {'vision'}})
+    valid, invalid = vespa_app.validate_assignments(cur, {'categories': ['vision', 'gone']})
+    assert valid == {'categories': ['vision']}
+    assert invalid == {'categories': ['gone']}
+
+
+def test_sites_outside_available_sites_are_rejected_without_a_query(schema):
+    schema('sites')
+    cur = ExistingKeysCursor({})
+    valid, invalid = vespa_app.validate_assignments(cur, {'sites': ['elsewhere']})
+    assert 'sites' not in valid
+    assert invalid == {'sites': ['elsewhere']}
+    assert cur.executed == []
+
+
+def test_kind_with_no_surviving_values_is_left_out(schema):
+    schema('sites', 'categories')
+    cur = ExistingKeysCursor({'sites': {'vespa'}})
+    valid, invalid = vespa_app.validate_assignments(cur, {'sites': ['csc'], 'categories': []})
+    # Nothing written for sites (current rows stay); an empty submission still clears.
+    assert valid == {'categories': []}
+    assert invalid == {'sites': ['csc']}
+
+
+def test_write_assignments_skips_kinds_missing_from_valid():
+    cur = RecordingCursor()
+    changes = vespa_app.write_assignments(
+        cur, 7, {'categories': []},
+        current={'categories': ['vision'], 'sites': ['vespa']},
+    )
+    assert changes == {'categories': (0, 1)}
+    assert [sql.split()[2] for sql, _ in cur.executed] == ['video_category_assignments']
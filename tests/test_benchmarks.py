@@ -0,0 +1,16 @@
+import os
+import subprocess
+import sys
+
+BENCHMARKS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks')
+
+
+def test_memory_benchmark_runs_on_a_small_catalog():
+    result = subprocess.run(
+        [sys.executable, os.path.join(BENCHMARKS, 'bench_memory.py'), '300'],
+        capture_output=True, text=True, timeout=120, check=True,
+    )
+    header, row = result.stdout.strip().splitlines()
+    assert header.split()[0] == 'videos'
+    assert row.split()[0] == '300'
+    assert 'Error' not in result.stdout  # app.py's config warnings are swallowed
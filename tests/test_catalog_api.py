@@ -0,0 +1,52 @@
+import pytest
+
+import app as vespa_app
+
+
+def category(snapshot, key):
+    return snapshot.categories[key]['videos']
+
+
+@pytest.mark.parametrize('key', ['vision', vespa_app.FRESH_NEW_VIDS_KEY, vespa_app.MOST_VIEWED_KEY])
+def test_cursor_pages_cover_the_category_exactly_once(catalog, key):
+    videos = category(catalog(None), key)
+    seen = []
+    cursor = None
+    while True:
+        page, cursor = vespa_app.page_category_videos(videos, key, cursor, limit=4)
+        seen.extend(page)
+        if cursor is None:
+            break
+    assert seen == list(videos)
+
+
+def test_cursor_round_trips_the_order_key(catalog):
+    video = category(catalog(None), 'vision')[2]
+    cursor = vespa_app.encode_category_cursor('vision', video)
+    assert '=' not in cursor
+    assert vespa_app.decode_category_cursor('vision', cursor) == vespa_app.category_order_key('vision', video)
+
+
+def test_cursor_survives_a_like_between_pages(catalog):
+    videos = list(category(catalog(None), 'vision'))
+    page, cursor = vespa_app.page_category_videos(videos, 'vision', limit=3)
+    # The first video gains likes but stays first; the next page must start right after page[-1].
+    liked = videos[0].replace(likes=videos[0].likes + 50)
+    reordered = sorted([liked] + videos[1:], key=lambda v: vespa_app.category_order_key('vision', v))
+    next_page, _ = vespa_app.page_category_videos(reordered, 'vision', cursor, limit=3)
+    assert next_page == reordered[3:6]
+
+
+@pytest.mark.parametrize('cursor', ['', '!!!', 'bm90IGpzb24', 'WzEsMl0', 'WyJhIiwiYiIsMV0', 'W3RydWUsIngiLDFd'])
+def test_malformed_cursors_are_rejected(cursor):
+    if not cursor:
+        assert vespa_app.page_category_videos([], 'vision', cursor)[0] == []
+        return
+    with pytest.raises(ValueError):
+        vespa_app.decode_category_cursor('vision', cursor)
+
+
+def test_fresh_cursor_expects_its_own_shape(catalog):
+    video = category(catalog(None), 'vision')[0]
+    with pytest.raises(ValueError):
+        vespa_app.decode_category_cursor(vespa_app.FRESH_NEW_VIDS_KEY, vespa_app.encode_category_cursor('vision', video))
@@ -0,0 +1,59 @@
+import re
+
+import app as vespa_app
+from conftest import RecordingCursor
+
+FULL_SCHEMA = (
+    'videos', 'videos.keywords', 'videos.likes', 'videos.created_at',
+    'video_site_assignments', 'video_category_assignments', 'video_series_assignments',
+    'series', 'video_problems', 'problems',
+)
+
+
+def declared_aliases(sql):
+    return set(re.findall(r'\b(?:FROM|JOIN)\s+\w+\s+(\w+)', sql))
+
+
+def qualifiers(sql):
+    return set(re.findall(r'\b([a-z_]+)\.[a-z_]+\b', sql))
+
+
+def exported_sql(rows=()):
+    cur = RecordingCursor(rows)
+    exported = list(vespa_app.export_catalog_rows(cur))
+    (sql, _), = cur.executed
+    return sql, exported
+
+
+def test_export_reads_keywords_through_the_videos_alias(schema):
+    schema(*FULL_SCHEMA)
+    sql, _ = exported_sql()
+    assert 'v.keywords AS keywords' in sql
+    assert 'videos.keywords' not in sql
+    assert qualifiers(sql) <= declared_aliases(sql)
+
+
+def test_export_falls_back_without_optional_columns(schema):
+    schema('videos', 'series', 'problems')
+    sql, _ = exported_sql()
+    assert 'NULL::text AS keywords' in sql
+    assert 'ARRAY[]::text[] AS sites' in sql
+    assert qualifiers(sql) <= declared_aliases(sql)
+
+
+def test_export_row_shape(schema):
+    schema(*FULL_SCHEMA)
+    row = ('youtube', 'abc', 'Title', None, None, 7, ['vision'], ['s1', 's2'], [1, 2], ['p'], ['vespa'])
+    _, (video,) = exported_sql([row])
+    assert video == {
+        'platform': 'youtube', 'video_id': 'abc', 'title': 'Title', 'keywords': '', 'likes': 0,
+        'view_count': 7, 'categories': ['vision'], 'series': ['s1', 's2'], 'problems': ['p'],
+        'sites': ['vespa'], vespa_app.CATALOG_SERIES_ORDER_FIELD: [1, 2],
+    }
+
+
+def test_copy_field_escapes_copy_text_format():
+    assert vespa_app._copy_field(None) == '\\N'
+    assert vespa_app._copy_field(12) == '12'
+    assert vespa_app._copy_field('a\tb\nc\rd\\e') == 'a\\tb\\nc\\rd\\\\e'
+    assert vespa_app._copy_field('\\N') == '\\\\N'  # A literal backslash-N is not NULL
@@ -0,0 +1,52 @@
+import pytest
+
+import app as vespa_app
+
+
+class ForgottenOnRead(dict):
+    """A _known map that loses a video between the unlocked check and the locked read, as a concurrent flush would."""
+
+    def __contains__(self, video_id):
+        return True
+
+
+@pytest.fixture
+def make_counter(monkeypatch):
+    counters = []
+
+    def make(stored):
+        counter = vespa_app.WriteBehindCounter('likes', interval=3600, threshold=1000)
+        monkeypatch.setattr(counter, 'ensure_started', lambda: None)
+        monkeypatch.setattr(counter, '_load_known', lambda video_id: stored.get(video_id))
+        monkeypatch.setattr(counter, '_notify', lambda totals: None)
+        counters.append(counter)
+        return counter
+
+    yield make
+    for counter in counters:
+        counter._pending.clear()  # Nothing for the exit-time flush to send
+
+
+def test_increment_returns_optimistic_totals(make_counter):
+    counter = make_counter({7: 10})
+    assert counter.increment(7) == 11
+    assert counter.increment(7, 2) == 13
+    assert counter.increment(8) is None
+    assert counter._pending == {7: 3}
+
+
+def test_increment_of_a_video_forgotten_by_a_flush_is_dropped(make_counter):
+    counter = make_counter({})
+    counter._known = ForgottenOnRead()
+    assert counter.increment(7) is None
+    assert counter._pending == {}
+
+
+def test_rollup_stats_are_recorded_under_the_lock():
+    log = vespa_app.EngagementLog(interval=3600, threshold=1000)
+    log.note_rollup(5, 0.25)
+    log.note_rollup(3, 0.5)
+    log.note_error(RuntimeError('lock timeout'))
+    stats = log.stats()
+    assert (stats['rollups'], stats['rolled_up_events'], stats['last_rollup_seconds']) == (2, 8, 0.5)
+    assert stats['last_error'] == 'lock timeout'
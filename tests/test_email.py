@@ -0,0 +1,47 @@
+import pytest
+
+import app as vespa_app
+
+
+class FakeClient:
+    def __init__(self):
+        self.sent = []
+
+    def send(self, mail):
+        self.sent.append(mail)
+
+
+@pytest.fixture
+def fake_email(monkeypatch):
+    client = FakeClient()
+    monkeypatch.setitem(vespa_app.app.config, 'EMAIL_CLIENT_FACTORY', lambda: client)
+    monkeypatch.setattr(vespa_app, 'SENDGRID_API_KEY', None)
+    monkeypatch.setattr(vespa_app, 'RECIPIENT_EMAIL', 'office@example.com')
+    monkeypatch.setattr(vespa_app, 'SENDER_EMAIL', 'site@example.com')
+    monkeypatch.setattr(vespa_app, 'DATABASE_URL', None)
+    return client
+
+
+def test_submit_form_works_with_a_fake_client_and_no_sendgrid_key(fake_email, capsys):
+    response = vespa_app.app.test_client().post('/submit', data={
+        'name': 'Ada', 'email': 'ada@example.com', 'message': 'Hello\nthere',
+    })
+    assert response.status_code == 302
+    assert 'received' in response.headers['Location']
+    (mail,) = fake_email.sent
+    assert mail.get()['subject'] == 'New VESPA Academy Enquiry from Ada'
+    assert 'sending' in capsys.readouterr().out  # The synchronous fallback is logged
+
+
+def test_submit_form_rejects_a_bad_address(fake_email):
+    response = vespa_app.app.test_client().post('/submit', data={
+        'name': 'Ada', 'email': 'not-an-address', 'message': 'Hello',
+    })
+    assert 'valid+email' in response.headers['Location']
+    assert fake_email.sent == []
+
+
+def test_default_client_needs_the_sendgrid_key(monkeypatch):
+    monkeypatch.setattr(vespa_app, 'SENDGRID_API_KEY', None)
+    with pytest.raises(RuntimeError, match='SENDGRID_API_KEY'):
+        vespa_app.sendgrid_client()
@@ -0,0 +1,26 @@
+import app as vespa_app
+
+
+def test_like_retires_cached_homepage_and_its_etag(catalog):
+    client = vespa_app.app.test_client()
+    first = client.get('/')
+    assert first.status_code == 200
+    etag = first.headers['ETag']
+    assert client.get('/', headers={'If-None-Match': etag}).status_code == 304
+
+    snapshot = catalog('vespa')
+    video = snapshot.videos[0]
+    vespa_app.catalog_cache.apply_likes(video.db_id, video.likes + 1000)
+
+    after_like = client.get('/', headers={'If-None-Match': etag})
+    assert after_like.status_code == 200
+    assert after_like.headers['ETag'] != etag
+    assert after_like.last_modified >= first.last_modified
+
+
+def test_unchanged_catalog_is_served_from_the_page_cache(catalog):
+    client = vespa_app.app.test_client()
+    client.get('/')
+    hits = vespa_app.page_cache.stats()['hits']
+    client.get('/')
+    assert vespa_app.page_cache.stats()['hits'] == hits + 1
@@ -0,0 +1,70 @@
+import random
+
+import pytest
+
+import app as vespa_app
+
+
+class Item:
+    def __init__(self, db_id, score):
+        self.db_id = db_id
+        self.score = score
+
+
+def rank(item):
+    return (-item.score, item.db_id)
+
+
+@pytest.mark.parametrize('block_size', [1, 2, 4, 128])
+def test_ranked_list_matches_a_sorted_list_under_random_updates(block_size):
+    rng = random.Random(block_size)
+    items = {n: Item(n, rng.randrange(50)) for n in range(200)}
+    ranked = vespa_app.RankedList(rank, list(items.values()), block_size=block_size)
+    for _ in range(2000):
+        old = items[rng.randrange(200)]
+        new = Item(old.db_id, rng.randrange(50))
+        ranked.remove(old)
+        ranked.insert(new)
+        items[new.db_id] = new
+    expected = sorted(items.values(), key=rank)
+    assert list(ranked.videos()) == expected
+    assert len(ranked) == 200
+    assert list(ranked.head(7)) == expected[:7]
+    cutoff = rank(expected[150])
+    assert list(ranked.tail_from(cutoff)) == expected[150:][::-1]
+    assert ranked.revision == 4000
+
+
+def test_ranked_list_blocks_stay_bounded():
+    ranked = vespa_app.RankedList(rank, block_size=4)
+    for n in range(100):
+        ranked.insert(Item(n, 0))
+    assert all(len(block) <= 8 for block in ranked._video_blocks)
+    for n in range(100):
+        ranked.remove(Item(n, 0))
+    assert len(ranked) == 0 and ranked.videos() == () and ranked.head(3) == ()
+    ranked.insert(Item(5, 1))
+    assert [item.db_id for item in ranked.videos()] == [5]
+
+
+def test_removing_a_missing_video_changes_nothing():
+    ranked = vespa_app.RankedList(rank, [Item(1, 3)])
+    ranked.remove(Item(2, 3))
+    ranked.remove(Item(1, 4))
+    assert len(ranked) == 1 and ranked.revision == 0
+
+
+def test_ranking_index_moves_a_liked_video_and_bumps_only_its_lists(catalog):
+    ranking = catalog(None).ranking
+    top = ranking.top_liked(1)[0]
+    video = ranking.top_liked(len(ranking._videos))[-1]
+    untouched = [key for key in ('vision', 'effort', 'systems') if key not in video.category_keys]
+    before = {key: ranking.list_revision(key) for key in untouched}
+
+    assert ranking.update_likes(video.db_id, top.likes + 1)
+    assert ranking.top_liked(1)[0].db_id == video.db_id
+    assert ranking.get(video.db_id).likes == top.likes + 1
+    assert {key: ranking.list_revision(key) for key in untouched} == before
+    for key in video.category_keys:
+        assert ranking.category(key)[0].db_id == video.db_id
+    assert not ranking.update_likes(video.db_id, top.likes + 1)
@@ -0,0 +1,90 @@
+import pytest
+
+import app as vespa_app
+from conftest import RecordingCursor, make_catalog_row
+
+
+class FakeDataContext:
+    def __init__(self, cur):
+        self.cur = cur
+
+    def cursor(self):
+        return self.cur
+
+    def recover(self):
+        pass
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def postgres_search(catalog, monkeypatch):
+    """Runs _search_postgres() against a cursor answering with `total` and `page_ids`."""
+    def run(total, page_ids, page=1, page_size=10):
+        cur = RecordingCursor([{'total_matches': total, 'page_ids': page_ids}])
+        monkeypatch.setattr(vespa_app, 'acquire_data_context', lambda: (FakeDataContext(cur), True))
+        results, count = vespa_app._search_postgres('study', 'vespa', page, page_size)
+        return results, count, cur.executed[0]
+    return run
+
+
+def test_postgres_total_survives_a_page_past_the_last_match(postgres_search):
+    results, total, (_, params) = postgres_search(total=12, page_ids=[], page=5)
+    assert results == []
+    assert total == 12
+    assert params['offset'] == 40
+
+
+def test_postgres_search_is_limited_to_the_snapshot(postgres_search, catalog):
+    snapshot = catalog('vespa')
+    results, total, (sql, params) = postgres_search(total=2, page_ids=[3, 1])
+    assert [video.db_id for video in results] == [3, 1]
+    assert total == 2
+    assert params['visible_ids'] == sorted(video.db_id for video in snapshot.videos)
+    assert 'v.id = ANY(%(visible_ids)s)' in sql
+
+
+def test_search_index_matches_prefixes_of_every_token(catalog):
+    index = vespa_app.SearchIndex()
+    index.sync(catalog(None))
+    results, total = index.search('stud topic12')
+    assert [video.db_id for video in results] == [12]
+    assert total == 1
+    _, everything = index.search('motiv')
+    assert everything == len(catalog(None).videos)
+    assert index.search('') == ([], 0)
+    assert index.search('nothing-like-this') == ([], 0)
+
+
+def test_search_index_limit_keeps_the_full_count(catalog):
+    index = vespa_app.SearchIndex()
+    index.sync(catalog(None))
+    ranked, total = index.search('revision')
+    limited, limited_total = index.search('revision', limit=5)
+    assert limited == ranked[:5]
+    assert limited_total == total == len(ranked)
+
+
+def test_search_index_sync_reindexes_only_changed_videos(catalog, monkeypatch):
+    index = vespa_app.SearchIndex()
+    index.sync(catalog(None))
+    reindexed = index.stats['documents_reindexed']
+    row = vespa_app.assemble_catalog(catalog_row_with_retitled_video())
+    monkeypatch.setattr(vespa_app.catalog_cache, '_builder', lambda site_key: row)
+    vespa_app.catalog_cache.bump_version()
+    index.sync(catalog(None))
+    assert index.stats['documents_reindexed'] == reindexed + 1
+    assert [video.db_id for video in index.search('kaleidoscope')[0]] == [4]
+    assert index.search('topic4')[1] == 1
+
+
+def catalog_row_with_retitled_video():
+    row = make_catalog_row()
+    row['videos'][3]['title'] = 'Kaleidoscope revision'
+    return row
+
+
+def test_search_memory_pages_past_the_end(catalog):
+    results, total = vespa_app._search_memory('study', None, page=99, page_size=10)
+    assert results == [] and total == len(catalog(None).videos)
@@ -0,0 +1,84 @@
+import psycopg2.extras
+import pytest
+
+import app as vespa_app
+
+
+class ScriptedCursor:
+    """Returns the scripted results in order for each fetchone()/fetchall()."""
+
+    def __init__(self, results):
+        self.results = list(results)
+        self.executed = []
+
+    def execute(self, sql, params=None):
+        self.executed.append((sql, params))
+
+    def fetchone(self):
+        return self.results.pop(0)
+
+    def fetchall(self):
+        return self.results.pop(0)
+
+    def close(self):
+        pass
+
+
+class ScriptedConnection:
+    def __init__(self, cur):
+        self.cur = cur
+        self.committed = False
+
+    def cursor(self):
+        return self.cur
+
+    def commit(self):
+        self.committed = True
+
+    def rollback(self):
+        pass
+
+
+@pytest.fixture
+def admin_client(schema):
+    schema('series', 'series.version', 'video_series_assignments')
+    client = vespa_app.app.test_client()
+    with client.session_transaction() as session:
+        session['logged_in'] = True
+    return client
+
+
+def test_reorder_passes_every_value_as_a_parameter(admin_client, monkeypatch):
+    cur = ScriptedCursor([(6,), [(11,), (12,)]])
+    conn = ScriptedConnection(cur)
+    calls = []
+
+    def execute_values(cur, sql, argslist, **kwargs):
+        calls.append((sql, argslist, kwargs))
+        return [(12,)]
+
+    monkeypatch.setattr(vespa_app, 'get_db_connection', lambda: conn)
+    monkeypatch.setattr(vespa_app, 'release_db_connection', lambda conn: None)
+    monkeypatch.setattr(psycopg2.extras, 'execute_values', execute_values)
+    invalidated = []
+    monkeypatch.setattr(vespa_app, 'invalidate_series_lists', invalidated.append)
+
+    response = admin_client.post('/admin/series/7/order', json={'version': 5, 'video_ids': [12, 11]})
+
+    assert response.get_json() == {'success': True, 'version': 6, 'changed': 1}
+    (sql, argslist, kwargs), = calls
+    assert sql.count('%s') == 1 and '7' not in sql
+    assert argslist == [(7, 12, 1), (7, 11, 2)]
+    assert kwargs['template'] == '(%s::int, %s::int, %s::int)'
+    assert conn.committed and invalidated == [7]
+
+
+def test_reorder_rejects_a_stale_version(admin_client, monkeypatch):
+    cur = ScriptedCursor([None, (9,)])
+    monkeypatch.setattr(vespa_app, 'get_db_connection', lambda: ScriptedConnection(cur))
+    monkeypatch.setattr(vespa_app, 'release_db_connection', lambda conn: None)
+
+    response = admin_client.post('/admin/series/7/order', json={'version': 5, 'video_ids': [1]})
+
+    assert response.status_code == 409
+    assert response.get_json()['version'] == 9
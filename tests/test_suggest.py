@@ -0,0 +1,52 @@
+import threading
+
+import app as vespa_app
+
+
+def wait_for_refreshes():
+    vespa_app._suggest_refresh_executor.submit(lambda: None).result(timeout=10)
+
+
+def test_prefix_and_typo_suggestions(catalog):
+    index = vespa_app.SuggestIndex(catalog(None))
+    titles = [s['text'] for s in index.suggest('study skil')]
+    assert titles and all(text.startswith('Study skills video') for text in titles)
+    assert {'text': 'revision', 'kind': 'keyword'} in index.suggest('revison')
+    assert index.suggest('') == []
+    assert index.suggest('zzzzqqq') == []
+
+
+def test_suggest_records_query_latency(catalog):
+    index = vespa_app.SuggestIndex(catalog(None))
+    index.suggest('motivation')
+    index.suggest('motivation')
+    summary = index.summary()
+    assert (summary['queries'], summary['cache_hits']) == (2, 1)
+    assert 0 < summary['max_query_seconds'] and summary['avg_query_seconds'] is not None
+
+
+def test_stale_catalog_is_refreshed_in_the_background(catalog, monkeypatch):
+    first = vespa_app.get_suggest_index('vespa')
+    release = threading.Event()
+    builds = []
+    builder = vespa_app.catalog_cache._builder
+
+    def slow_builder(site_key):
+        builds.append(threading.get_ident())
+        release.wait(10)
+        return builder(site_key)
+
+    monkeypatch.setattr(vespa_app.catalog_cache, '_builder', slow_builder)
+    vespa_app.catalog_cache.bump_version()
+
+    served = [vespa_app.get_suggest_index('vespa') for _ in range(5)]
+    assert all(index is first for index in served)  # Nobody waits on the rebuild
+    release.set()
+    wait_for_refreshes()
+
+    assert len(builds) == 1 and builds[0] != threading.get_ident()  # Once, off the request thread
+    refreshed = vespa_app.get_suggest_index('vespa')
+    assert refreshed is not first
+    assert refreshed.version[0] == vespa_app.catalog_cache.version
+    stats = vespa_app.suggest_stats()
+    assert stats['background_refreshes'] >= 1 and stats['refreshing'] == []